@@ -0,0 +1,47 @@
+"""
+System checks of the caches that sessions and users are served from.
+
+Both are invalidated by deleting the cache entry, which only reaches the
+other web processes when they share the cache. With a per-process
+LocMemCache a logged out session or a deactivated user would stay valid
+in every other process until the entry expires.
+"""
+
+# Django
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Error, Tags, register
+
+CACHED_SESSION_ENGINES = (
+    'django.contrib.sessions.backends.cache',
+    'django.contrib.sessions.backends.cached_db',
+)
+
+CACHED_AUTHENTICATION_MIDDLEWARE = (
+    'django_quiz.middleware.CachedAuthenticationMiddleware')
+
+def _is_local(alias):
+    return isinstance(caches[alias], LocMemCache)
+
+@register(Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    errors = []
+    if settings.SESSION_ENGINE in CACHED_SESSION_ENGINES and _is_local(
+            settings.SESSION_CACHE_ALIAS):
+        errors.append(Error(
+            'Sessions are cached in the per-process cache "{0}".'.format(
+                settings.SESSION_CACHE_ALIAS),
+            hint='Point SESSION_CACHE_ALIAS at a cache shared by all '
+                'processes, or use the db session engine.',
+            id='common.E001'))
+
+    alias = getattr(settings, 'USER_CACHE', 'default')
+    if (CACHED_AUTHENTICATION_MIDDLEWARE in settings.MIDDLEWARE_CLASSES and
+            _is_local(alias)):
+        errors.append(Error(
+            'Users are cached in the per-process cache "{0}".'.format(alias),
+            hint='Point USER_CACHE at a cache shared by all processes, or '
+                'use django.contrib.auth.middleware.AuthenticationMiddleware.',
+            id='common.E002'))
+    return errors
@@ -1,9 +1,21 @@
 # -*- coding: utf-8 -*-
+# Python
+from io import StringIO
+from os.path import join
+from tempfile import gettempdir
+
 # Django
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.urlresolvers import reverse
+from django.db import connection
 from django.db.utils import IntegrityError
-from django.test import TestCase
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 
 # Local
+from . import checks, users
 from .models import Tag
 
 ######
@@ -41,3 +53,90 @@ class TagDuplicateTestCase(TestCase):
     def test_duplicate_creation(self):
         with self.assertRaises(IntegrityError):
             tag = Tag.objects.create(name=self.name)
+
+########
+# Users
+########
+
+class CachedUserTestCase(TestCase):
+    def setUp(self):
+        users.get_cache().clear()
+        self.client = Client()
+        self.username = 'testuser'
+        self.password = '0xdeadbeef'
+        self.user = User.objects.create_user(username=self.username, 
+            password=self.password)
+        self.client.login(username=self.username, password=self.password)
+        self.url = reverse('lesson_list')
+
+    def test_cached(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        # Neither read nor saved
+        tables = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('auth_user', tables)
+        self.assertNotIn('django_session', tables)
+
+    def test_password_change(self):
+        self.client.get(self.url)
+        self.user.set_password('0xcafebabe')
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_deactivated(self):
+        self.client.get(self.url)
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(users.get(ModelBackend(), self.user.pk).is_active)
+
+    def test_deleted(self):
+        self.client.get(self.url)
+        self.user.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+LOCAL_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+SHARED_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        # Never written to by the checks
+        'LOCATION': join(gettempdir(), 'django_quiz_checks'),
+    },
+}
+
+class SharedCacheCheckTestCase(SimpleTestCase):
+    @override_settings(CACHES=SHARED_CACHES, SESSION_CACHE_ALIAS='default', 
+        USER_CACHE='default')
+    def test_shared(self):
+        self.assertEqual(checks.check_shared_caches(None), [])
+
+    def test_silenced_in_tests(self):
+        # The test settings use per-process caches
+        self.assertEqual(len(checks.check_shared_caches(None)), 2)
+        # Raises SystemCheckError unless both are silenced
+        call_command('check', tags=['caches'], stdout=StringIO())
+
+    @override_settings(CACHES=LOCAL_CACHES, SESSION_CACHE_ALIAS='default', 
+        USER_CACHE='default')
+    def test_local(self):
+        errors = checks.check_shared_caches(None)
+        self.assertEqual([error.id for error in errors], 
+            ['common.E001', 'common.E002'])
+
+    @override_settings(CACHES=LOCAL_CACHES, SESSION_CACHE_ALIAS='default', 
+        USER_CACHE='default', 
+        SESSION_ENGINE='django.contrib.sessions.backends.db', 
+        MIDDLEWARE_CLASSES=[
+            'django.contrib.sessions.middleware.SessionMiddleware',
+            'django.contrib.auth.middleware.AuthenticationMiddleware',
+        ])
+    def test_uncached(self):
+        self.assertEqual(checks.check_shared_caches(None), [])
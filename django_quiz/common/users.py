@@ -0,0 +1,67 @@
+"""
+Cache of authenticated users.
+
+CachedAuthenticationMiddleware looks the user of each request up here
+rather than in auth_user. Entries are keyed by user id in a bounded cache
+(USER_CACHE), which all processes must share (see checks.py), and deleted
+by the signals in signals.py whenever the user is saved or deleted, which
+covers password and is_active changes.
+QuerySet.update() sends no signals; call invalidate() after using it on
+users.
+"""
+
+# Django
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY, 
+    SESSION_KEY, get_user_model, load_backend)
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare
+
+def get_cache():
+    return caches[getattr(settings, 'USER_CACHE', 'default')]
+
+def get_timeout():
+    return getattr(settings, 'USER_CACHE_TIMEOUT', 60 * 5)
+
+def _key(user_id):
+    return 'auth:user:{0}'.format(user_id)
+
+def get(backend, user_id):
+    """Returns backend.get_user(user_id), from the cache if possible."""
+    cache = get_cache()
+    key = _key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = backend.get_user(user_id)
+        if user is not None:
+            cache.set(key, user, get_timeout())
+    return user
+
+def invalidate(user_id):
+    get_cache().delete(_key(user_id))
+
+def get_user(request):
+    """
+    Like django.contrib.auth.get_user(), with the user from the cache. The
+    session hash is still checked, so changing the password logs out the
+    other sessions.
+    """
+    user = None
+    try:
+        user_id = request.session[SESSION_KEY]
+        backend_path = request.session[BACKEND_SESSION_KEY]
+    except KeyError:
+        pass
+    else:
+        if backend_path in settings.AUTHENTICATION_BACKENDS:
+            backend = load_backend(backend_path)
+            user_id = get_user_model()._meta.pk.to_python(user_id)
+            user = get(backend, user_id)
+            if hasattr(user, 'get_session_auth_hash'):
+                session_hash = request.session.get(HASH_SESSION_KEY)
+                if not (session_hash and constant_time_compare(session_hash, 
+                        user.get_session_auth_hash())):
+                    request.session.flush()
+                    user = None
+    return user or AnonymousUser()
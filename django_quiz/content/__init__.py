@@ -0,0 +1 @@
+default_app_config = 'django_quiz.content.apps.ContentConfig'
@@ -1,27 +1,232 @@
+# Python
+from io import TextIOWrapper
+
 # Django
-from django.contrib import admin
+from django.conf.urls import url
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.paginator import Paginator
+from django.core.urlresolvers import reverse
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.http import HttpResponseRedirect
+from django.template.response import TemplateResponse
+from django.utils.functional import cached_property
 
 # Local
-from .models import Lesson, Quiz, Question, Answer
+from .forms import ImportForm
+from .grading import regrade_question
+from .importer import Importer, read
+from .models import Lesson, Quiz, Question, Answer, QuizResult, correct_rate
+from .models import ItemAnalysis, QuizAnalysis
+
+##########
+# Helpers
+##########
+
+class InputFilter(admin.SimpleListFilter):
+    """
+    A list filter with a text box, for columns with too many values to list
+    every one of them in the sidebar. Rows match when lookup equals the
+    value entered.
+    """
+    template = 'admin/input_filter.html'
+    lookup = None
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def queryset(self, request, queryset):
+        value = (self.value() or '').strip()
+        if not value:
+            return queryset
+        try:
+            return queryset.filter(**{self.lookup: value})
+        except (ValueError, ValidationError) as e:
+            return queryset.none()
+
+    def choices(self, changelist):
+        # The other parameters of the changelist go in hidden inputs, so
+        # that submitting the box keeps them; the page number does not
+        params = sorted((key, value) 
+            for key, value in changelist.params.items()
+            if key not in (self.parameter_name, 'p'))
+        yield {
+            'value': self.value() or '',
+            'params': params,
+            'clear_query_string': changelist.get_query_string(
+                remove=[self.parameter_name]),
+        }
+
+class UserFilter(InputFilter):
+    title = 'username'
+    parameter_name = 'user'
+    lookup = 'user__username'
+
+class QuizFilter(InputFilter):
+    title = 'quiz id'
+    parameter_name = 'quiz'
+    lookup = 'quiz'
+
+class AnswerQuizFilter(QuizFilter):
+    lookup = 'question__quiz'
+
+class CappedCount(int):
+    """A count that stopped at its cap, displayed as at least that many."""
+    def __str__(self):
+        return '{0}+'.format(int(self))
+
+class CappedCountPaginator(Paginator):
+    """
+    Counts at most max_count rows, so that a page of a changelist over
+    millions of rows costs an index range scan rather than a full COUNT(*).
+    Beyond max_count the count is a CappedCount, shown as "10000+" in the
+    changelist, and the later pages are reached by narrowing it.
+    """
+    max_count = 10000
+
+    @cached_property
+    def count(self):
+        # One more row tells a count at the cap from a capped one
+        count = self.object_list.values('pk')[:self.max_count + 1].count()
+        if count > self.max_count:
+            return CappedCount(self.max_count)
+        return count
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = CappedCountPaginator
+    # Skips the second, unfiltered count
+    show_full_result_count = False
+
+#########
+# Admins
+#########
 
 class LessonAdmin(admin.ModelAdmin):
     list_display = ('title', 'body', 'created_at', 'updated_at')
+    change_list_template = 'admin/content/lesson/change_list.html'
+
+    def get_urls(self):
+        return [
+            url(r'^import/$', self.admin_site.admin_view(self.import_view),
+                name='content_lesson_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        """Imports an uploaded file, like the import_content command."""
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        report = None
+        form = ImportForm(request.POST or None, request.FILES or None)
+        if form.is_valid():
+            importer = Importer(dry_run=form.cleaned_data['dry_run'])
+            file = TextIOWrapper(form.cleaned_data['file'].file, 
+                encoding='utf-8', newline='')
+            try:
+                report = importer.run(read(file, form.cleaned_data['format']))
+            except ValueError as e:
+                form.add_error('file', str(e))
+            else:
+                if not form.cleaned_data['dry_run'] and not report.conflicts:
+                    self.message_user(request, 'Imported {0} new and {1} '
+                        'updated questions.'.format(
+                        report.created['questions'], 
+                        report.updated['questions']), messages.SUCCESS)
+                    return HttpResponseRedirect(
+                        reverse('admin:content_lesson_changelist'))
+
+        context = dict(self.admin_site.each_context(request),
+            title='Import content', opts=self.model._meta, form=form,
+            report=report, 
+            counts=report and [
+                (name, report.created[name], report.updated[name])
+                for name in ('tags', 'lessons', 'quizzes', 'questions')
+            ])
+        return TemplateResponse(request, 'admin/content/lesson/import.html',
+            context)
 
 class QuizAdmin(admin.ModelAdmin):
     list_display = ('lesson', 'title', 'created_at', 'updated_at')
     list_filter = ('lesson',)
+    list_select_related = ('lesson',)
 
-class QuestionAdmin(admin.ModelAdmin):
-    list_display = ('quiz', 'body', 'correct_answer', 'created_at', 
-        'updated_at')
-    list_filter = ('quiz', 'quiz__lesson')
+class QuestionAdmin(LargeTableAdmin):
+    list_display = ('quiz', 'position', 'body', 'correct_answer', 
+        'get_attempts', 'get_correct_rate', 'created_at', 'updated_at')
+    list_filter = (QuizFilter, 'quiz__lesson')
+    list_select_related = ('quiz__lesson',)
+    raw_id_fields = ('quiz',)
+    actions = ('regrade_answers',)
+
+    def get_queryset(self, request):
+        # From QuestionStats, joined rather than aggregated from the answers
+        return super().get_queryset(request).annotate(
+            attempts=Coalesce('stats__attempts', Value(0)),
+            correct_rate=correct_rate('stats__'))
 
-class AnswerAdmin(admin.ModelAdmin):
+    def get_attempts(self, obj):
+        return obj.attempts
+    get_attempts.short_description = 'attempts'
+    get_attempts.admin_order_field = 'attempts'
+
+    def get_correct_rate(self, obj):
+        if obj.correct_rate is None:
+            return 'N/A'
+        return '{0:.0%}'.format(obj.correct_rate)
+    get_correct_rate.short_description = 'correct'
+    # Sorts by difficulty
+    get_correct_rate.admin_order_field = 'correct_rate'
+
+    def regrade_answers(self, request, queryset):
+        changed = 0
+        for question in queryset:
+            changed += regrade_question(question)
+        self.message_user(request, 'Regraded answers to {0} question(s); '
+            '{1} grade(s) changed.'.format(len(queryset), changed))
+    regrade_answers.short_description = 'Regrade answers to selected questions'
+
+class AnswerAdmin(LargeTableAdmin):
     list_display = ('user', 'question', 'choice', 'is_correct', 'created_at', 
         'updated_at')
-    list_filter = ('user', 'is_correct', 'question__quiz')
+    list_filter = (UserFilter, 'is_correct', AnswerQuizFilter)
+    list_select_related = ('user', 'question')
+    raw_id_fields = ('user', 'question')
+    date_hierarchy = 'created_at'
+
+class QuizResultAdmin(LargeTableAdmin):
+    list_display = ('user', 'quiz', 'answered', 'correct', 'total', 
+        'completed_at')
+    list_filter = (UserFilter, QuizFilter)
+    list_select_related = ('user', 'quiz__lesson')
+    raw_id_fields = ('user', 'quiz')
+    readonly_fields = ('answered', 'correct', 'total', 'completed_at')
+
+class ItemAnalysisInline(admin.TabularInline):
+    model = ItemAnalysis
+    fields = ('question', 'attempts', 'difficulty', 'discrimination', 
+        'upper_difficulty', 'lower_difficulty', 'distractor_rate', 
+        'distractor_discrimination')
+    readonly_fields = fields
+    can_delete = False
+    extra = 0
+    max_num = 0
+
+class QuizAnalysisAdmin(admin.ModelAdmin):
+    list_display = ('quiz', 'respondents', 'questions', 'mean_score', 'alpha',
+        'created_at')
+    list_filter = (QuizFilter,)
+    list_select_related = ('quiz__lesson',)
+    readonly_fields = ('quiz', 'respondents', 'questions', 'mean_score', 
+        'alpha', 'created_at')
+    inlines = (ItemAnalysisInline,)
 
 admin.site.register(Lesson, LessonAdmin)
 admin.site.register(Quiz, QuizAdmin)
 admin.site.register(Question, QuestionAdmin)
 admin.site.register(Answer, AnswerAdmin)
+admin.site.register(QuizResult, QuizResultAdmin)
+admin.site.register(QuizAnalysis, QuizAnalysisAdmin)
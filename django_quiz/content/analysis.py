@@ -0,0 +1,201 @@
+"""
+Psychometric item analysis of quizzes.
+
+The answers of a quiz are streamed in primary key chunks into boolean
+NumPy matrices of respondents by questions, from which every statistic
+is computed with vectorized operations:
+
+- difficulty: the share of respondents who got a question right
+- discrimination: the point-biserial correlation of a question with the
+  score on the other questions (the corrected item-total correlation)
+- Cronbach's alpha of the quiz
+- distractor analysis: how often the wrong option was chosen, and how
+  choosing it correlates with the score on the other questions
+
+Respondents are the users with at least one answer to the quiz; their
+missing answers count as wrong. NumPy is optional, see is_available().
+"""
+
+# Python
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+# Django
+from django.db import connections, transaction
+
+# Local
+from .models import Answer, ItemAnalysis, Question, QuizAnalysis
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Share of respondents in each of the upper and lower score groups
+GROUP_SHARE = 0.27
+
+ITEM_FIELDS = ('attempts', 'difficulty', 'discrimination', 'upper_difficulty',
+    'lower_difficulty', 'distractor_rate', 'distractor_discrimination')
+
+def is_available():
+    return numpy is not None
+
+##########
+# Loading
+##########
+
+# Boolean matrices of respondents (rows, in user_ids order) by questions
+# (columns, in question_ids order)
+ResponseMatrix = namedtuple('ResponseMatrix',
+    'user_ids question_ids answered correct choice')
+
+def load_matrix(quiz_id, chunk_size=10000):
+    """
+    Reads the answers to the quiz into a ResponseMatrix, chunk_size rows
+    at a time. Each chunk is reduced to small arrays as soon as it is read,
+    so memory use is about that of the matrices.
+    """
+    question_ids = numpy.array(sorted(Question.objects.filter(
+        quiz_id=quiz_id).values_list('id', flat=True)), dtype=numpy.int64)
+    rows = (Answer.objects.filter(question__quiz=quiz_id).order_by('id')
+        .values_list('id', 'user_id', 'question_id', 'choice', 'is_correct'))
+
+    users, columns, choices, corrects = [], [], [], []
+    last_id = 0
+    while True:
+        chunk = numpy.array(list(rows.filter(id__gt=last_id)[:chunk_size]),
+            dtype=numpy.int64).reshape(-1, 5)
+        users.append(chunk[:, 1])
+        columns.append(numpy.searchsorted(question_ids, chunk[:, 2])
+            .astype(numpy.int32))
+        choices.append(chunk[:, 3].astype(bool))
+        corrects.append(chunk[:, 4].astype(bool))
+        if len(chunk) < chunk_size:
+            break
+        last_id = chunk[-1, 0]
+
+    user_ids, rows = numpy.unique(numpy.concatenate(users),
+        return_inverse=True)
+    columns = numpy.concatenate(columns)
+    shape = (len(user_ids), len(question_ids))
+    answered = numpy.zeros(shape, dtype=bool)
+    answered[rows, columns] = True
+    correct = numpy.zeros(shape, dtype=bool)
+    correct[rows, columns] = numpy.concatenate(corrects)
+    choice = numpy.zeros(shape, dtype=bool)
+    choice[rows, columns] = numpy.concatenate(choices)
+    return ResponseMatrix(user_ids, question_ids, answered, correct, choice)
+
+############
+# Computing
+############
+
+def _correlate(x, y):
+    """
+    The Pearson correlation of each column of x with the same column of
+    y; nan where either column is constant.
+    """
+    x = x - x.mean(axis=0)
+    y = y - y.mean(axis=0)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        return (x * y).sum(axis=0) / numpy.sqrt(
+            (x * x).sum(axis=0) * (y * y).sum(axis=0))
+
+def _divide(x, y):
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        return x / y
+
+def _to_python(value):
+    """A float, or None where undefined (nan or infinite)."""
+    value = float(value)
+    return value if numpy.isfinite(value) else None
+
+def compute(matrix):
+    """
+    Computes the statistics of a ResponseMatrix. Returns a dict of the
+    quiz statistics, with an 'items' list of per-question dicts.
+    """
+    respondents, questions = matrix.correct.shape
+    correct = matrix.correct.astype(float)
+    scores = correct.sum(axis=1)
+    # Each question's correlations are with the score on the others, so
+    # that the question does not correlate with itself
+    rest = scores[:, numpy.newaxis] - correct
+
+    attempts = matrix.answered.sum(axis=0)
+    wrong = (matrix.answered & ~matrix.correct).astype(float)
+
+    nan = numpy.full(questions, numpy.nan)
+    columns = dict.fromkeys(ITEM_FIELDS[1:], nan)
+    columns['distractor_rate'] = _divide(wrong.sum(axis=0), attempts)
+    if respondents:
+        # Ties are split by respondent; each group has at least one
+        group = max(1, int(round(respondents * GROUP_SHARE)))
+        order = numpy.argsort(scores, kind='mergesort')
+        columns.update({
+            'difficulty': correct.mean(axis=0),
+            'discrimination': _correlate(correct, rest),
+            'upper_difficulty': correct[order[-group:]].mean(axis=0),
+            'lower_difficulty': correct[order[:group]].mean(axis=0),
+            'distractor_discrimination': _correlate(wrong, rest),
+        })
+
+    alpha = numpy.nan
+    if questions > 1 and respondents > 1:
+        alpha = questions / (questions - 1) * (1 - _divide(
+            correct.var(axis=0, ddof=1).sum(), scores.var(ddof=1)))
+
+    items = []
+    for i, question_id in enumerate(matrix.question_ids):
+        item = {'question_id': int(question_id), 'attempts': int(attempts[i])}
+        for name in ITEM_FIELDS[1:]:
+            item[name] = _to_python(columns[name][i])
+        items.append(item)
+
+    return {
+        'respondents': respondents,
+        'questions': questions,
+        'mean_score': _to_python(scores.mean()) if respondents else None,
+        'alpha': _to_python(alpha),
+        'items': items,
+    }
+
+def analyze_quiz(quiz_id, chunk_size=10000):
+    """The statistics of a quiz, as compute() returns them."""
+    result = compute(load_matrix(quiz_id, chunk_size))
+    result['quiz_id'] = quiz_id
+    return result
+
+def analyze(quiz_ids, processes=1, chunk_size=10000):
+    """
+    Yields the statistics of each quiz, in order. With several processes,
+    the quizzes are analyzed in a pool of forked workers that each read
+    through connections of their own, and only see committed answers.
+    """
+    if processes <= 1:
+        for quiz_id in quiz_ids:
+            yield analyze_quiz(quiz_id, chunk_size)
+        return
+
+    # The workers would otherwise share the open connections
+    connections.close_all()
+    with ProcessPoolExecutor(processes) as executor:
+        yield from executor.map(analyze_quiz, quiz_ids, repeat(chunk_size))
+
+#########
+# Saving
+#########
+
+def save(result, batch_size=500):
+    """Stores the result of analyze_quiz() as a new QuizAnalysis."""
+    with transaction.atomic():
+        analysis = QuizAnalysis.objects.create(quiz_id=result['quiz_id'],
+            respondents=result['respondents'],
+            questions=result['questions'],
+            mean_score=result['mean_score'], alpha=result['alpha'])
+        ItemAnalysis.objects.bulk_create([
+            ItemAnalysis(analysis=analysis, **item)
+            for item in result['items']
+        ], batch_size=batch_size)
+    return analysis
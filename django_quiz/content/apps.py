@@ -2,4 +2,7 @@ from django.apps import AppConfig
 
 
 class ContentConfig(AppConfig):
-    name = 'content'
+    name = 'django_quiz.content'
+
+    def ready(self):
+        from . import signals
@@ -0,0 +1,155 @@
+"""
+In-process quiz bundles: the structure of a quiz (title, lesson, ordered
+questions and their correct answers) in compact objects, built with two
+queries and shared by views and grading until the quiz or its questions
+change.
+"""
+
+# Python
+from collections import OrderedDict
+from threading import Lock
+
+# Django
+from django.conf import settings
+from django.core.urlresolvers import reverse
+
+# Local
+from . import cache
+from .models import Question, Quiz
+
+class QuestionEntry(object):
+    __slots__ = ('id', 'position', 'body', 'correct_answer')
+
+    def __init__(self, id, position, body, correct_answer):
+        self.id = id
+        self.position = position
+        self.body = body
+        self.correct_answer = correct_answer
+
+    def get_absolute_url(self):
+        return reverse('question_detail', args=(self.id,))
+
+    def grade(self, choice):
+        # Same as Question.grade()
+        return choice == self.correct_answer
+
+class QuizBundle(object):
+    __slots__ = ('id', 'lesson_id', 'title', 'version', 'questions',
+        'by_id', 'numbers')
+
+    def __init__(self, id, lesson_id, title, version, questions):
+        self.id = id
+        self.lesson_id = lesson_id
+        self.title = title
+        self.version = version
+        self.questions = tuple(questions)
+        self.by_id = {question.id: question for question in self.questions}
+        self.numbers = {
+            question.id: number
+            for number, question in enumerate(self.questions, 1)
+        }
+
+    def __len__(self):
+        return len(self.questions)
+
+    def get_question(self, question_id):
+        return self.by_id.get(question_id)
+
+    def get_number(self, question_id):
+        """1-based position of the question within the quiz."""
+        return self.numbers[question_id]
+
+    def get_next_unanswered(self, answered_ids):
+        for question in self.questions:
+            if question.id not in answered_ids:
+                return question
+        return None
+
+    @classmethod
+    def build(cls, quiz_id, version):
+        lesson_id, title = Quiz.objects.filter(id=quiz_id).values_list(
+            'lesson_id', 'title').get()
+        questions = Question.objects.filter(quiz=quiz_id).order_by(
+            'position', 'id').values_list('id', 'position', 'body',
+            'correct_answer')
+        return cls(quiz_id, lesson_id, title, version,
+            (QuestionEntry(*values) for values in questions))
+
+class BundleCache(object):
+    """
+    Least recently used quiz bundles of this process. A bundle is rebuilt
+    when the content cache generation of its quiz has moved on since it
+    was built, so edits made through any process are seen, while edits to
+    other quizzes leave it resident.
+    """
+    def __init__(self, size=None):
+        self.size = size
+        self.bundles = OrderedDict()
+        # Question id -> quiz id for the questions of resident bundles
+        self.quiz_ids = {}
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_size(self):
+        if self.size is not None:
+            return self.size
+        return getattr(settings, 'QUIZ_BUNDLE_CACHE_SIZE', 256)
+
+    def get(self, quiz_id):
+        """Returns the bundle of quiz_id. Raises Quiz.DoesNotExist."""
+        version = cache.get_quiz_generation(quiz_id)
+
+        with self.lock:
+            bundle = self.bundles.get(quiz_id)
+            if bundle is not None and bundle.version == version:
+                self.bundles.move_to_end(quiz_id)
+                self.hits += 1
+                return bundle
+            self.misses += 1
+
+        # Built outside the lock; two threads may both build it, which is
+        # harmless
+        bundle = QuizBundle.build(quiz_id, version)
+        with self.lock:
+            self.discard(quiz_id)
+            self.bundles[quiz_id] = bundle
+            for question in bundle.questions:
+                self.quiz_ids[question.id] = quiz_id
+            while len(self.bundles) > self.get_size():
+                self.discard(next(iter(self.bundles)))
+        return bundle
+
+    def find(self, question_id):
+        """
+        Returns the up-to-date bundle holding question_id if its quiz is
+        resident, otherwise None.
+        """
+        quiz_id = self.quiz_ids.get(question_id)
+        if quiz_id is None:
+            return None
+        try:
+            bundle = self.get(quiz_id)
+        except Quiz.DoesNotExist as e:
+            return None
+        if bundle.get_question(question_id) is None:
+            # Moved to another quiz
+            return None
+        return bundle
+
+    def discard(self, quiz_id):
+        bundle = self.bundles.pop(quiz_id, None)
+        if bundle is not None:
+            for question in bundle.questions:
+                if self.quiz_ids.get(question.id) == quiz_id:
+                    del self.quiz_ids[question.id]
+
+    def clear(self):
+        with self.lock:
+            self.bundles.clear()
+            self.quiz_ids.clear()
+
+bundles = BundleCache()
+
+def get_bundle(quiz_id):
+    return bundles.get(quiz_id)
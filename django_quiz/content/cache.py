@@ -0,0 +1,160 @@
+"""
+Cache of lessons, quizzes and questions.
+
+Entries are keyed by a generation counter per model, which the signals in
+signals.py bump whenever a row of that model changes. Bumping makes every
+older entry unreachable, so web nodes sharing a cache backend stay
+coherent without purging anything; the stale entries simply expire.
+
+Each quiz also has a generation of its own, bumped when the quiz or one of
+its questions changes, for what is built from a single quiz (see
+bundles.py) and should survive edits to other quizzes.
+"""
+
+# Python
+from time import time
+
+# Django
+from django.conf import settings
+from django.core.cache import caches
+
+# Local
+from .models import Lesson, Question, Quiz
+
+MODELS = (Lesson, Quiz, Question)
+
+def get_cache():
+    return caches[getattr(settings, 'CONTENT_CACHE', 'default')]
+
+def get_timeout():
+    return getattr(settings, 'CONTENT_CACHE_TIMEOUT', 60 * 60)
+
+##############
+# Generations
+##############
+
+def _generation_key(model):
+    return 'content:generation:{0}'.format(model._meta.model_name)
+
+def _initial_generation():
+    # If a counter gets evicted, restarting from the clock keeps it from
+    # reusing the generations of entries that may still be cached
+    return int(time() * 1000000)
+
+def _quiz_generation_key(quiz_id):
+    return 'content:generation:quiz:{0}'.format(quiz_id)
+
+def _get_counter(key):
+    cache = get_cache()
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _initial_generation(), None)
+        generation = cache.get(key)
+    return generation
+
+def _increment_counter(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted or never set
+        cache.set(key, _initial_generation(), None)
+
+def get_generation(model):
+    return _get_counter(_generation_key(model))
+
+def get_generations(models=MODELS):
+    """Maps each model to its generation with a single cache round trip."""
+    cache = get_cache()
+    keys = {_generation_key(model): model for model in models}
+    generations = cache.get_many(keys)
+    missing = [model for key, model in keys.items() if key not in generations]
+    for model in missing:
+        generations[_generation_key(model)] = get_generation(model)
+    return {model: generations[key] for key, model in keys.items()}
+
+def bump(model):
+    """Invalidates every cached entry of model."""
+    _increment_counter(_generation_key(model))
+
+def get_quiz_generation(quiz_id):
+    return _get_counter(_quiz_generation_key(quiz_id))
+
+def bump_quizzes(quiz_ids):
+    """Invalidates what was built from the quizzes or their questions."""
+    for quiz_id in quiz_ids:
+        _increment_counter(_quiz_generation_key(quiz_id))
+
+##########
+# Lookups
+##########
+
+def get(model, pk):
+    """
+    Returns the model instance with primary key pk from the cache, or
+    from the database on a miss. Raises model.DoesNotExist like get().
+    """
+    return _get_or_load(model, 'object:{0}'.format(pk),
+        lambda: model._default_manager.get(pk=pk))
+
+def get_quizzes(lesson_id):
+    """The quizzes of a lesson, as a list."""
+    return _get_or_load(Quiz, 'lesson:{0}'.format(lesson_id),
+        lambda: list(Quiz.objects.filter(lesson=lesson_id).order_by('id')))
+
+def _get_or_load(model, name, load):
+    cache = get_cache()
+    key = 'content:{0}:{1}:{2}'.format(model._meta.model_name,
+        get_generation(model), name)
+    value = cache.get(key)
+    if value is None:
+        _count(model, 'misses')
+        value = load()
+        cache.set(key, value, get_timeout())
+    else:
+        _count(model, 'hits')
+    return value
+
+#############
+# Statistics
+#############
+
+STATS = ('hits', 'misses')
+
+def _stats_key(model, stat):
+    return 'content:stats:{0}:{1}'.format(model._meta.model_name, stat)
+
+def _count(model, stat):
+    increment(_stats_key(model, stat))
+
+def increment(key):
+    """
+    Adds one to a counter in the content cache, which is shared by all
+    processes so that counts add up over them.
+    """
+    cache = get_cache()
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+
+def get_stats():
+    """Maps each model name to its hits, misses and generation."""
+    cache = get_cache()
+    counts = cache.get_many([
+        _stats_key(model, stat) for model in MODELS for stat in STATS
+    ])
+    generations = get_generations()
+    stats = {}
+    for model in MODELS:
+        stats[model._meta.model_name] = {
+            stat: counts.get(_stats_key(model, stat), 0) for stat in STATS
+        }
+        stats[model._meta.model_name]['generation'] = generations[model]
+    return stats
+
+def reset_stats():
+    get_cache().delete_many([
+        _stats_key(model, stat) for model in MODELS for stat in STATS
+    ])
@@ -0,0 +1,121 @@
+"""
+Streaming exports of answers and quiz scores as CSV or JSON lines.
+
+Rows are read with keyset pagination on the primary key, one chunk of
+plain tuples at a time, so memory use does not depend on the size of the
+table.
+"""
+
+# Python
+import csv
+import json
+from datetime import datetime, time
+
+# Django
+from django.utils import timezone
+
+# Local
+from .models import Answer, QuizResult
+
+KINDS = ('answers', 'scores')
+FORMATS = ('csv', 'jsonl')
+
+# Column name -> lookup, per kind
+COLUMNS = {
+    'answers': (
+        ('id', 'id'),
+        ('user', 'user__username'),
+        ('lesson', 'question__quiz__lesson__title'),
+        ('quiz', 'question__quiz__title'),
+        ('question_id', 'question_id'),
+        ('question', 'question__body'),
+        ('choice', 'choice'),
+        ('is_correct', 'is_correct'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+    ),
+    'scores': (
+        ('id', 'id'),
+        ('user', 'user__username'),
+        ('lesson', 'quiz__lesson__title'),
+        ('quiz', 'quiz__title'),
+        ('answered', 'answered'),
+        ('correct', 'correct'),
+        ('total', 'total'),
+        ('completed_at', 'completed_at'),
+    ),
+}
+
+def get_queryset(kind, quiz=None, lesson=None, tag=None, since=None,
+        until=None):
+    """
+    The answers or quiz results to export. quiz and lesson are ids, tag a
+    tag name, and since and until bound the answer creation (or result
+    completion) date, until exclusive.
+    """
+    if kind == 'answers':
+        queryset = Answer.objects.all()
+        quiz_field, date_field = 'question__quiz', 'created_at'
+    else:
+        queryset = QuizResult.objects.all()
+        quiz_field, date_field = 'quiz', 'completed_at'
+
+    if quiz:
+        queryset = queryset.filter(**{quiz_field: quiz})
+    if lesson:
+        queryset = queryset.filter(**{quiz_field + '__lesson': lesson})
+    if tag:
+        queryset = queryset.filter(**{quiz_field + '__lesson__tags__name':
+            tag})
+    if since:
+        queryset = queryset.filter(**{date_field + '__gte': _start(since)})
+    if until:
+        queryset = queryset.filter(**{date_field + '__lt': _start(until)})
+    return queryset
+
+def _start(day):
+    """The start of day in the current time zone."""
+    if isinstance(day, datetime):
+        return day
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+def iter_rows(kind, queryset, chunk_size=2000):
+    """Yields the export rows of queryset as tuples, in primary key order."""
+    lookups = [lookup for name, lookup in COLUMNS[kind]]
+    rows = queryset.order_by('id').values_list(*lookups)
+    last_id = 0
+    while True:
+        chunk = list(rows.filter(id__gt=last_id)[:chunk_size])
+        yield from chunk
+        if len(chunk) < chunk_size:
+            return
+        last_id = chunk[-1][0]
+
+class Echo(object):
+    """A file-like object that returns what is written to it."""
+    def write(self, value):
+        return value
+
+def iter_csv(kind, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([name for name, lookup in COLUMNS[kind]])
+    for row in rows:
+        yield writer.writerow([_to_text(value) for value in row])
+
+def iter_jsonl(kind, rows):
+    names = [name for name, lookup in COLUMNS[kind]]
+    for row in rows:
+        yield json.dumps(dict(zip(names, (_to_text(value) if isinstance(
+            value, datetime) else value for value in row)))) + '\n'
+
+def export(kind, format, chunk_size=2000, **filters):
+    """Yields the chunks of text of an export."""
+    rows = iter_rows(kind, get_queryset(kind, **filters), chunk_size)
+    if format == 'csv':
+        return iter_csv(kind, rows)
+    return iter_jsonl(kind, rows)
+
+def _to_text(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
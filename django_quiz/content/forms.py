@@ -1,10 +1,100 @@
 # Django
+from django import forms
 from django.forms import ModelForm
 
 # Local
+from . import importer
+from .export import FORMATS, KINDS
 from .models import Answer
 
 class AnswerForm(ModelForm):
+    # Identifies one rendering of the form, so that submitting it twice
+    # answers once
+    token = forms.CharField(widget=forms.HiddenInput, required=False, 
+        max_length=32)
+
     class Meta:
         model = Answer
         fields = ('choice',)
+
+class QuizAnswerForm(forms.Form):
+    question = forms.IntegerField(widget=forms.HiddenInput)
+    choice = forms.BooleanField(required=False,
+        label=Answer._meta.get_field('choice').verbose_name,
+        help_text=Answer._meta.get_field('choice').help_text)
+
+class BaseQuizAnswerFormSet(forms.BaseFormSet):
+    """
+    One form per unanswered question of a quiz, submitted in a single POST.
+    """
+    def __init__(self, *args, **kwargs):
+        self.questions = kwargs.pop('questions')
+        kwargs.setdefault('initial', [
+            {'question': question.id} for question in self.questions
+        ])
+        super().__init__(*args, **kwargs)
+
+    def clean(self):
+        if any(self.errors):
+            return
+
+        question_ids = {question.id for question in self.questions}
+        submitted = set()
+        for form in self.forms:
+            question_id = form.cleaned_data['question']
+            if question_id not in question_ids:
+                raise forms.ValidationError(
+                    'This quiz has changed or was already answered.')
+            if question_id in submitted:
+                raise forms.ValidationError(
+                    'Each question can only be answered once.')
+            submitted.add(question_id)
+
+    def get_choices(self):
+        return {
+            form.cleaned_data['question']: form.cleaned_data['choice']
+            for form in self.forms
+        }
+
+QuizAnswerFormSet = forms.formset_factory(QuizAnswerForm,
+    formset=BaseQuizAnswerFormSet, extra=0)
+
+class ExportForm(forms.Form):
+    kind = forms.ChoiceField(choices=[(kind, kind) for kind in KINDS],
+        required=False)
+    format = forms.ChoiceField(choices=[(format, format) 
+        for format in FORMATS], required=False)
+    quiz = forms.IntegerField(required=False)
+    lesson = forms.IntegerField(required=False)
+    tag = forms.CharField(required=False)
+    since = forms.DateField(required=False)
+    until = forms.DateField(required=False)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        cleaned_data['kind'] = cleaned_data.get('kind') or KINDS[0]
+        cleaned_data['format'] = cleaned_data.get('format') or FORMATS[0]
+        return cleaned_data
+
+    def get_filters(self):
+        return {
+            name: self.cleaned_data[name] 
+            for name in ('quiz', 'lesson', 'tag', 'since', 'until')
+        }
+
+class ImportForm(forms.Form):
+    file = forms.FileField()
+    format = forms.ChoiceField(choices=[('', 'From the file extension')] + 
+        [(format, format) for format in importer.FORMATS], required=False)
+    dry_run = forms.BooleanField(required=False, 
+        help_text='Report what would be imported without saving it.')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        upload = cleaned_data.get('file')
+        if upload and not cleaned_data.get('format'):
+            try:
+                cleaned_data['format'] = importer.guess_format(upload.name)
+            except ValueError as e:
+                raise forms.ValidationError('{0} Choose a format.'.format(e))
+        return cleaned_data
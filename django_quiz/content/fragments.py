@@ -0,0 +1,119 @@
+"""
+Cache of rendered per-user fragments of question pages.
+
+Fragments are keyed by user and question together with two version
+counters: one per question, bumped when the question is edited or
+regraded, and one per user and question, bumped when that user's answer
+changes. Each change therefore invalidates only the fragments it
+affects. Fragments live in their own bounded cache (FRAGMENT_CACHE),
+whose MAX_ENTRIES and CULL_FREQUENCY options set the size and eviction.
+"""
+
+# Python
+from time import time
+
+# Django
+from django.conf import settings
+from django.core.cache import caches
+
+# Local
+from . import cache as content_cache
+
+def get_cache():
+    return caches[getattr(settings, 'FRAGMENT_CACHE', 'default')]
+
+def get_timeout():
+    return getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 60 * 60)
+
+###########
+# Versions
+###########
+
+def _question_key(question_id):
+    return 'fragment:version:question:{0}'.format(question_id)
+
+def _answer_key(user_id, question_id):
+    return 'fragment:version:answer:{0}:{1}'.format(user_id, question_id)
+
+def _bump(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted or never set. Restarting from the clock keeps it from
+        # reusing the versions of fragments that may still be cached.
+        cache.set(key, int(time() * 1000000), None)
+    content_cache.increment('fragment:stats:invalidations')
+
+def bump_question(question_id):
+    """Invalidates every user's fragments of the question."""
+    _bump(_question_key(question_id))
+
+def bump_answer(user_id, question_id):
+    """Invalidates the user's fragments of the question."""
+    _bump(_answer_key(user_id, question_id))
+
+def _get_versions(user_id, question_id):
+    cache = get_cache()
+    keys = (_question_key(question_id), _answer_key(user_id, question_id))
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, int(time() * 1000000), None)
+            versions[key] = cache.get(key)
+    return tuple(versions[key] for key in keys)
+
+############
+# Fragments
+############
+
+def _fragment_key(name, user_id, question_id):
+    return 'fragment:{0}:{1}:{2}:{3}:{4}'.format(name, user_id, question_id,
+        *_get_versions(user_id, question_id))
+
+def get(name, user_id, question_id, count_miss=True):
+    """
+    Returns the cached fragment, or None. With count_miss=False a miss is
+    not counted, for callers that only count it with record_miss() once
+    they know the fragment is needed.
+    """
+    html = get_cache().get(_fragment_key(name, user_id, question_id))
+    if html is not None:
+        content_cache.increment('fragment:stats:hits')
+    elif count_miss:
+        record_miss()
+    return html
+
+def record_miss():
+    content_cache.increment('fragment:stats:misses')
+
+def store(name, user_id, question_id, html):
+    get_cache().set(_fragment_key(name, user_id, question_id), html,
+        get_timeout())
+    content_cache.increment('fragment:stats:sets')
+
+def clear():
+    get_cache().clear()
+
+##########
+# Metrics
+##########
+
+STATS = ('hits', 'misses', 'sets', 'invalidations')
+
+def get_stats():
+    counts = content_cache.get_cache().get_many([
+        'fragment:stats:{0}'.format(stat) for stat in STATS
+    ])
+    stats = {
+        stat: counts.get('fragment:stats:{0}'.format(stat), 0)
+        for stat in STATS
+    }
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / lookups if lookups else 0
+    return stats
+
+def reset_stats():
+    content_cache.get_cache().delete_many([
+        'fragment:stats:{0}'.format(stat) for stat in STATS
+    ])
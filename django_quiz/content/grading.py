@@ -0,0 +1,62 @@
+# Django
+from django.db import transaction
+from django.db.models import F
+
+# Local
+from . import fragments
+from .models import Answer, QuestionStats, QuizResult
+
+def regrade_question(question, chunk_size=1000, progress=None):
+    """
+    Regrades every answer to question against its current correct_answer
+    and keeps the quiz results and question statistics in step.
+
+    Answers are updated with set-based UPDATEs over primary key ranges of
+    at most chunk_size rows, each range in its own transaction, so writers
+    are never blocked for long. progress, if given, is called after each
+    range with the number of answers processed and changed so far.
+    Returns the number of answers whose grade changed.
+    """
+    answers = Answer.objects.filter(question_id=question.id)
+    processed = changed = 0
+    last_id = 0
+
+    while True:
+        chunk = answers.filter(id__gt=last_id)
+        boundary = list(chunk.order_by('id').values_list('id', 
+            flat=True)[chunk_size - 1:chunk_size])
+        if boundary:
+            chunk = chunk.filter(id__lte=boundary[0])
+
+        with transaction.atomic():
+            count = chunk.count()
+            changed += _regrade(question, chunk)
+        processed += count
+        # Once committed, so that nothing renders the old grades again
+        fragments.bump_question(question.id)
+
+        if progress:
+            progress(processed, changed)
+        if not boundary:
+            return changed
+        last_id = boundary[0]
+
+def _regrade(question, answers):
+    gained = answers.filter(choice=question.correct_answer, is_correct=False)
+    lost = answers.exclude(choice=question.correct_answer).filter(
+        is_correct=True)
+
+    # Scores first, while gained and lost still select the stale answers.
+    # A user has at most one answer per question.
+    results = QuizResult.objects.filter(quiz_id=question.quiz_id)
+    results.filter(user__in=gained.values('user')).update(
+        correct=F('correct') + 1)
+    results.filter(user__in=lost.values('user')).update(
+        correct=F('correct') - 1)
+
+    gained_count = gained.update(is_correct=True)
+    lost_count = lost.update(is_correct=False)
+    if gained_count != lost_count:
+        QuestionStats.objects.filter(question_id=question.id).update(
+            correct=F('correct') + gained_count - lost_count)
+    return gained_count + lost_count
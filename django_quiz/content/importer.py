@@ -0,0 +1,483 @@
+"""
+Bulk import of lessons, quizzes and questions from JSON, JSON lines, YAML
+or CSV.
+
+Every format is read into a stream of flat rows, one per question (or per
+lesson or quiz without any). Rows are imported in batches: tags, lessons
+and quizzes are resolved by their natural keys (Tag.name, Lesson.title and
+Quiz.title) and questions by (quiz, body), with one query per model to
+find the existing rows, bulk_create() for the new ones and an UPDATE per
+changed field for the rest. Rows that would break a uniqueness constraint
+are skipped and reported as conflicts.
+
+Bulk inserts do not send signals, so the importer itself keeps the quiz
+result totals, the search index and the caches in step.
+"""
+
+# Python
+import csv
+import json
+from collections import Counter, OrderedDict, namedtuple
+from itertools import islice
+
+# Django
+from django.db import transaction
+from django.db.models import Case, Max, Value, When
+from django.utils import timezone
+
+# Local
+from . import cache, fragments, search
+from .grading import regrade_question
+from .models import Lesson, Question, Quiz, QuizResult
+from django_quiz.common.models import Tag
+
+FORMATS = ('json', 'jsonl', 'yaml', 'csv')
+
+CSV_COLUMNS = ('lesson', 'lesson_body', 'tags', 'quiz', 'question',
+    'correct_answer', 'position')
+
+Row = namedtuple('Row', 'line lesson lesson_body tags quiz question '
+    'correct_answer position')
+
+##########
+# Reading
+##########
+
+def guess_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension == 'yml':
+        return 'yaml'
+    if extension in FORMATS:
+        return extension
+    raise ValueError('Cannot tell the format of "{0}".'.format(filename))
+
+def read(file, format):
+    """
+    Yields the Rows of a text file. JSON lines and CSV are read as they
+    go; JSON and YAML documents are parsed whole. Raises ValueError on
+    malformed input.
+    """
+    readers = {
+        'json': _read_json,
+        'jsonl': _read_jsonl,
+        'yaml': _read_yaml,
+        'csv': _read_csv,
+    }
+    return readers[format](file)
+
+def _read_json(file):
+    try:
+        data = json.load(file)
+    except ValueError as e:
+        raise ValueError('Invalid JSON: {0}'.format(e))
+    for number, lesson in enumerate(_as_list(data), 1):
+        yield from _expand(lesson, number)
+
+def _read_jsonl(file):
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            lesson = json.loads(line)
+        except ValueError as e:
+            raise ValueError('Line {0}: invalid JSON: {1}'.format(number, e))
+        yield from _expand(lesson, number)
+
+def _read_yaml(file):
+    try:
+        import yaml
+    except ImportError as e:
+        raise ValueError('Reading YAML needs PyYAML (pip install pyyaml).')
+
+    number = 0
+    try:
+        for document in yaml.safe_load_all(file):
+            for lesson in _as_list(document):
+                number += 1
+                yield from _expand(lesson, number)
+    except yaml.YAMLError as e:
+        raise ValueError('Invalid YAML: {0}'.format(e))
+
+def _read_csv(file):
+    reader = csv.DictReader(file)
+    missing = {'lesson'} - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError('The CSV header needs the columns {0}.'.format(
+            ', '.join(CSV_COLUMNS)))
+    for values in reader:
+        tags = values.get('tags') or ''
+        yield _row(reader.line_num, values.get('lesson'),
+            values.get('lesson_body'),
+            [tag.strip() for tag in tags.split(',') if tag.strip()],
+            values.get('quiz'), values.get('question'),
+            _to_bool(values.get('correct_answer')),
+            _to_int(values.get('position'), reader.line_num))
+
+def _as_list(data):
+    if data is None:
+        return []
+    return data if isinstance(data, list) else [data]
+
+def _expand(lesson, line):
+    """
+    The rows of a lesson object with title, body, tags and quizzes, each
+    quiz with a title and questions, each question with a body,
+    correct_answer and position.
+    """
+    if not isinstance(lesson, dict):
+        raise ValueError('Lesson {0}: expected an object.'.format(line))
+    title = lesson.get('title')
+    body = lesson.get('body')
+    tags = lesson.get('tags') or []
+
+    quizzes = lesson.get('quizzes') or []
+    if not quizzes:
+        yield _row(line, title, body, tags)
+    for quiz in quizzes:
+        questions = quiz.get('questions') or []
+        if not questions:
+            yield _row(line, title, body, tags, quiz.get('title'))
+        for question in questions:
+            correct_answer = question.get('correct_answer')
+            yield _row(line, title, body, tags, quiz.get('title'),
+                question.get('body'),
+                None if correct_answer is None else bool(correct_answer),
+                _to_int(question.get('position'), line))
+
+def _row(line, lesson, lesson_body=None, tags=(), quiz=None, question=None,
+        correct_answer=None, position=None):
+    if not lesson:
+        raise ValueError('Line {0}: a lesson title is required.'.format(line))
+    if question and not quiz:
+        raise ValueError('Line {0}: a question needs a quiz.'.format(line))
+    return Row(line, lesson, lesson_body or None, tuple(tags), quiz or None,
+        question or None, correct_answer, position)
+
+def _to_bool(value):
+    if value is None or not value.strip():
+        return None
+    return value.strip().lower() in ('1', 'true', 't', 'yes', 'y')
+
+def _to_int(value, line):
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError) as e:
+        raise ValueError('Line {0}: invalid position "{1}".'.format(line,
+            value))
+
+############
+# Importing
+############
+
+class ImportReport(object):
+    def __init__(self):
+        self.created = Counter()
+        self.updated = Counter()
+        self.conflicts = []
+        self.regraded = 0
+        # Rows in committed batches
+        self.committed = 0
+
+    def add_conflict(self, row, message):
+        self.conflicts.append((row.line, message))
+
+class Importer(object):
+    """
+    Imports rows in batches of batch_size, each in its own transaction.
+    A dry run imports everything in one transaction and rolls it back, so
+    it reports exactly what an import would do.
+
+    Rows are read as they are imported, so malformed input raises
+    ValueError only once the batches before it are committed; its message
+    then says how many rows were. Importing the corrected file again
+    completes the import, as existing rows are updated in place.
+    """
+    # Marks in quiz_lessons the quizzes that belong to a lesson that is
+    # not the one of the file
+    OTHER_LESSON = object()
+
+    # Keeps the IN lists of each batch within the parameter limits of
+    # the databases (and of SQLite's debug query logging)
+    max_batch_size = 1000
+
+    def __init__(self, batch_size=1000, dry_run=False):
+        self.batch_size = min(batch_size, self.max_batch_size)
+        self.dry_run = dry_run
+        self.report = ImportReport()
+        # Quiz title -> lesson title, and (quiz title, body) -> row, as
+        # seen so far in the file
+        self.quiz_lessons = {}
+        self.questions = {}
+        # Quiz id -> position for its next new question
+        self.next_positions = {}
+        # Ids of the quizzes in committed batches
+        self.quiz_ids = set()
+
+    def run(self, rows):
+        if self.dry_run:
+            with transaction.atomic():
+                self._run(rows)
+                transaction.set_rollback(True)
+        else:
+            self._run(rows)
+        return self.report
+
+    def _run(self, rows):
+        rows = iter(rows)
+        try:
+            while True:
+                try:
+                    batch = list(islice(rows, self.batch_size))
+                except ValueError as e:
+                    if self.dry_run or not self.report.committed:
+                        raise
+                    raise ValueError('{0} The {1} rows before it were '
+                        'imported.'.format(e, self.report.committed)) from e
+                if not batch:
+                    break
+                with transaction.atomic():
+                    regrade, quiz_ids = self.import_batch(batch)
+                if not self.dry_run:
+                    self.report.committed += len(batch)
+                    self.quiz_ids.update(quiz_ids)
+                    # Regraded in transactions of their own, see grading.py
+                    for question in regrade:
+                        self.report.regraded += regrade_question(question)
+        finally:
+            if self.report.committed:
+                for model in cache.MODELS:
+                    cache.bump(model)
+                cache.bump_quizzes(self.quiz_ids)
+
+    def import_batch(self, rows):
+        """
+        Imports rows; returns the questions whose answer changed and the
+        ids of the quizzes of the rows.
+        """
+        rows = self.check_conflicts(rows)
+        now = timezone.now()
+
+        tag_ids = self.upsert_tags({tag for row in rows for tag in row.tags})
+        lesson_ids, retagged = self.upsert_lessons(rows, tag_ids, now)
+        quiz_ids = self.upsert_quizzes(rows, lesson_ids, now)
+        question_ids, regrade = self.upsert_questions(rows, quiz_ids, now)
+
+        self.update_index(lesson_ids.values(), retagged, question_ids)
+        return regrade, quiz_ids.values()
+
+    def check_conflicts(self, rows):
+        """Drops and reports rows that contradict earlier rows."""
+        checked = []
+        for row in rows:
+            if row.quiz:
+                lesson = self.quiz_lessons.setdefault(row.quiz, row.lesson)
+                if lesson is self.OTHER_LESSON:
+                    self.report.add_conflict(row, 'Quiz "{0}" belongs to '
+                        'another lesson; quiz titles are unique.'.format(
+                        row.quiz))
+                    continue
+                if lesson != row.lesson:
+                    self.report.add_conflict(row, 'Quiz "{0}" is already in '
+                        'lesson "{1}"; quiz titles are unique.'.format(
+                        row.quiz, lesson))
+                    continue
+            if row.question:
+                key = (row.quiz, row.question)
+                seen = self.questions.setdefault(key, row)
+                if seen is not row and (seen.correct_answer,
+                        seen.position) != (row.correct_answer, row.position):
+                    self.report.add_conflict(row, 'Question "{0}" of quiz '
+                        '"{1}" differs from line {2}; questions are unique '
+                        'within a quiz.'.format(row.question, row.quiz,
+                        seen.line))
+                    continue
+            checked.append(row)
+        return checked
+
+    def upsert_tags(self, names):
+        """Maps each tag name to its id, creating the missing tags."""
+        tag_ids = dict(Tag.objects.filter(name__in=names).values_list(
+            'name', 'id'))
+        missing = names - set(tag_ids)
+        if missing:
+            Tag.objects.bulk_create([Tag(name=name) for name in missing])
+            tag_ids.update(Tag.objects.filter(name__in=missing).values_list(
+                'name', 'id'))
+            self.report.created['tags'] += len(missing)
+        return tag_ids
+
+    def upsert_lessons(self, rows, tag_ids, now):
+        """
+        Maps each lesson title to its id and returns the ids of the lessons
+        that got new tags.
+        """
+        lessons = OrderedDict()
+        for row in rows:
+            body, tags = lessons.get(row.lesson, (None, set()))
+            lessons[row.lesson] = (row.lesson_body or body, tags | set(
+                row.tags))
+
+        existing = {
+            title: (id, body) for id, title, body in Lesson.objects.filter(
+                title__in=lessons).values_list('id', 'title', 'body')
+        }
+        new = [title for title in lessons if title not in existing]
+        if new:
+            Lesson.objects.bulk_create([
+                Lesson(title=title, body=lessons[title][0] or '')
+                for title in new
+            ])
+            self.report.created['lessons'] += len(new)
+        lesson_ids = dict(Lesson.objects.filter(title__in=lessons)
+            .values_list('title', 'id'))
+
+        changed = {
+            existing[title][0]: body
+            for title, (body, tags) in lessons.items()
+            if title in existing and body and body != existing[title][1]
+        }
+        _update(Lesson, changed, 'body', now)
+        self.report.updated['lessons'] += len(changed)
+
+        # Tags are only ever added
+        Through = Lesson.tags.through
+        wanted = {
+            (lesson_ids[title], tag_ids[tag])
+            for title, (body, tags) in lessons.items() for tag in tags
+        }
+        linked = set(Through.objects.filter(
+            lesson_id__in=lesson_ids.values(),
+            tag_id__in=tag_ids.values()).values_list('lesson_id', 'tag_id'))
+        missing = wanted - linked
+        Through.objects.bulk_create([
+            Through(lesson_id=lesson_id, tag_id=tag_id)
+            for lesson_id, tag_id in missing
+        ])
+        retagged = {lesson_id for lesson_id, tag_id in missing}
+        Lesson.objects.filter(id__in=retagged - set(changed)).update(
+            updated_at=now)
+        return lesson_ids, retagged
+
+    def upsert_quizzes(self, rows, lesson_ids, now):
+        """Maps each quiz title to its id, creating the missing quizzes."""
+        quizzes = OrderedDict((row.quiz, row) for row in rows if row.quiz)
+        existing = dict(Quiz.objects.filter(title__in=quizzes).values_list(
+            'title', 'lesson_id'))
+
+        for title, lesson_id in existing.items():
+            if lesson_id != lesson_ids[quizzes[title].lesson]:
+                self.report.add_conflict(quizzes[title], 'Quiz "{0}" '
+                    'belongs to another lesson; quiz titles are '
+                    'unique.'.format(title))
+                # Its rows are skipped: their quiz does not resolve
+                self.quiz_lessons[title] = self.OTHER_LESSON
+
+        new = [title for title in quizzes if title not in existing]
+        if new:
+            Quiz.objects.bulk_create([
+                Quiz(title=title, lesson_id=lesson_ids[quizzes[title].lesson])
+                for title in new
+            ])
+            self.report.created['quizzes'] += len(new)
+
+        return {
+            title: id for title, id, lesson_id in Quiz.objects.filter(
+                title__in=quizzes).values_list('title', 'id', 'lesson_id')
+            if lesson_id == lesson_ids[quizzes[title].lesson]
+        }
+
+    def upsert_questions(self, rows, quiz_ids, now):
+        """
+        Returns the ids of the created and updated questions, and the
+        questions whose correct answer changed.
+        """
+        questions = OrderedDict(
+            ((quiz_ids[row.quiz], row.question), row) for row in rows
+            if row.question and row.quiz in quiz_ids)
+        if not questions:
+            return set(), []
+
+        existing = {
+            (quiz_id, body): (id, correct_answer, position)
+            for id, quiz_id, body, correct_answer, position in
+            Question.objects.filter(quiz_id__in={quiz_id for quiz_id, body
+                in questions}, body__in={body for quiz_id, body in questions})
+            .values_list('id', 'quiz_id', 'body', 'correct_answer',
+                'position')
+        }
+
+        new = [key for key in questions if key not in existing]
+        self.load_next_positions({quiz_id for quiz_id, body in new})
+        created = Counter()
+        objs = []
+        for quiz_id, body in new:
+            row = questions[(quiz_id, body)]
+            position = row.position
+            if position is None:
+                position = self.next_positions[quiz_id]
+            self.next_positions[quiz_id] = max(self.next_positions[quiz_id],
+                position + 1)
+            objs.append(Question(quiz_id=quiz_id, body=body,
+                correct_answer=bool(row.correct_answer), position=position))
+            created[quiz_id] += 1
+        Question.objects.bulk_create(objs)
+        self.report.created['questions'] += len(objs)
+
+        answers = {}
+        positions = {}
+        for key, (id, correct_answer, position) in existing.items():
+            row = questions[key]
+            if row.correct_answer is not None and (
+                    row.correct_answer != correct_answer):
+                answers[id] = row.correct_answer
+            if row.position is not None and row.position != position:
+                positions[id] = row.position
+        _update(Question, answers, 'correct_answer', now)
+        _update(Question, positions, 'position', now)
+        updated = set(answers) | set(positions)
+        self.report.updated['questions'] += len(updated)
+        if not self.dry_run:
+            for question_id in updated:
+                fragments.bump_question(question_id)
+
+        # The bookkeeping of Question's post_save signal
+        for quiz_id, count in created.items():
+            QuizResult.objects.record_questions(quiz_id, count)
+
+        question_ids = updated | set(Question.objects.filter(
+            quiz_id__in=created, body__in=[body for quiz_id, body in new])
+            .values_list('id', flat=True))
+        return question_ids, list(Question.objects.filter(id__in=answers))
+
+    def load_next_positions(self, quiz_ids):
+        missing = quiz_ids - set(self.next_positions)
+        last = dict(Question.objects.filter(quiz_id__in=missing).values(
+            'quiz_id').annotate(last=Max('position')).values_list(
+            'quiz_id', 'last'))
+        for quiz_id in missing:
+            position = last.get(quiz_id)
+            self.next_positions[quiz_id] = 0 if position is None else (
+                position + 1)
+
+    def update_index(self, lesson_ids, retagged, question_ids):
+        if not search.is_available():
+            return
+        search.index_lessons(Lesson.objects.filter(id__in=lesson_ids))
+        search.index_questions(Question.objects.filter(id__in=question_ids))
+        # Questions carry their lesson's tags
+        if retagged:
+            search.index_questions(Question.objects.filter(
+                quiz__lesson__in=retagged).exclude(id__in=question_ids))
+
+def _update(model, values, field, now, chunk_size=500):
+    """Sets field to values[id] for each id, with an UPDATE per chunk."""
+    values = list(values.items())
+    for start in range(0, len(values), chunk_size):
+        chunk = dict(values[start:start + chunk_size])
+        model.objects.filter(id__in=chunk).update(updated_at=now, **{
+            field: Case(*[When(id=id, then=Value(value))
+                for id, value in chunk.items()],
+                output_field=model._meta.get_field(field))
+        })
@@ -0,0 +1,292 @@
+"""
+Write-behind ingestion of answers.
+
+With ANSWER_INGESTION_MODE = 'queue', AnswerCreateView appends answers to
+a queue in a side SQLite database (ANSWER_QUEUE_PATH) instead of writing
+them to the answers table. A worker thread in each web process, or the
+drain_answer_queue command, moves them into the answers table in batches
+with one transaction and bulk_create() each, so that a spike of
+submissions costs a few write transactions on the main database rather
+than one per answer.
+
+Queued answers are durable: the queue is committed before the view
+responds, and rows leave it only once their batch is committed. Until then
+their author still sees them, as the answer loader (which also finds the
+next question) and the quiz validators read the user's queued answers
+too; the pages that show a score drain the user's answers first.
+"""
+
+# Python
+import logging
+import sqlite3
+from os.path import join
+from threading import Event, Lock, Thread, local
+from time import time
+
+# Django
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+# Local
+from . import fragments
+from .models import Answer, Question
+
+logger = logging.getLogger('django_quiz.ingest')
+
+MODES = ('sync', 'queue')
+
+def is_enabled():
+    return getattr(settings, 'ANSWER_INGESTION_MODE', 'sync') == 'queue'
+
+def get_batch_size():
+    return getattr(settings, 'ANSWER_QUEUE_BATCH_SIZE', 500)
+
+########
+# Queue
+########
+
+class AnswerQueue(object):
+    """
+    Answers waiting to be written, in a side SQLite database. Each thread
+    has its own connection. A user has at most one queued answer per
+    question; later ones are ignored, like duplicate answers.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.local = local()
+
+    def get_connection(self):
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            # Autocommit: every statement is its own transaction
+            connection = sqlite3.connect(self.path, timeout=30,
+                isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # Commits survive a crash of the process; only losing power
+            # can lose the last ones
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS answer_queue ('
+                'id INTEGER PRIMARY KEY, '
+                'user_id INTEGER NOT NULL, '
+                'question_id INTEGER NOT NULL, '
+                'choice INTEGER NOT NULL, '
+                'is_correct INTEGER NOT NULL, '
+                'queued_at REAL NOT NULL, '
+                'UNIQUE (user_id, question_id))')
+            self.local.connection = connection
+        return connection
+
+    def close(self):
+        """Closes the connection of the calling thread."""
+        connection = getattr(self.local, 'connection', None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+
+    def put(self, user_id, question_id, choice, is_correct):
+        """
+        Queues an answer. Returns False if the user already has a queued
+        answer to the question.
+        """
+        cursor = self.get_connection().execute(
+            'INSERT OR IGNORE INTO answer_queue (user_id, question_id, '
+            'choice, is_correct, queued_at) VALUES (?, ?, ?, ?, ?)',
+            (user_id, question_id, choice, is_correct, time()))
+        return cursor.rowcount == 1
+
+    def get_pending(self, user_id):
+        """Maps question id to (choice, is_correct) of the user's answers."""
+        rows = self.get_connection().execute(
+            'SELECT question_id, choice, is_correct FROM answer_queue '
+            'WHERE user_id = ?', (user_id,))
+        return {
+            question_id: (bool(choice), bool(is_correct))
+            for question_id, choice, is_correct in rows
+        }
+
+    def take(self, limit, user_id=None):
+        """
+        The oldest queued answers, as (id, user_id, question_id, choice)
+        rows. They stay queued until remove()d.
+        """
+        sql = 'SELECT id, user_id, question_id, choice FROM answer_queue'
+        params = ()
+        if user_id is not None:
+            sql += ' WHERE user_id = ?'
+            params = (user_id,)
+        return self.get_connection().execute(sql + ' ORDER BY id LIMIT ?',
+            params + (limit,)).fetchall()
+
+    def remove(self, ids, chunk_size=500):
+        connection = self.get_connection()
+        ids = list(ids)
+        for start in range(0, len(ids), chunk_size):
+            chunk = ids[start:start + chunk_size]
+            connection.execute('DELETE FROM answer_queue WHERE id IN ({0})'
+                .format(', '.join('?' * len(chunk))), chunk)
+
+    def __len__(self):
+        return self.get_connection().execute(
+            'SELECT COUNT(*) FROM answer_queue').fetchone()[0]
+
+_queues = {}
+_queues_lock = Lock()
+
+def get_queue():
+    """The queue at ANSWER_QUEUE_PATH, shared by the threads of a process."""
+    path = getattr(settings, 'ANSWER_QUEUE_PATH',
+        join(settings.BASE_DIR, 'answer_queue.sqlite3'))
+    with _queues_lock:
+        if path not in _queues:
+            _queues[path] = AnswerQueue(path)
+        return _queues[path]
+
+############
+# Enqueuing
+############
+
+def enqueue(user, question, choice):
+    """
+    Queues the user's answer to question. Returns False if the user
+    already has a queued answer to it.
+    """
+    queued = get_queue().put(user.pk, question.id, choice,
+        question.grade(choice))
+    if queued:
+        fragments.bump_answer(user.pk, question.id)
+        if getattr(settings, 'ANSWER_QUEUE_WORKER', True):
+            start_worker()
+    return queued
+
+def get_pending(user):
+    """
+    Maps question id to (choice, is_correct) of the user's answers that
+    are still queued; empty unless queueing is enabled.
+    """
+    if not is_enabled() or not user.is_authenticated():
+        return {}
+    return get_queue().get_pending(user.pk)
+
+###########
+# Draining
+###########
+
+def write_answers(rows):
+    """
+    Writes queued (id, user_id, question_id, choice) rows to the answers
+    table in one transaction, skipping questions that were answered or
+    deleted since. Returns the number of answers written.
+    """
+    questions = Question.objects.in_bulk(list({row[2] for row in rows}))
+    with transaction.atomic():
+        existing = set(Answer.objects.filter(
+            user_id__in={row[1] for row in rows},
+            question_id__in=list(questions))
+            .values_list('user_id', 'question_id'))
+        answers = []
+        for id, user_id, question_id, choice in rows:
+            question = questions.get(question_id)
+            if question is None or (user_id, question_id) in existing:
+                continue
+            existing.add((user_id, question_id))
+            # Graded again, in case the question changed while queued
+            answers.append(Answer(user_id=user_id, question=question,
+                choice=bool(choice), is_correct=question.grade(bool(choice))))
+        Answer.objects.bulk_create(answers)
+        # bulk_create() does not send post_save
+        Answer.objects.record_created(answers)
+    return len(answers)
+
+# Keeps the threads of a process from draining the same rows; held for
+# one batch at a time, so that a user's drain waits for at most one
+# batch of the worker's
+_drain_lock = Lock()
+
+# Writes of a batch, as concurrent drains can commit some of its answers
+# between the check for existing answers and the insert
+WRITE_ATTEMPTS = 2
+
+def _drain_batch(batch_size, user_id=None):
+    """
+    Moves one batch of queued answers into the answers table. Returns the
+    number of rows taken and of answers written; rows that could not be
+    written in WRITE_ATTEMPTS stay queued.
+    """
+    queue = get_queue()
+    with _drain_lock:
+        rows = queue.take(batch_size, user_id=user_id)
+        if not rows:
+            return 0, 0
+        for attempt in range(1, WRITE_ATTEMPTS + 1):
+            try:
+                written = write_answers(rows)
+                break
+            except IntegrityError:
+                # Another process drained some of them first; the next
+                # attempt skips those
+                if attempt == WRITE_ATTEMPTS:
+                    raise
+        # After the commit: a crash in between writes nothing twice,
+        # as the rows are skipped as already answered when drained again
+        queue.remove(row[0] for row in rows)
+    return len(rows), written
+
+def drain(batch_size=None, user_id=None):
+    """
+    Moves queued answers (only the user's, if user_id is given) into the
+    answers table until there are none left. Returns the number written.
+    Raises IntegrityError if a batch keeps conflicting with other writers;
+    the batches before it are committed and its rows stay queued.
+    """
+    batch_size = batch_size or get_batch_size()
+    written = 0
+    while True:
+        taken, batch_written = _drain_batch(batch_size, user_id=user_id)
+        if not taken:
+            return written
+        written += batch_written
+
+def drain_user(user):
+    """Writes the user's queued answers, for pages that show scores."""
+    if get_pending(user):
+        try:
+            drain(user_id=user.pk)
+        except IntegrityError:
+            # Left queued for the worker; the page shows the scores
+            # without them
+            logger.exception('Draining the answers of user %s failed',
+                user.pk)
+
+#########
+# Worker
+#########
+
+class Worker(Thread):
+    """Drains the queue in the background of a web process."""
+    def __init__(self, interval):
+        super().__init__(name='answer-ingest', daemon=True)
+        self.interval = interval
+        self.stopped = Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                drain()
+            except Exception as e:
+                # Left queued for the next round
+                logger.exception('Draining the answer queue failed')
+
+    def stop(self):
+        self.stopped.set()
+
+_worker = None
+_worker_lock = Lock()
+
+def start_worker():
+    """Starts the worker of this process unless it is running."""
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = Worker(getattr(settings, 'ANSWER_QUEUE_INTERVAL', 0.5))
+            _worker.start()
+    return _worker
@@ -0,0 +1,62 @@
+# Local
+from .ingest import get_pending
+from .models import Answer
+
+class AnswerLoader(object):
+    """
+    Batches lookups of one user's answers. Question ids are collected with
+    prime() and fetched together, with a single IN query, the first time
+    any of them is loaded.
+    """
+    def __init__(self, user):
+        self.user = user
+        self.pending = set()
+        self.answers = {}
+
+    def prime(self, questions):
+        for question in questions:
+            question_id = getattr(question, 'pk', question)
+            if question_id not in self.answers:
+                self.pending.add(question_id)
+
+    def load(self, question):
+        question_id = getattr(question, 'pk', question)
+        if question_id not in self.answers:
+            self.pending.add(question_id)
+            self.fetch()
+        return self.answers[question_id]
+
+    def fetch(self):
+        question_ids, self.pending = self.pending, set()
+        self.answers.update(dict.fromkeys(question_ids))
+        answers = Answer.objects.filter(user=self.user, 
+            question_id__in=question_ids)
+        for answer in answers:
+            self.answers[answer.question_id] = answer
+
+        # Answers still waiting in the ingestion queue, as unsaved ones
+        for question_id, (choice, is_correct) in get_pending(
+                self.user).items():
+            if question_id in question_ids and not self.answers[question_id]:
+                self.answers[question_id] = Answer(user=self.user, 
+                    question_id=question_id, choice=choice, 
+                    is_correct=is_correct)
+
+    def get_next_unanswered(self, bundle):
+        """
+        The first question of the quiz bundle that the user has not
+        answered, queued answers included, or None. Fetches the answers to
+        all of its questions with one query.
+        """
+        question_ids = [question.id for question in bundle.questions]
+        self.prime(question_ids)
+        return bundle.get_next_unanswered({question_id 
+            for question_id in question_ids if self.load(question_id)})
+
+def get_answer_loader(request):
+    """Returns the answer loader of the request's user, creating it once."""
+    loader = getattr(request, '_answer_loader', None)
+    if loader is None:
+        loader = AnswerLoader(request.user)
+        request._answer_loader = loader
+    return loader
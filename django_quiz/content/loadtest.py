@@ -0,0 +1,125 @@
+# Python
+from collections import defaultdict
+from random import Random
+from statistics import mean
+from threading import Lock, Thread
+from timeit import default_timer
+
+# Django
+from django.contrib.auth.models import User
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+# Local
+from .models import Lesson, Question
+
+class ViewStats(object):
+    def __init__(self):
+        self.timings = []
+        self.queries = []
+        self.errors = 0
+
+    def percentile(self, percent):
+        """Nearest-rank percentile of the timings in milliseconds."""
+        if not self.timings:
+            return 0
+        timings = sorted(self.timings)
+        rank = max(int(round(percent / 100 * len(timings))), 1)
+        return timings[rank - 1]
+
+    @property
+    def mean_queries(self):
+        return mean(self.queries) if self.queries else 0
+
+class LoadTest(object):
+    """
+    Drives the lesson -> quiz -> question -> answer -> review flow through
+    the Django test client with one thread per simulated user, and records
+    latency and query counts per URL name.
+
+    Runs against the configured database, which is expected to hold data
+    generated by seed_quiz_data with the same prefix.
+    """
+    def __init__(self, prefix='seed', users=10, iterations=1, seed=0):
+        self.prefix = prefix
+        self.users = users
+        self.iterations = iterations
+        self.seed = seed
+        self.stats = defaultdict(ViewStats)
+        self.lock = Lock()
+
+    def run(self):
+        users = list(User.objects.filter(
+            username__startswith='{0}-user-'.format(self.prefix))
+            .order_by('id')[:self.users])
+        self.quizzes = defaultdict(list)
+        for lesson_id, quiz_id in (Lesson.objects.filter(
+                title__startswith='{0} lesson '.format(self.prefix))
+                .exclude(quiz=None).values_list('id', 'quiz')):
+            self.quizzes[lesson_id].append(quiz_id)
+        if not users or not self.quizzes:
+            raise ValueError('No data found with the prefix "{0}".'.format(
+                self.prefix))
+
+        threads = [
+            Thread(target=self.simulate, args=(user, Random(self.seed + i)))
+            for i, user in enumerate(users)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return self.stats
+
+    def simulate(self, user, random):
+        try:
+            client = Client()
+            client.force_login(user)
+            for i in range(self.iterations):
+                self.walk(client, user, random)
+        finally:
+            # Every thread has its own connection
+            connection.close()
+
+    def walk(self, client, user, random):
+        lesson_id = random.choice(list(self.quizzes))
+        quiz_id = random.choice(self.quizzes[lesson_id])
+
+        self.request(client, 'lesson_list', ())
+        self.request(client, 'lesson_detail', (lesson_id,))
+        self.request(client, 'quiz_detail', (quiz_id,))
+
+        answered = set(Question.objects.filter(quiz_id=quiz_id,
+            answer__user=user).values_list('id', flat=True))
+        for question_id in Question.objects.filter(
+                quiz_id=quiz_id).values_list('id', flat=True):
+            self.request(client, 'question_detail', (question_id,))
+            if question_id not in answered:
+                self.request(client, 'answer_create', (question_id,),
+                    data={'choice': random.random() < 0.5})
+
+        self.request(client, 'quiz_answer_list', (quiz_id,))
+
+    def request(self, client, url_name, args, data=None):
+        url = reverse(url_name, args=args)
+        method = client.get if data is None else client.post
+
+        with CaptureQueriesContext(connection) as queries:
+            start = default_timer()
+            try:
+                response = method(url, data)
+                failed = response.status_code >= 400
+            except Exception as e:
+                failed = True
+            elapsed = (default_timer() - start) * 1000
+
+        with self.lock:
+            stats = self.stats[url_name]
+            if failed:
+                stats.errors += 1
+            else:
+                stats.timings.append(elapsed)
+                stats.queries.append(len(queries))
@@ -0,0 +1,46 @@
+# Python
+from statistics import median
+from timeit import default_timer
+
+# Django
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+class BenchmarkCommand(BaseCommand):
+    """
+    Base class for benchmark commands.
+
+    Benchmarks run against a throwaway test database so that they never
+    touch the development data. Subclasses implement run_benchmark().
+    """
+    repeat = 20
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=self.repeat,
+            help='Timed runs per measurement (default: %(default)s)')
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        if connection.settings_dict['NAME'] == (
+                connection.creation._get_test_db_name()):
+            # Already on the test database, as under the test runner
+            self.run_benchmark(*args, **options)
+            return
+        old_name = connection.creation.create_test_db(verbosity=0,
+            autoclobber=True, serialize=False)
+        try:
+            self.run_benchmark(*args, **options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run_benchmark(self, *args, **options):
+        raise NotImplementedError
+
+    def measure(self, func):
+        """Returns the median wall time of func() in milliseconds."""
+        timings = []
+        for i in range(self.repeat):
+            start = default_timer()
+            func()
+            timings.append((default_timer() - start) * 1000)
+        return median(timings)
@@ -0,0 +1,42 @@
+# Django
+from django.core.management.base import BaseCommand, CommandError
+
+# Local
+from django_quiz.content import analysis
+from django_quiz.content.models import Quiz
+
+class Command(BaseCommand):
+    help = ('Computes item difficulty and discrimination, Cronbach\'s alpha '
+        'and distractor statistics of quizzes, and stores them as quiz '
+        'analyses.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('quiz_ids', nargs='*', type=int,
+            help='Quizzes to analyze (default: all)')
+        parser.add_argument('--processes', type=int, default=1,
+            help='Quizzes analyzed in parallel (default: %(default)s)')
+        parser.add_argument('--chunk-size', type=int, default=10000,
+            help='Answers read per query (default: %(default)s)')
+
+    def handle(self, *args, **options):
+        if not analysis.is_available():
+            raise CommandError('Item analysis needs NumPy '
+                '(pip install numpy).')
+
+        quiz_ids = options['quiz_ids'] or list(
+            Quiz.objects.order_by('id').values_list('id', flat=True))
+        missing = set(quiz_ids) - set(Quiz.objects.filter(id__in=quiz_ids)
+            .values_list('id', flat=True))
+        if missing:
+            raise CommandError('No quiz with id {0}.'.format(
+                ', '.join(str(quiz_id) for quiz_id in sorted(missing))))
+
+        results = analysis.analyze(quiz_ids, processes=options['processes'],
+            chunk_size=options['chunk_size'])
+        for result in results:
+            analysis.save(result)
+            alpha = result['alpha']
+            self.stdout.write('Quiz {0}: {1} respondents, {2} questions, '
+                'alpha {3}.'.format(result['quiz_id'],
+                result['respondents'], result['questions'],
+                'N/A' if alpha is None else '{0:.2f}'.format(alpha)))
@@ -0,0 +1,107 @@
+# Python
+from os.path import join
+from shutil import rmtree
+from statistics import median
+from tempfile import mkdtemp
+from threading import Barrier, Thread
+from timeit import default_timer
+
+# Django
+from django.contrib.auth.models import User
+from django.core.urlresolvers import reverse
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+
+# Local
+from ._benchmark import BenchmarkCommand
+from django_quiz.content import ingest
+from django_quiz.content.models import Answer, Question, QuizResult
+from django_quiz.content.seeding import seed
+
+class Command(BenchmarkCommand):
+    help = ('Times answer submissions from concurrent users with answers '
+        'written synchronously and through the ingestion queue.')
+
+    repeat = 3
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--users', type=int, default=20,
+            help='Concurrent users (default: %(default)s)')
+        parser.add_argument('--questions', type=int, default=20,
+            help='Questions answered by each user (default: %(default)s)')
+
+    def run_benchmark(self, *args, **options):
+        seed(prefix='benchmark', lessons=1, tags=0, quizzes_per_lesson=1,
+            questions_per_quiz=options['questions'], 
+            users=options['users'], answer_rate=0)
+        self.users = list(User.objects.filter(
+            username__startswith='benchmark-user-'))
+        self.urls = [reverse('answer_create', args=(question_id,))
+            for question_id in Question.objects.order_by('position', 
+                'id').values_list('id', flat=True)]
+        answers = len(self.users) * len(self.urls)
+
+        self.stdout.write('{0:>6} {1:>8} {2:>12} {3:>12} {4:>10}'.format(
+            'mode', 'answers', 'submit', 'drain', 'answers/s'))
+        directory = mkdtemp()
+        try:
+            with override_settings(ANSWER_INGESTION_MODE='queue', 
+                    ANSWER_QUEUE_PATH=join(directory, 'queue.sqlite3'),
+                    ANSWER_QUEUE_WORKER=False):
+                queue = self.time_mode(ingest.drain)
+            sync = self.time_mode(lambda: None)
+        finally:
+            rmtree(directory)
+
+        for mode, (submit, drain) in (('sync', sync), ('queue', queue)):
+            self.stdout.write('{0:>6} {1:>8} {2:>10.1f}ms {3:>10.1f}ms '
+                '{4:>10.0f}'.format(mode, answers, submit, drain, 
+                answers / submit * 1000))
+
+    def time_mode(self, drain):
+        """Median submit and drain times in milliseconds."""
+        submits, drains = [], []
+        for i in range(self.repeat):
+            Answer.objects.all().delete()
+            QuizResult.objects.all().delete()
+            submits.append(self.submit_all())
+
+            start = default_timer()
+            drain()
+            drains.append((default_timer() - start) * 1000)
+            assert Answer.objects.count() == len(self.users) * len(self.urls)
+        return median(submits), median(drains)
+
+    def submit_all(self):
+        """
+        Answers every question as every user, one thread per user, and
+        returns the wall time in milliseconds.
+        """
+        clients = []
+        for user in self.users:
+            client = Client()
+            client.force_login(user)
+            clients.append(client)
+        barrier = Barrier(len(clients) + 1)
+
+        def submit(client):
+            try:
+                barrier.wait()
+                for url in self.urls:
+                    client.post(url, {'choice': True})
+            finally:
+                # Every thread has its own connection
+                connection.close()
+                ingest.get_queue().close()
+
+        threads = [Thread(target=submit, args=(client,)) 
+            for client in clients]
+        for thread in threads:
+            thread.start()
+        barrier.wait()
+        start = default_timer()
+        for thread in threads:
+            thread.join()
+        return (default_timer() - start) * 1000
@@ -0,0 +1,76 @@
+# Django
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Local
+from ._benchmark import BenchmarkCommand
+from django_quiz.content.models import Answer, Lesson, Question, Quiz
+
+class Command(BenchmarkCommand):
+    help = ('Times the quiz progress queries for a user with a growing '
+        'number of answers in other quizzes.')
+
+    history_sizes = (10, 100, 1000, 10000, 100000)
+    questions_per_quiz = 1000
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--sizes', type=int, nargs='+',
+            default=self.history_sizes,
+            help='Historical answer counts to measure')
+
+    def run_benchmark(self, *args, **options):
+        user = User.objects.create(username='benchmark')
+        lesson = Lesson.objects.create(title='Benchmark', body='Benchmark')
+        quiz = Quiz.objects.create(lesson=lesson, title='Benchmark quiz')
+        Question.objects.bulk_create([
+            Question(quiz=quiz, body='Question {0}'.format(i), position=i)
+            for i in range(20)
+        ])
+        Answer.objects.bulk_create([
+            Answer(user=user, question=question)
+            for question in quiz.question_set.all()[:10]
+        ])
+
+        checks = (
+            ('answered', quiz.get_answered_count),
+            ('unanswered', quiz.get_unanswered_count),
+            ('next', quiz.get_next_unanswered_question),
+        )
+
+        self.stdout.write('{0:>10} {1:>12} {2:>12} {3:>12}'.format(
+            'history', *(name for name, func in checks)))
+
+        history = 0
+        for size in sorted(options['sizes']):
+            self.add_history(user, lesson, size - history)
+            history = size
+
+            timings = []
+            for name, func in checks:
+                with CaptureQueriesContext(connection) as queries:
+                    func(user)
+                assert len(queries) == 1, (name, len(queries))
+                timings.append(self.measure(lambda: func(user)))
+
+            self.stdout.write('{0:>10} {1:>10.3f}ms {2:>10.3f}ms '
+                '{3:>10.3f}ms'.format(size, *timings))
+
+    def add_history(self, user, lesson, count):
+        """Answers count new questions spread over other quizzes."""
+        while count > 0:
+            batch = min(count, self.questions_per_quiz)
+            quiz = Quiz.objects.create(lesson=lesson,
+                title='History {0}'.format(Quiz.objects.count()))
+            Question.objects.bulk_create([
+                Question(quiz=quiz, body='Question {0}'.format(i),
+                    position=i)
+                for i in range(batch)
+            ])
+            Answer.objects.bulk_create([
+                Answer(user=user, question_id=question_id)
+                for question_id in quiz.question_set.values_list('id',
+                    flat=True)
+            ])
+            count -= batch
@@ -0,0 +1,48 @@
+# Django
+from django.core.management.base import CommandError
+
+# Local
+from ._benchmark import BenchmarkCommand
+from django_quiz.content import search
+from django_quiz.content.seeding import WORDS, seed
+
+class Command(BenchmarkCommand):
+    help = ('Times full-text searches against the icontains baseline over '
+        'a growing number of seeded lessons.')
+
+    sizes = (100, 1000, 10000)
+    repeat = 5
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument('--sizes', type=int, nargs='+',
+            default=self.sizes, help='Lesson counts to measure')
+        parser.add_argument('--query', action='append', dest='queries',
+            help='Search terms to time (repeatable; default: a few of the '
+            'seeded words)')
+
+    def run_benchmark(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('The search index needs SQLite with FTS5.')
+
+        queries = options['queries'] or [WORDS[0], WORDS[-1],
+            '{0} {1}'.format(WORDS[1], WORDS[2])]
+
+        self.stdout.write('{0:>8} {1:<24} {2:>8} {3:>12} {4:>12}'.format(
+            'lessons', 'query', 'results', 'fts', 'icontains'))
+
+        lessons = 0
+        for size in sorted(options['sizes']):
+            seed(prefix='benchmark{0}'.format(size), lessons=size - lessons,
+                users=0, seed=size)
+            lessons = size
+
+            for query in queries:
+                terms = query.split()
+                results = search.search(query, limit=20)
+                fts = self.measure(lambda: search.search(query, limit=20))
+                icontains = self.measure(
+                    lambda: search._search_icontains(terms, None, (), 20))
+                self.stdout.write('{0:>8} {1:<24} {2:>8} {3:>10.3f}ms '
+                    '{4:>10.3f}ms'.format(size, query, len(results), fts,
+                    icontains))
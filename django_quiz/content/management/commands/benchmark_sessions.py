@@ -0,0 +1,73 @@
+# Django
+from django.contrib.auth.models import User
+from django.core.urlresolvers import reverse
+from django.conf import settings
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+# Local
+from ._benchmark import BenchmarkCommand
+from django_quiz.content.models import Answer, Question
+from django_quiz.content.seeding import seed
+
+class Command(BenchmarkCommand):
+    help = ('Times question_detail and answer_create with database '
+        'sessions and users against cached ones.')
+
+    def run_benchmark(self, *args, **options):
+        # One question per answer_create request, plus the warm-up
+        seed(prefix='benchmark', lessons=1, tags=0, quizzes_per_lesson=1,
+            questions_per_quiz=self.repeat + 1, users=1, answer_rate=0)
+        self.user = User.objects.get(username__startswith='benchmark-user-')
+        self.questions = list(Question.objects.order_by('id')
+            .values_list('id', flat=True))
+
+        middleware = [
+            'django.contrib.auth.middleware.AuthenticationMiddleware'
+            if name == 'django_quiz.middleware.CachedAuthenticationMiddleware'
+            else name for name in settings.MIDDLEWARE_CLASSES
+        ]
+        modes = (
+            ('db', {
+                'SESSION_ENGINE': 'django.contrib.sessions.backends.db', 
+                'MIDDLEWARE_CLASSES': middleware,
+            }), 
+            ('cached', {}),
+        )
+
+        self.stdout.write('{0:>8} {1:>16} {2:>10} {3:>8}'.format(
+            'mode', 'view', 'time', 'queries'))
+        for mode, overrides in modes:
+            with override_settings(**overrides):
+                for view, timing, queries in self.time_mode():
+                    self.stdout.write('{0:>8} {1:>16} {2:>8.2f}ms '
+                        '{3:>8}'.format(mode, view, timing, queries))
+
+    def time_mode(self):
+        """
+        Yields the view name, median time in milliseconds and queries of
+        a warm request for each view.
+        """
+        Answer.objects.all().delete()
+        client = Client()
+        client.force_login(self.user)
+
+        detail_url = reverse('question_detail', args=(self.questions[0],))
+        client.get(detail_url)
+        # Requests clear the query log, which with DEBUG is not empty,
+        # so that CaptureQueriesContext would miss them
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            client.get(detail_url)
+        yield ('question_detail', self.measure(lambda: client.get(detail_url)),
+            len(queries))
+
+        urls = iter([reverse('answer_create', args=(question_id,))
+            for question_id in self.questions])
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            client.post(next(urls), {'choice': True})
+        yield ('answer_create', 
+            self.measure(lambda: client.post(next(urls), {'choice': True})), 
+            len(queries))
@@ -0,0 +1,35 @@
+# Django
+from django.core.management.base import BaseCommand
+
+# Local
+from django_quiz.content import cache, fragments
+
+class Command(BaseCommand):
+    help = ('Shows the hit and miss counts of the content and fragment '
+        'caches.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+            help='Reset the counts after showing them')
+
+    def handle(self, *args, **options):
+        self.stdout.write('{0:<10} {1:>10} {2:>10} {3:>9} {4:>18}'.format(
+            'model', 'hits', 'misses', 'hit rate', 'generation'))
+        for name, stats in sorted(cache.get_stats().items()):
+            lookups = stats['hits'] + stats['misses']
+            rate = stats['hits'] / lookups if lookups else 0
+            self.stdout.write('{0:<10} {1:>10} {2:>10} {3:>9.1%} '
+                '{4:>18}'.format(name, stats['hits'], stats['misses'], rate,
+                stats['generation']))
+
+        stats = fragments.get_stats()
+        self.stdout.write('{0:<10} {1:>10} {2:>10} {3:>9.1%} {4:>18}'.format(
+            'fragments', stats['hits'], stats['misses'], stats['hit_rate'],
+            '-'))
+        self.stdout.write('Fragments stored: {0}, invalidations: {1}'.format(
+            stats['sets'], stats['invalidations']))
+
+        if options['reset']:
+            cache.reset_stats()
+            fragments.reset_stats()
+            self.stdout.write('Counts reset.')
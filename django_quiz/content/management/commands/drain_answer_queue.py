@@ -0,0 +1,32 @@
+# Python
+from time import sleep
+
+# Django
+from django.core.management.base import BaseCommand
+
+# Local
+from django_quiz.content import ingest
+
+class Command(BaseCommand):
+    help = ('Writes the answers waiting in the ingestion queue to the '
+        'answers table.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+            default=ingest.get_batch_size(),
+            help='Answers written per transaction (default: %(default)s)')
+        parser.add_argument('--loop', action='store_true',
+            help='Keep draining until interrupted, instead of once')
+        parser.add_argument('--interval', type=float, default=0.5,
+            help='Seconds between drains with --loop (default: '
+            '%(default)s)')
+
+    def handle(self, *args, **options):
+        while True:
+            written = ingest.drain(batch_size=options['batch_size'])
+            if written or not options['loop']:
+                self.stdout.write('Wrote {0} answers; {1} still queued.'
+                    .format(written, len(ingest.get_queue())))
+            if not options['loop']:
+                return
+            sleep(options['interval'])
@@ -0,0 +1,46 @@
+# Django
+from django.core.management.base import BaseCommand, CommandError
+
+# Local
+from django_quiz.content.export import FORMATS, KINDS, export
+from django_quiz.content.forms import ExportForm
+
+class Command(BaseCommand):
+    help = ('Streams answers or quiz scores as CSV or JSON lines, reading '
+        'the database in chunks so memory use stays constant.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--kind', choices=KINDS, default=KINDS[0],
+            help='What to export (default: %(default)s)')
+        parser.add_argument('--format', choices=FORMATS, default=FORMATS[0],
+            help='Output format (default: %(default)s)')
+        parser.add_argument('--quiz', type=int, help='Only this quiz id')
+        parser.add_argument('--lesson', type=int, help='Only this lesson id')
+        parser.add_argument('--tag', help='Only lessons with this tag name')
+        parser.add_argument('--since', 
+            help='Only rows from this date on (YYYY-MM-DD)')
+        parser.add_argument('--until', 
+            help='Only rows before this date (YYYY-MM-DD)')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+            help='Rows read per query (default: %(default)s)')
+        parser.add_argument('--output', 
+            help='File to write to (default: standard output)')
+
+    def handle(self, *args, **options):
+        form = ExportForm({
+            name: options[name] for name in ('kind', 'format', 'quiz',
+                'lesson', 'tag', 'since', 'until')
+            if options[name] is not None
+        })
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+
+        chunks = export(form.cleaned_data['kind'],
+            form.cleaned_data['format'], chunk_size=options['chunk_size'],
+            **form.get_filters())
+        if options['output']:
+            with open(options['output'], 'w', newline='') as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
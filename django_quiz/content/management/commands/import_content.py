@@ -0,0 +1,57 @@
+# Python
+import sys
+
+# Django
+from django.core.management.base import BaseCommand, CommandError
+
+# Local
+from django_quiz.content.importer import FORMATS, Importer, guess_format
+from django_quiz.content.importer import read
+
+class Command(BaseCommand):
+    help = ('Imports lessons, quizzes and questions from JSON, JSON lines, '
+        'YAML or CSV, creating or updating them by title.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', 
+            help='File to import, or - for standard input')
+        parser.add_argument('--format', choices=FORMATS,
+            help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+            help='Rows imported per transaction, at most 1000 (default: '
+            '%(default)s)')
+        parser.add_argument('--dry-run', action='store_true',
+            help='Report what would be imported without saving it')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            format = options['format'] or guess_format(path)
+        except ValueError as e:
+            raise CommandError('{0} Use --format.'.format(e))
+
+        importer = Importer(batch_size=options['batch_size'],
+            dry_run=options['dry_run'])
+        try:
+            if path == '-':
+                report = importer.run(read(sys.stdin, format))
+            else:
+                with open(path, newline='', encoding='utf-8') as file:
+                    report = importer.run(read(file, format))
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for line, message in report.conflicts:
+            self.stderr.write('Conflict on line {0}: {1}'.format(line, 
+                message))
+        if options['dry_run']:
+            self.stdout.write('Dry run; nothing was saved.')
+        for name in ('tags', 'lessons', 'quizzes', 'questions'):
+            self.stdout.write('{0}: {1} created, {2} updated'.format(
+                name.capitalize(), report.created[name], 
+                report.updated[name]))
+        if report.regraded:
+            self.stdout.write('Regraded {0} answers.'.format(report.regraded))
+        if report.conflicts:
+            self.stdout.write('{0} conflicting rows skipped.'.format(
+                len(report.conflicts)))
@@ -0,0 +1,39 @@
+# Django
+from django.core.management.base import BaseCommand, CommandError
+
+# Local
+from django_quiz.content.loadtest import LoadTest
+
+class Command(BaseCommand):
+    help = ('Simulates concurrent learners taking quizzes and reports '
+        'latency percentiles and queries per view. Run seed_quiz_data '
+        'first.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='seed',
+            help='Prefix of the seeded data (default: %(default)s)')
+        parser.add_argument('--users', type=int, default=10,
+            help='Concurrent simulated users (default: %(default)s)')
+        parser.add_argument('--iterations', type=int, default=1,
+            help='Quizzes taken by each user (default: %(default)s)')
+        parser.add_argument('--seed', type=int, default=0,
+            help='Random seed (default: %(default)s)')
+
+    def handle(self, *args, **options):
+        load_test = LoadTest(prefix=options['prefix'],
+            users=options['users'], iterations=options['iterations'],
+            seed=options['seed'])
+        try:
+            stats = load_test.run()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write('{0:<18} {1:>8} {2:>9} {3:>9} {4:>9} {5:>8} '
+            '{6:>7}'.format('view', 'requests', 'p50', 'p95', 'p99',
+            'queries', 'errors'))
+        for url_name, view_stats in sorted(stats.items()):
+            self.stdout.write('{0:<18} {1:>8} {2:>7.1f}ms {3:>7.1f}ms '
+                '{4:>7.1f}ms {5:>8.1f} {6:>7}'.format(url_name,
+                len(view_stats.timings), view_stats.percentile(50),
+                view_stats.percentile(95), view_stats.percentile(99),
+                view_stats.mean_queries, view_stats.errors))
@@ -0,0 +1,19 @@
+# Django
+from django.core.management.base import BaseCommand
+
+# Local
+from django_quiz.content.models import QuestionStats
+
+class Command(BaseCommand):
+    help = ('Rebuilds the per-question answer statistics from the answers '
+        'table.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+            help='Rows inserted per statement (default: %(default)s)')
+
+    def handle(self, *args, **options):
+        count = QuestionStats.objects.rebuild(
+            batch_size=options['batch_size'])
+        self.stdout.write('Rebuilt statistics of {0} questions.'.format(
+            count))
@@ -0,0 +1,16 @@
+# Django
+from django.core.management.base import BaseCommand
+
+# Local
+from django_quiz.content.models import QuizResult
+
+class Command(BaseCommand):
+    help = 'Rebuilds the per-user quiz results from the answers table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+            help='Results inserted per statement (default: %(default)s)')
+
+    def handle(self, *args, **options):
+        count = QuizResult.objects.rebuild(batch_size=options['batch_size'])
+        self.stdout.write('Rebuilt {0} quiz results.'.format(count))
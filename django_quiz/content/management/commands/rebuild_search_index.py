@@ -0,0 +1,21 @@
+# Django
+from django.core.management.base import BaseCommand, CommandError
+
+# Local
+from django_quiz.content import search
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index of lessons and questions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+            help='Documents indexed per batch (default: %(default)s)')
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('The search index needs SQLite with FTS5; '
+                'run migrate first.')
+
+        counts = search.rebuild(batch_size=options['batch_size'])
+        self.stdout.write('Indexed {0} lessons and {1} questions.'.format(
+            counts['lesson'], counts['question']))
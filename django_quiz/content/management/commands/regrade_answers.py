@@ -0,0 +1,37 @@
+# Django
+from django.core.management.base import BaseCommand
+
+# Local
+from django_quiz.content.grading import regrade_question
+from django_quiz.content.models import Question
+
+class Command(BaseCommand):
+    help = ('Regrades answers against the current correct answers of their '
+        'questions.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--quiz', type=int, action='append', default=[],
+            help='Only regrade questions of this quiz id (repeatable)')
+        parser.add_argument('--question', type=int, action='append', 
+            default=[], help='Only regrade this question id (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+            help='Answers updated per transaction (default: %(default)s)')
+
+    def handle(self, *args, **options):
+        questions = Question.objects.order_by('id')
+        if options['quiz']:
+            questions = questions.filter(quiz__in=options['quiz'])
+        if options['question']:
+            questions = questions.filter(id__in=options['question'])
+
+        changed = 0
+        for question in questions.iterator():
+            def progress(processed, question_changed):
+                self.stdout.write('Question {0}: {1} answers processed, '
+                    '{2} changed'.format(question.id, processed, 
+                    question_changed))
+
+            changed += regrade_question(question, 
+                chunk_size=options['chunk_size'], progress=progress)
+
+        self.stdout.write('Done: {0} answers changed.'.format(changed))
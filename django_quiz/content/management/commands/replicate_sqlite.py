@@ -0,0 +1,95 @@
+# Python
+import os
+import sqlite3
+from time import sleep
+
+# Django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Local
+from django_quiz.content import cache
+from django_quiz.content.models import Question, Quiz
+
+class Command(BaseCommand):
+    help = ('Copies the SQLite database to the read replica of '
+        'settings_replica.py, a stand-in for replication.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', 
+            default=settings.DATABASES['default']['NAME'],
+            help='Primary database file (default: %(default)s)')
+        parser.add_argument('--target', 
+            default=getattr(settings, 'REPLICA_PATH', None),
+            help='Replica file (default: REPLICA_PATH)')
+        parser.add_argument('--loop', action='store_true',
+            help='Keep copying until interrupted, instead of once')
+        parser.add_argument('--interval', type=float,
+            default=getattr(settings, 'REPLICA_INTERVAL', 1),
+            help='Seconds between copies with --loop (default: '
+            '%(default)s)')
+
+    def handle(self, *args, **options):
+        if not options['target']:
+            raise CommandError('Set REPLICA_PATH or pass --target.')
+        if sqlite3.sqlite_version_info < (3, 27):
+            raise CommandError('VACUUM INTO needs SQLite 3.27 or later.')
+
+        signatures = {}
+        while True:
+            self.replicate(options['source'], options['target'])
+            signatures = self.invalidate(options['target'], signatures)
+            if not options['loop']:
+                self.stdout.write('Copied {0} to {1}.'.format(
+                    options['source'], options['target']))
+                return
+            sleep(options['interval'])
+
+    def replicate(self, source, target):
+        # Copied to a new file that then replaces the replica in one step,
+        # so readers see either the old copy or the new one
+        temp = target + '.tmp'
+        if os.path.exists(temp):
+            os.remove(temp)
+        connection = sqlite3.connect(source)
+        try:
+            connection.execute('VACUUM INTO ?', (temp,))
+        finally:
+            connection.close()
+        os.replace(temp, target)
+
+    def invalidate(self, target, signatures):
+        """
+        Bumps the cache generation of each content model, and of each quiz,
+        that changed in the replica, since entries cached from a stale
+        replica read may have the current generation. Returns the new
+        signatures.
+        """
+        connection = sqlite3.connect(target)
+        try:
+            new_signatures = {
+                model: connection.execute(
+                    'SELECT MAX(updated_at), COUNT(*) FROM {0}'.format(
+                    model._meta.db_table)).fetchone()
+                for model in cache.MODELS
+            }
+            # A quiz changes with its own row or any of its questions
+            quizzes = {
+                quiz_id: signature
+                for quiz_id, *signature in connection.execute(
+                    'SELECT quiz.id, quiz.updated_at, '
+                    'MAX(question.updated_at), COUNT(question.id) '
+                    'FROM {0} quiz LEFT JOIN {1} question '
+                    'ON question.quiz_id = quiz.id GROUP BY quiz.id'.format(
+                    Quiz._meta.db_table, Question._meta.db_table))
+            }
+        finally:
+            connection.close()
+        for model, signature in new_signatures.items():
+            if signatures.get(model) != signature:
+                cache.bump(model)
+        old_quizzes = signatures.get('quizzes', {})
+        cache.bump_quizzes(quiz_id for quiz_id in set(quizzes) | set(
+            old_quizzes) if quizzes.get(quiz_id) != old_quizzes.get(quiz_id))
+        new_signatures['quizzes'] = quizzes
+        return new_signatures
@@ -0,0 +1,46 @@
+# Django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+# Local
+from django_quiz.content.seeding import seed
+
+class Command(BaseCommand):
+    help = ('Generates synthetic lessons, tags, quizzes, questions, users '
+        'and answers with bulk inserts.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prefix', default='seed',
+            help='Prefix of every generated name (default: %(default)s)')
+        parser.add_argument('--lessons', type=int, default=10)
+        parser.add_argument('--tags', type=int, default=20)
+        parser.add_argument('--tags-per-lesson', type=int, default=3)
+        parser.add_argument('--quizzes-per-lesson', type=int, default=2)
+        parser.add_argument('--questions-per-quiz', type=int, default=20)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--answer-rate', type=float, default=0.5,
+            help='Fraction of all questions each user has answered '
+            '(default: %(default)s)')
+        parser.add_argument('--password', default='password',
+            help='Password of every generated user (default: %(default)s)')
+        parser.add_argument('--seed', type=int, default=0,
+            help='Random seed (default: %(default)s)')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['answer_rate'] <= 1:
+            raise CommandError('--answer-rate must be between 0 and 1.')
+
+        try:
+            counts = seed(prefix=options['prefix'],
+                lessons=options['lessons'], tags=options['tags'],
+                tags_per_lesson=options['tags_per_lesson'],
+                quizzes_per_lesson=options['quizzes_per_lesson'],
+                questions_per_quiz=options['questions_per_quiz'],
+                users=options['users'], answer_rate=options['answer_rate'],
+                password=options['password'], seed=options['seed'])
+        except IntegrityError as e:
+            raise CommandError('Data with the prefix "{0}" already exists; '
+                'choose another --prefix.'.format(options['prefix']))
+
+        for model, count in sorted(counts.items()):
+            self.stdout.write('Created {0} {1}.'.format(count, model))
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2026-10-18 20:28
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_quiz_results(apps, schema_editor):
+    Answer = apps.get_model('content', 'Answer')
+    Quiz = apps.get_model('content', 'Quiz')
+    QuizResult = apps.get_model('content', 'QuizResult')
+    db_alias = schema_editor.connection.alias
+
+    totals = dict(Quiz.objects.using(db_alias)
+        .annotate(total=models.Count('question'))
+        .values_list('id', 'total'))
+    rows = (Answer.objects.using(db_alias).order_by()
+        .values('user', 'question__quiz')
+        .annotate(answered=models.Count('id'),
+            correct=models.Sum(models.Case(
+                models.When(is_correct=True, then=models.Value(1)),
+                default=models.Value(0),
+                output_field=models.IntegerField())),
+            last_answered=models.Max('created_at')))
+
+    results = []
+    for row in rows:
+        total = totals[row['question__quiz']]
+        done = total and row['answered'] >= total
+        results.append(QuizResult(user_id=row['user'],
+            quiz_id=row['question__quiz'], answered=row['answered'],
+            correct=row['correct'], total=total,
+            completed_at=row['last_answered'] if done else None))
+    QuizResult.objects.using(db_alias).bulk_create(results)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('content', '0003_lesson_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizResult',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('answered', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='content.Quiz')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='answer',
+            name='choice',
+            field=models.BooleanField(default=False, help_text='Checked=True', verbose_name='True or False?'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='quizresult',
+            unique_together=set([('user', 'quiz')]),
+        ),
+        migrations.RunPython(populate_quiz_results,
+            migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2026-10-18 20:29
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+def number_questions(apps, schema_editor):
+    Question = apps.get_model('content', 'Question')
+    questions = Question.objects.using(schema_editor.connection.alias)
+
+    # Keep the existing (creation) order within each quiz
+    quiz_id = None
+    for question in questions.order_by('quiz', 'id'):
+        if question.quiz_id != quiz_id:
+            quiz_id = question.quiz_id
+            position = 0
+        questions.filter(id=question.id).update(position=position)
+        position += 1
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0004_quizresult'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='question',
+            options={'ordering': ('position', 'id')},
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='position',
+            field=models.PositiveIntegerField(blank=True, default=0, help_text='Order within the quiz. Defaults to the end of the quiz.'),
+            preserve_default=False,
+        ),
+        migrations.RunPython(number_questions, migrations.RunPython.noop),
+        migrations.AlterIndexTogether(
+            name='question',
+            index_together=set([('quiz', 'position')]),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2026-10-18 22:10
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA compile_options")
+        if ('ENABLE_FTS5',) not in cursor.fetchall():
+            return
+        cursor.execute(
+            "CREATE VIRTUAL TABLE content_search USING fts5("
+            "kind UNINDEXED, object_id UNINDEXED, title, body, tags, "
+            "tokenize = 'unicode61 remove_diacritics 1')")
+
+    # Index the existing content; kept in sync by signals from now on
+    Lesson = apps.get_model('content', 'Lesson')
+    Question = apps.get_model('content', 'Question')
+    rows = []
+    for lesson in Lesson.objects.using(connection.alias) \
+            .prefetch_related('tags'):
+        rows.append((lesson.id * 2, 'lesson', lesson.id, lesson.title,
+            lesson.body, ' '.join(tag.name for tag in lesson.tags.all())))
+    for question in Question.objects.using(connection.alias) \
+            .select_related('quiz__lesson') \
+            .prefetch_related('quiz__lesson__tags'):
+        rows.append((question.id * 2 + 1, 'question', question.id,
+            question.quiz.title, question.body,
+            ' '.join(tag.name for tag in question.quiz.lesson.tags.all())))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO content_search (rowid, kind, object_id, title, "
+            "body, tags) VALUES (%s, %s, %s, %s, %s, %s)", rows)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("DROP TABLE IF EXISTS content_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0005_question_position'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2026-10-18 21:04
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0007_answer_created_at_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='answer',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='answer',
+            name='question',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='content.Question'),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='quiz',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='content.Quiz'),
+        ),
+        migrations.AlterIndexTogether(
+            name='answer',
+            index_together=set([('user', 'question', 'is_correct', 'created_at'), ('question', 'choice', 'is_correct')]),
+        ),
+    ]
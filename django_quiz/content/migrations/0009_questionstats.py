@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2026-10-18 21:15
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_question_stats(apps, schema_editor):
+    Answer = apps.get_model('content', 'Answer')
+    QuestionStats = apps.get_model('content', 'QuestionStats')
+    db_alias = schema_editor.connection.alias
+
+    rows = (Answer.objects.using(db_alias).order_by()
+        .values('question')
+        .annotate(attempts=models.Count('id'),
+            correct=models.Sum(models.Case(
+                models.When(is_correct=True, then=models.Value(1)),
+                default=models.Value(0),
+                output_field=models.IntegerField())),
+            last_answered=models.Max('created_at')))
+
+    QuestionStats.objects.using(db_alias).bulk_create([
+        QuestionStats(question_id=row['question'],
+            attempts=row['attempts'], correct=row['correct'],
+            last_answered=row['last_answered'])
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0008_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionStats',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='content.Question')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('correct', models.PositiveIntegerField(default=0)),
+                ('last_answered', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'question stats',
+            },
+        ),
+        migrations.RunPython(populate_question_stats,
+            migrations.RunPython.noop),
+    ]
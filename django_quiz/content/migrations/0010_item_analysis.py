@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.1 on 2026-10-18 21:20
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0009_questionstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemAnalysis',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveIntegerField()),
+                ('difficulty', models.FloatField(blank=True, null=True)),
+                ('discrimination', models.FloatField(blank=True, null=True)),
+                ('upper_difficulty', models.FloatField(blank=True, null=True)),
+                ('lower_difficulty', models.FloatField(blank=True, null=True)),
+                ('distractor_rate', models.FloatField(blank=True, null=True)),
+                ('distractor_discrimination', models.FloatField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'item analyses',
+            },
+        ),
+        migrations.CreateModel(
+            name='QuizAnalysis',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('respondents', models.PositiveIntegerField()),
+                ('questions', models.PositiveIntegerField()),
+                ('mean_score', models.FloatField(blank=True, null=True)),
+                ('alpha', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='content.Quiz')),
+            ],
+            options={
+                'verbose_name_plural': 'quiz analyses',
+                'get_latest_by': 'created_at',
+            },
+        ),
+        migrations.AddField(
+            model_name='itemanalysis',
+            name='analysis',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='content.QuizAnalysis'),
+        ),
+        migrations.AddField(
+            model_name='itemanalysis',
+            name='question',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='content.Question'),
+        ),
+    ]
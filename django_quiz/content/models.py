@@ -1,8 +1,15 @@
+# Python
+from collections import defaultdict
+
 # Django
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.urlresolvers import reverse
-from django.db import models
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, Max
+from django.db.models import Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.utils.translation import ugettext as _
 
 # Local
@@ -39,28 +46,60 @@ class Quiz(models.Model):
     def get_absolute_url(self):
         return reverse('quiz_detail', args=(self.id,))
 
+    def _answered_clause(self, user):
+        # Driven by this quiz's questions and probing the (user, question)
+        # unique index, so the cost does not grow with the number of answers
+        # the user has given in other quizzes.
+        sql = ('EXISTS (SELECT 1 FROM {answer} a WHERE a.question_id = '
+            '{question}.id AND a.user_id = %s)').format(
+            answer=Answer._meta.db_table, question=Question._meta.db_table)
+        return sql, [user.pk]
+
+    def get_answered_questions(self, user):
+        sql, params = self._answered_clause(user)
+        return self.question_set.extra(where=[sql], params=params)
+
     def get_unanswered_questions(self, user):
-        user_answers = Answer.objects.filter(user=user)
-        question_ids = [answer.question.id for answer in user_answers]
-        return self.question_set.exclude(id__in=question_ids)
+        sql, params = self._answered_clause(user)
+        return self.question_set.extra(where=['NOT ' + sql], params=params)
+
+    def get_answered_count(self, user):
+        return self.get_answered_questions(user).count()
+
+    def get_unanswered_count(self, user):
+        return self.get_unanswered_questions(user).count()
+
+    def get_next_unanswered_question(self, user):
+        questions = self.get_unanswered_questions(user)
+        return questions.order_by('position', 'id').first()
+
+    def get_result(self, user):
+        try:
+            return QuizResult.objects.get(user=user, quiz=self)
+        except ObjectDoesNotExist as e:
+            # Nothing answered yet
+            return QuizResult(user=user, quiz=self,
+                total=self.question_set.count())
 
     def get_score(self, user):
-        correct_answer_count = Answer.objects.filter(user=user, 
-            question__quiz=self, is_correct=True).count()
-        question_count = Question.objects.filter(quiz=self).count()
-        if question_count == 0:
-            return 'N/A'
-        return '{0:.2%}'.format(correct_answer_count / question_count)
+        return self.get_result(user).get_score_display()
 
 
 class Question(models.Model):
-    quiz = models.ForeignKey(Quiz)
+    # Lookups by quiz use the (quiz, position) index
+    quiz = models.ForeignKey(Quiz, db_index=False)
     body = models.TextField(max_length=1000)
     correct_answer = models.BooleanField(default=False)
+    position = models.PositiveIntegerField(blank=True, 
+        help_text='Order within the quiz. Defaults to the end of the quiz.')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
+        ordering = ('position', 'id')
+        index_together = (
+            ('quiz', 'position')
+        )
         unique_together = (
             ('quiz', 'body')
         )
@@ -68,6 +107,30 @@ class Question(models.Model):
     def __str__(self):
         return self.body
 
+    def get_absolute_url(self):
+        return reverse('question_detail', args=(self.id,))
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so that changing the correct answer triggers a regrade,
+        # and moving the question to another quiz moves its answers' scores
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def grade(self, choice):
+        return choice == self.correct_answer
+
+    def save(self, *args, **kwargs):
+        if self.position is None:
+            last = Question.objects.filter(quiz_id=self.quiz_id).aggregate(
+                position=Max('position'))['position']
+            self.position = 0 if last is None else last + 1
+        super().save(*args, **kwargs)
+        # Only now, so that the post_save receivers see the quiz it left
+        self._loaded_values = dict(getattr(self, '_loaded_values', {}),
+            quiz_id=self.quiz_id)
+
     def get_user_answer(self, user):
         try:
             answer = self.answer_set.get(user=user, question=self)
@@ -76,16 +139,119 @@ class Question(models.Model):
 
         return answer
 
+class AnswerManager(models.Manager):
+    def create_batch(self, user, questions, choices):
+        """
+        Grades choices (a dict of question id to choice) against the
+        already-fetched questions and inserts the answers in one transaction.
+        Raises IntegrityError if any question was already answered.
+        """
+        questions = {question.id: question for question in questions}
+        answers = [
+            Answer(user=user, question=questions[question_id], choice=choice,
+                is_correct=questions[question_id].grade(choice))
+            for question_id, choice in choices.items()
+        ]
+
+        with transaction.atomic():
+            self.bulk_create(answers)
+            # bulk_create() does not send post_save
+            self.record_created(answers)
+
+        return answers
+
+    # Inserts that silently skip a row violating a unique constraint
+    insert_ignore_sql = {
+        'sqlite': 'INSERT OR IGNORE INTO {table} ({columns}) VALUES ({values})',
+        'mysql': 'INSERT IGNORE INTO {table} ({columns}) VALUES ({values})',
+        'postgresql': 'INSERT INTO {table} ({columns}) VALUES ({values}) '
+            'ON CONFLICT DO NOTHING',
+    }
+
+    def create_once(self, user, question, choice):
+        """
+        Inserts the user's answer to question with a single statement that
+        does nothing if the question was already answered, so concurrent
+        duplicate submissions neither fail nor write twice. Returns the new
+        answer, or None if there already was one.
+        """
+        answer = Answer(user=user, question=question, choice=choice,
+            is_correct=question.grade(choice))
+        connection = connections[self.db]
+        opts = self.model._meta
+        fields = [field for field in opts.concrete_fields 
+            if not field.primary_key]
+        qn = connection.ops.quote_name
+        sql = self.insert_ignore_sql[connection.vendor].format(
+            table=qn(opts.db_table),
+            columns=', '.join(qn(field.column) for field in fields),
+            values=', '.join(['%s'] * len(fields)))
+        params = [field.get_db_prep_save(field.pre_save(answer, True), 
+            connection) for field in fields]
+
+        with transaction.atomic(using=self.db):
+            with connection.cursor() as cursor:
+                if connection.features.can_return_id_from_insert:
+                    sql += ' RETURNING {0}'.format(qn(opts.pk.column))
+                cursor.execute(sql, params)
+                if cursor.rowcount != 1:
+                    return None
+                if connection.features.can_return_id_from_insert:
+                    answer.pk = cursor.fetchone()[0]
+                else:
+                    answer.pk = connection.ops.last_insert_id(cursor, 
+                        opts.db_table, opts.pk.column)
+            # No post_save either
+            self.record_created([answer])
+
+        answer._state.adding = False
+        answer._state.db = self.db
+        return answer
+
+    def record_created(self, answers):
+        """Bookkeeping for answers inserted without Answer.save()."""
+        totals = {}
+        for answer in answers:
+            key = (answer.user_id, answer.question.quiz_id)
+            answered, correct = totals.get(key, (0, 0))
+            totals[key] = (answered + 1, correct + int(answer.is_correct))
+
+        for (user_id, quiz_id), (answered, correct) in totals.items():
+            QuizResult.objects.record_answers(user_id, quiz_id, answered,
+                correct)
+
+        if answers:
+            QuestionStats.objects.record_answers({
+                answer.question_id: (1, int(answer.is_correct))
+                for answer in answers
+            }, max(answer.created_at for answer in answers))
+
+        # Imported here as fragments depends on this module
+        from . import fragments
+        for answer in answers:
+            fragments.bump_answer(answer.user_id, answer.question_id)
+
 class Answer(models.Model):
-    user = models.ForeignKey(User)
-    question = models.ForeignKey(Question)
+    # Lookups by user use the (user, question) index, and lookups by
+    # question the (question, choice, is_correct) index
+    user = models.ForeignKey(User, db_index=False)
+    question = models.ForeignKey(Question, db_index=False)
     choice = models.BooleanField(default=False, 
         verbose_name='True or False?', help_text='Checked=True')
     is_correct = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AnswerManager()
+
     class Meta:
+        index_together = (
+            # Covers a user's answered and correct counts for a quiz, so
+            # scores are recomputed without reading the answer rows
+            ('user', 'question', 'is_correct', 'created_at'),
+            # Covers regrading and the per-question counts of answers
+            ('question', 'choice', 'is_correct'),
+        )
         unique_together = (
             ('user', 'question')
         )
@@ -93,6 +259,344 @@ class Answer(models.Model):
     def __str__(self):
         return '{0}'.format(self.choice)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so that the score bookkeeping can apply deltas on update
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
     def save(self, *args, **kwargs):
-        self.is_correct = self.choice == self.question.correct_answer
+        self.is_correct = self.grade()
         super().save(*args, **kwargs)
+
+    def grade(self):
+        # Imported here as bundles depends on this module
+        from .bundles import bundles
+
+        # Graded from a resident quiz bundle rather than by loading the
+        # question, unless it is already loaded
+        if not Answer.question.is_cached(self):
+            bundle = bundles.find(self.question_id)
+            if bundle is not None:
+                return bundle.get_question(self.question_id).grade(
+                    self.choice)
+        return self.question.grade(self.choice)
+
+def _completed_at(answered_delta=0, total_delta=0):
+    """
+    Expression for QuizResult.completed_at once an UPDATE has applied the
+    given deltas, evaluated against the row's values before the UPDATE.
+    """
+    return Case(
+        When(total__gt=-total_delta,
+            answered__gte=F('total') + total_delta - answered_delta,
+            then=Coalesce('completed_at', Value(timezone.now(),
+                output_field=models.DateTimeField()))),
+        default=Value(None),
+        output_field=models.DateTimeField())
+
+class QuizResultManager(models.Manager):
+    def record_answers(self, user_id, quiz_id, answered, correct):
+        """
+        Adds answered and correct (either may be negative) to the user's
+        result for the quiz, creating the row on the first answer.
+        """
+        results = self.filter(user_id=user_id, quiz_id=quiz_id)
+        updated = results.update(answered=F('answered') + answered,
+            correct=F('correct') + correct,
+            completed_at=_completed_at(answered_delta=answered))
+        if updated or answered <= 0:
+            return
+
+        total = Question.objects.filter(quiz_id=quiz_id).count()
+        try:
+            with transaction.atomic():
+                self.create(user_id=user_id, quiz_id=quiz_id,
+                    answered=answered, correct=correct, total=total,
+                    completed_at=timezone.now() if answered >= total else None)
+        except IntegrityError as e:
+            # Lost the race against a concurrent first answer
+            results.update(answered=F('answered') + answered,
+                correct=F('correct') + correct,
+                completed_at=_completed_at(answered_delta=answered))
+
+    def record_questions(self, quiz_id, count):
+        """Adds count (possibly negative) questions to every quiz result."""
+        self.filter(quiz_id=quiz_id).update(total=F('total') + count,
+            completed_at=_completed_at(total_delta=count))
+
+    def refresh(self, user_id, quiz_id):
+        """Recomputes a single result from the user's answers."""
+        answers = Answer.objects.filter(user_id=user_id,
+            question__quiz_id=quiz_id)
+        counts = answers.aggregate(answered=Count('id'),
+            correct=Sum(Case(When(is_correct=True, then=Value(1)),
+                default=Value(0), output_field=IntegerField())),
+            last_answered=Max('created_at'))
+        total = Question.objects.filter(quiz_id=quiz_id).count()
+
+        with transaction.atomic():
+            self.filter(user_id=user_id, quiz_id=quiz_id).delete()
+            if counts['answered']:
+                self.create(user_id=user_id, quiz_id=quiz_id,
+                    answered=counts['answered'], correct=counts['correct'],
+                    total=total, completed_at=self._completion_time(
+                        counts['answered'], total, counts['last_answered']))
+
+    def rebuild(self, batch_size=1000):
+        """
+        Recomputes every result from scratch with set-based aggregates.
+        Returns the number of results written.
+        """
+        totals = dict(Quiz.objects.annotate(total=Count('question'))
+            .values_list('id', 'total'))
+        rows = (Answer.objects.order_by()
+            .values('user', 'question__quiz')
+            .annotate(answered=Count('id'),
+                correct=Sum(Case(When(is_correct=True, then=Value(1)),
+                    default=Value(0), output_field=IntegerField())),
+                last_answered=Max('created_at')))
+
+        count = 0
+        with transaction.atomic():
+            self.all().delete()
+            batch = []
+            for row in rows.iterator():
+                total = totals[row['question__quiz']]
+                batch.append(self.model(user_id=row['user'],
+                    quiz_id=row['question__quiz'], answered=row['answered'],
+                    correct=row['correct'], total=total,
+                    completed_at=self._completion_time(row['answered'], total,
+                        row['last_answered'])))
+                if len(batch) >= batch_size:
+                    self.bulk_create(batch)
+                    count += len(batch)
+                    batch = []
+            self.bulk_create(batch)
+            count += len(batch)
+
+        return count
+
+    def _completion_time(self, answered, total, last_answered):
+        if total and answered >= total:
+            return last_answered
+        return None
+
+class QuizResult(models.Model):
+    """
+    Denormalized per-user score for a quiz, maintained incrementally as
+    answers and questions are saved and deleted (see signals.py).
+    """
+    user = models.ForeignKey(User)
+    quiz = models.ForeignKey(Quiz)
+    answered = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    objects = QuizResultManager()
+
+    class Meta:
+        unique_together = (
+            ('user', 'quiz')
+        )
+
+    def __str__(self):
+        return '{0}: {1}'.format(self.user, self.quiz)
+
+    @property
+    def score(self):
+        if self.total == 0:
+            return None
+        return self.correct / self.total
+
+    def get_score_display(self):
+        if self.score is None:
+            return 'N/A'
+        return '{0:.2%}'.format(self.score)
+
+def correct_rate(prefix=''):
+    """
+    Expression for the share of correct attempts of question statistics,
+    reached through prefix (such as 'stats__'); null without attempts.
+    """
+    return Case(
+        When(**{prefix + 'attempts__gt': 0, 
+            'then': F(prefix + 'correct') * Value(1.0) / 
+                F(prefix + 'attempts')}),
+        default=Value(None),
+        output_field=FloatField())
+
+class QuestionStatsManager(models.Manager):
+    def record_answers(self, counts, answered_at=None):
+        """
+        Adds to the statistics of each question in counts, a dict of
+        question id to (attempts, correct) where either may be negative,
+        creating the rows of first answers. Questions with the same counts
+        share one UPDATE. answered_at, if given, moves last_answered
+        forward.
+        """
+        groups = defaultdict(list)
+        for question_id, delta in counts.items():
+            groups[delta].append(question_id)
+        for (attempts, correct), question_ids in groups.items():
+            self._record(question_ids, attempts, correct, answered_at)
+
+    def _record(self, question_ids, attempts, correct, answered_at):
+        values = {
+            'attempts': F('attempts') + attempts,
+            'correct': F('correct') + correct,
+        }
+        if answered_at is not None:
+            values['last_answered'] = Case(
+                When(last_answered__gt=answered_at, then=F('last_answered')),
+                default=Value(answered_at),
+                output_field=models.DateTimeField())
+
+        stats = self.filter(question_id__in=question_ids)
+        updated = stats.update(**values)
+        if updated == len(question_ids) or attempts <= 0:
+            return
+
+        missing = set(question_ids)
+        if updated:
+            missing -= set(stats.values_list('question_id', flat=True))
+        try:
+            with transaction.atomic():
+                self.bulk_create([
+                    self.model(question_id=question_id, attempts=attempts,
+                        correct=correct, last_answered=answered_at)
+                    for question_id in missing
+                ])
+        except IntegrityError as e:
+            # Lost the race against a concurrent first answer
+            for question_id in missing:
+                self._record([question_id], attempts, correct, answered_at)
+
+    def refresh(self, question_id):
+        """Recomputes a single row from the question's answers."""
+        counts = Answer.objects.filter(question_id=question_id).aggregate(
+            attempts=Count('id'),
+            correct=Sum(Case(When(is_correct=True, then=Value(1)),
+                default=Value(0), output_field=IntegerField())),
+            last_answered=Max('created_at'))
+
+        with transaction.atomic():
+            self.filter(question_id=question_id).delete()
+            if counts['attempts']:
+                self.create(question_id=question_id, **counts)
+
+    def rebuild(self, batch_size=1000):
+        """
+        Recomputes every row from scratch with a set-based aggregate.
+        Returns the number of rows written.
+        """
+        rows = (Answer.objects.order_by()
+            .values('question')
+            .annotate(attempts=Count('id'),
+                correct=Sum(Case(When(is_correct=True, then=Value(1)),
+                    default=Value(0), output_field=IntegerField())),
+                last_answered=Max('created_at')))
+
+        count = 0
+        with transaction.atomic():
+            self.all().delete()
+            batch = []
+            for row in rows.iterator():
+                batch.append(self.model(question_id=row['question'],
+                    attempts=row['attempts'], correct=row['correct'],
+                    last_answered=row['last_answered']))
+                if len(batch) >= batch_size:
+                    self.bulk_create(batch)
+                    count += len(batch)
+                    batch = []
+            self.bulk_create(batch)
+            count += len(batch)
+
+        return count
+
+    def by_difficulty(self):
+        """Statistics of answered questions, hardest first."""
+        return (self.filter(attempts__gt=0)
+            .annotate(rate=correct_rate())
+            .order_by('rate', '-attempts'))
+
+class QuestionStats(models.Model):
+    """
+    Denormalized answer counts of a question, maintained incrementally as
+    answers are saved, deleted and regraded (see signals.py and
+    grading.py). Questions nobody has answered have no row.
+    """
+    question = models.OneToOneField(Question, primary_key=True, 
+        related_name='stats')
+    attempts = models.PositiveIntegerField(default=0)
+    correct = models.PositiveIntegerField(default=0)
+    last_answered = models.DateTimeField(null=True, blank=True)
+
+    objects = QuestionStatsManager()
+
+    class Meta:
+        verbose_name_plural = 'question stats'
+
+    def __str__(self):
+        return '{0}'.format(self.question_id)
+
+    @property
+    def correct_rate(self):
+        if self.attempts == 0:
+            return None
+        return self.correct / self.attempts
+
+    def get_correct_rate_display(self):
+        if self.correct_rate is None:
+            return 'N/A'
+        return '{0:.0%}'.format(self.correct_rate)
+
+class QuizAnalysis(models.Model):
+    """
+    Psychometric analysis of a quiz over its whole response matrix, as
+    computed by the analyze_items command (see analysis.py). Each run adds
+    a new report.
+    """
+    quiz = models.ForeignKey(Quiz)
+    respondents = models.PositiveIntegerField()
+    questions = models.PositiveIntegerField()
+    mean_score = models.FloatField(null=True, blank=True)
+    # Cronbach's alpha: the internal consistency of the quiz
+    alpha = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        get_latest_by = 'created_at'
+        verbose_name_plural = 'quiz analyses'
+
+    def __str__(self):
+        return '{0}: {1}'.format(self.quiz, self.created_at)
+
+class ItemAnalysis(models.Model):
+    """
+    Statistics of one question in a QuizAnalysis. Respondents who did not
+    answer the question count as answering it wrong.
+    """
+    analysis = models.ForeignKey(QuizAnalysis, related_name='items')
+    question = models.ForeignKey(Question)
+    attempts = models.PositiveIntegerField()
+    # Share of respondents who got it right
+    difficulty = models.FloatField(null=True, blank=True)
+    # Point-biserial correlation with the score on the other questions
+    discrimination = models.FloatField(null=True, blank=True)
+    # Difficulty among the top and bottom 27% of respondents by score
+    upper_difficulty = models.FloatField(null=True, blank=True)
+    lower_difficulty = models.FloatField(null=True, blank=True)
+    # Share of attempts that chose the wrong option, and how that choice
+    # correlates with the score on the other questions (it should not be
+    # positive)
+    distractor_rate = models.FloatField(null=True, blank=True)
+    distractor_discrimination = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'item analyses'
+
+    def __str__(self):
+        return '{0}'.format(self.question)
@@ -0,0 +1,201 @@
+"""
+Full-text search over lessons and questions, backed by an SQLite FTS5
+table (see migration 0006). Documents are keyed by rowid, which encodes
+the kind and the object id, so that updates and deletes are index
+lookups. On other databases, or SQLite builds without FTS5, search()
+falls back to icontains filters.
+"""
+
+# Python
+import re
+from collections import namedtuple
+
+# Django
+from django.core.urlresolvers import reverse
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+# Local
+from .models import Lesson, Question
+
+TABLE = 'content_search'
+KINDS = ('lesson', 'question')
+
+# Column weights for bm25(): kind, object_id, title, body, tags
+WEIGHTS = (0.0, 0.0, 10.0, 1.0, 2.0)
+
+# Control characters that cannot occur in content, turned into <mark>
+# tags after the snippet has been escaped
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+SearchResult = namedtuple('SearchResult',
+    'kind object_id title snippet rank url')
+
+# Connection alias -> whether its database has the index, looked up once
+# rather than on every write; reset() forgets them
+_available = {}
+
+def is_available():
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.alias not in _available:
+        _available[connection.alias] = (
+            TABLE in connection.introspection.table_names())
+    return _available[connection.alias]
+
+def reset():
+    _available.clear()
+
+def get_rowid(kind, object_id):
+    return object_id * len(KINDS) + KINDS.index(kind)
+
+##########
+# Writing
+##########
+
+def index_lessons(lessons):
+    """Adds or replaces the lessons of a queryset."""
+    rows = list(lessons.values_list('id', 'title', 'body'))
+    tags = _get_tags(lesson_id for lesson_id, title, body in rows)
+    _write([
+        (get_rowid('lesson', lesson_id), 'lesson', lesson_id, title, body,
+            tags.get(lesson_id, ''))
+        for lesson_id, title, body in rows
+    ])
+
+def index_questions(questions):
+    """
+    Adds or replaces the questions of a queryset. Questions are found by
+    their quiz title and tagged with their lesson's tags.
+    """
+    rows = list(questions.values_list('id', 'quiz__title', 'body',
+        'quiz__lesson_id'))
+    tags = _get_tags(lesson_id for id, title, body, lesson_id in rows)
+    _write([
+        (get_rowid('question', question_id), 'question', question_id, title,
+            body, tags.get(lesson_id, ''))
+        for question_id, title, body, lesson_id in rows
+    ])
+
+def remove(kind, object_ids):
+    with connection.cursor() as cursor:
+        cursor.executemany('DELETE FROM {0} WHERE rowid = %s'.format(TABLE),
+            [(get_rowid(kind, object_id),) for object_id in object_ids])
+
+def rebuild(batch_size=1000):
+    """
+    Recreates the whole index in batches. Returns the number of documents
+    indexed per kind.
+    """
+    counts = {}
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {0}'.format(TABLE))
+        counts['lesson'] = _in_batches(Lesson.objects.all(), index_lessons,
+            batch_size)
+        counts['question'] = _in_batches(Question.objects.all(),
+            index_questions, batch_size)
+    return counts
+
+def _in_batches(queryset, index, batch_size):
+    count = 0
+    last_id = 0
+    while True:
+        ids = list(queryset.filter(id__gt=last_id).order_by('id')
+            .values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return count
+        index(queryset.filter(id__in=ids))
+        count += len(ids)
+        last_id = ids[-1]
+
+def _write(rows):
+    with connection.cursor() as cursor:
+        cursor.executemany('INSERT OR REPLACE INTO {0} (rowid, kind, '
+            'object_id, title, body, tags) VALUES (%s, %s, %s, %s, %s, %s)'
+            .format(TABLE), rows)
+
+def _get_tags(lesson_ids):
+    """Maps each lesson id to its tag names, separated by spaces."""
+    tags = {}
+    for lesson_id, name in Lesson.tags.through.objects.filter(
+            lesson_id__in=set(lesson_ids)).values_list('lesson_id',
+            'tag__name').order_by('tag__name'):
+        tags[lesson_id] = (tags[lesson_id] + ' ' + name if lesson_id in tags
+            else name)
+    return tags
+
+############
+# Searching
+############
+
+def search(query, kind=None, tags=(), limit=20):
+    """
+    Returns up to limit SearchResults for query, best match first,
+    optionally restricted to one kind and to documents with all tags.
+    """
+    terms = re.findall(r'\w+', query)
+    if not terms:
+        return []
+    if not is_available():
+        return _search_icontains(terms, kind, tags, limit)
+
+    # Every term must match; the last one may be a prefix of a word
+    match = ' '.join('"{0}"'.format(term) for term in terms) + '*'
+    for tag in tags:
+        match += ' AND tags : "{0}"'.format(tag.replace('"', ''))
+
+    sql = ('SELECT kind, object_id, highlight({0}, 2, %s, %s), '
+        'snippet({0}, 3, %s, %s, %s, 16), bm25({0}, {1}) AS rank '
+        'FROM {0} WHERE {0} MATCH %s').format(TABLE,
+        ', '.join(str(weight) for weight in WEIGHTS))
+    params = [MARK_START, MARK_END, MARK_START, MARK_END, '...', match]
+    if kind:
+        sql += ' AND kind = %s'
+        params.append(kind)
+    sql += ' ORDER BY rank LIMIT %s'
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [
+            SearchResult(kind, object_id, _mark(title), _mark(snippet), rank,
+                _url(kind, object_id))
+            for kind, object_id, title, snippet, rank in cursor.fetchall()
+        ]
+
+def _search_icontains(terms, kind, tags, limit):
+    results = []
+    if kind in (None, 'lesson'):
+        lessons = Lesson.objects.all()
+        for term in terms:
+            lessons = lessons.filter(Q(title__icontains=term) |
+                Q(body__icontains=term))
+        for tag in tags:
+            lessons = lessons.filter(tags__name=tag)
+        results.extend(
+            SearchResult('lesson', lesson.id, escape(lesson.title),
+                escape(lesson.body[:200]), 0, lesson.get_absolute_url())
+            for lesson in lessons[:limit])
+    if kind in (None, 'question'):
+        questions = Question.objects.select_related('quiz')
+        for term in terms:
+            questions = questions.filter(Q(quiz__title__icontains=term) |
+                Q(body__icontains=term))
+        for tag in tags:
+            questions = questions.filter(quiz__lesson__tags__name=tag)
+        results.extend(
+            SearchResult('question', question.id, escape(question.quiz.title),
+                escape(question.body[:200]), 0, question.get_absolute_url())
+            for question in questions[:limit])
+    return results[:limit]
+
+def _mark(text):
+    return mark_safe(escape(text).replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>'))
+
+def _url(kind, object_id):
+    return reverse('{0}_detail'.format(kind), args=(object_id,))
@@ -0,0 +1,138 @@
+# Python
+from random import Random
+
+# Django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+# Local
+from . import cache, fragments, search
+from .models import Answer, Lesson, Question, QuestionStats, Quiz
+from .models import QuizResult
+from django_quiz.common.models import Tag
+
+def seed(prefix='seed', lessons=10, tags=20, tags_per_lesson=3,
+        quizzes_per_lesson=2, questions_per_quiz=20, users=100,
+        answer_rate=0.5, password='password', seed=0, batch_size=10000):
+    """
+    Generates synthetic content, users and answers with bulk inserts.
+
+    Every generated name starts with prefix, so several data sets can live
+    side by side. The same seed always produces the same data. Returns a
+    dict of the number of rows created per model.
+    """
+    random = Random(seed)
+
+    with transaction.atomic():
+        Tag.objects.bulk_create([
+            Tag(name='{0}-tag-{1}'.format(prefix, i)) for i in range(tags)
+        ])
+        tag_ids = _ids(Tag.objects.filter(
+            name__startswith='{0}-tag-'.format(prefix)))
+
+        Lesson.objects.bulk_create([
+            Lesson(title='{0} lesson {1}'.format(prefix, i),
+                body=_paragraph(random))
+            for i in range(lessons)
+        ])
+        lesson_ids = _ids(Lesson.objects.filter(
+            title__startswith='{0} lesson '.format(prefix)))
+
+        LessonTag = Lesson.tags.through
+        LessonTag.objects.bulk_create([
+            LessonTag(lesson_id=lesson_id, tag_id=tag_id)
+            for lesson_id in lesson_ids
+            for tag_id in random.sample(tag_ids,
+                min(tags_per_lesson, len(tag_ids)))
+        ])
+
+        Quiz.objects.bulk_create([
+            Quiz(lesson_id=lesson_id,
+                title='{0} quiz {1}-{2}'.format(prefix, lesson_id, i))
+            for lesson_id in lesson_ids
+            for i in range(quizzes_per_lesson)
+        ])
+        quiz_ids = _ids(Quiz.objects.filter(
+            title__startswith='{0} quiz '.format(prefix)))
+
+        _bulk_create(Question, (
+            Question(quiz_id=quiz_id, position=i,
+                body='{0} question {1}-{2}: {3}'.format(prefix, quiz_id, i,
+                    _sentence(random)),
+                correct_answer=random.random() < 0.5)
+            for quiz_id in quiz_ids
+            for i in range(questions_per_quiz)
+        ), batch_size)
+        questions = list(Question.objects.filter(
+            quiz__title__startswith='{0} quiz '.format(prefix))
+            .order_by('id').values_list('id', 'correct_answer'))
+
+        # Hashing is deliberately slow, so every user shares one hash
+        password = make_password(password)
+        User.objects.bulk_create([
+            User(username='{0}-user-{1}'.format(prefix, i), password=password)
+            for i in range(users)
+        ])
+        user_ids = _ids(User.objects.filter(
+            username__startswith='{0}-user-'.format(prefix)))
+
+        answers = _answers(random, user_ids, questions,
+            int(len(questions) * answer_rate))
+        answer_count = _bulk_create(Answer, answers, batch_size)
+
+        # Bulk inserts bypass the signals that maintain derived tables
+        QuizResult.objects.rebuild()
+        QuestionStats.objects.rebuild()
+        if search.is_available():
+            search.rebuild()
+
+    for model in cache.MODELS:
+        cache.bump(model)
+    # New rows may reuse the ids of deleted ones
+    fragments.clear()
+
+    return {
+        'tags': len(tag_ids),
+        'lessons': len(lesson_ids),
+        'quizzes': len(quiz_ids),
+        'questions': len(questions),
+        'users': len(user_ids),
+        'answers': answer_count,
+    }
+
+def _ids(queryset):
+    return list(queryset.order_by('id').values_list('id', flat=True))
+
+def _answers(random, user_ids, questions, answers_per_user):
+    for user_id in user_ids:
+        for question_id, correct_answer in random.sample(questions,
+                answers_per_user):
+            choice = random.random() < 0.5
+            yield Answer(user_id=user_id, question_id=question_id,
+                choice=choice, is_correct=choice == correct_answer)
+
+def _bulk_create(model, objs, batch_size):
+    count = 0
+    batch = []
+    for obj in objs:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch)
+            count += len(batch)
+            batch = []
+    model.objects.bulk_create(batch)
+    return count + len(batch)
+
+WORDS = (
+    'practice', 'tempo', 'scale', 'chord', 'rhythm', 'melody', 'strength',
+    'rep', 'set', 'rest', 'form', 'load', 'recovery', 'volume', 'history',
+    'theory', 'lesson', 'quiz', 'answer', 'question', 'always', 'never',
+    'true', 'false', 'before', 'after', 'during', 'slowly', 'quickly',
+)
+
+def _sentence(random, words=8):
+    return ' '.join(random.choice(WORDS) for i in range(words)).capitalize()
+
+def _paragraph(random, sentences=12):
+    return '. '.join(_sentence(random) for i in range(sentences)) + '.'
@@ -0,0 +1,258 @@
+# Django
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+from django.db.models.signals import m2m_changed, post_delete, post_migrate
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+# Local
+from . import cache, fragments, search
+from .bundles import bundles
+from .grading import regrade_question
+from .models import Answer, Lesson, Question, QuestionStats, Quiz
+from .models import QuizResult
+
+#############################
+# Quiz results and statistics
+#############################
+
+def _get_quiz_id(answer):
+    # From a resident quiz bundle rather than by loading the question
+    if not Answer.question.is_cached(answer):
+        bundle = bundles.find(answer.question_id)
+        if bundle is not None:
+            return bundle.id
+    return answer.question.quiz_id
+
+@receiver(post_save, sender=Answer)
+def record_saved_answer(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+
+    quiz_id = _get_quiz_id(instance)
+    loaded = getattr(instance, '_loaded_values', None)
+
+    if created:
+        QuizResult.objects.record_answers(instance.user_id, quiz_id, 1,
+            int(instance.is_correct))
+        QuestionStats.objects.record_answers({instance.question_id:
+            (1, int(instance.is_correct))}, instance.created_at)
+    elif loaded is None:
+        # Saved from an instance that was not loaded from the database
+        QuizResult.objects.refresh(instance.user_id, quiz_id)
+        QuestionStats.objects.refresh(instance.question_id)
+    elif (loaded['user_id'], loaded['question_id']) == (instance.user_id,
+            instance.question_id):
+        correct = int(instance.is_correct) - int(loaded['is_correct'])
+        if correct:
+            QuizResult.objects.record_answers(instance.user_id, quiz_id, 0,
+                correct)
+            QuestionStats.objects.record_answers({instance.question_id:
+                (0, correct)})
+    else:
+        old_quiz_id = Question.objects.filter(
+            id=loaded['question_id']).values_list('quiz_id', flat=True)[0]
+        QuizResult.objects.record_answers(loaded['user_id'], old_quiz_id, -1,
+            -int(loaded['is_correct']))
+        QuizResult.objects.record_answers(instance.user_id, quiz_id, 1,
+            int(instance.is_correct))
+        QuestionStats.objects.record_answers({
+            loaded['question_id']: (-1, -int(loaded['is_correct'])),
+        })
+        QuestionStats.objects.record_answers({
+            instance.question_id: (1, int(instance.is_correct)),
+        }, instance.created_at)
+
+    instance._loaded_values = {
+        'user_id': instance.user_id,
+        'question_id': instance.question_id,
+        'is_correct': instance.is_correct,
+    }
+
+@receiver(post_delete, sender=Answer)
+def record_deleted_answer(sender, instance, **kwargs):
+    quiz_ids = Question.objects.filter(
+        id=instance.question_id).values_list('quiz_id', flat=True)
+    for quiz_id in quiz_ids:
+        QuizResult.objects.record_answers(instance.user_id, quiz_id, -1,
+            -int(instance.is_correct))
+    QuestionStats.objects.record_answers({instance.question_id:
+        (-1, -int(instance.is_correct))})
+
+def _move_question(question, old_quiz_id):
+    """Moves a question's count and its answers' to its new quiz."""
+    QuizResult.objects.record_questions(old_quiz_id, -1)
+    QuizResult.objects.record_questions(question.quiz_id, 1)
+    answers = Answer.objects.filter(question=question).values_list('user_id',
+        'is_correct')
+    for user_id, is_correct in answers:
+        QuizResult.objects.record_answers(user_id, old_quiz_id, -1,
+            -int(is_correct))
+        QuizResult.objects.record_answers(user_id, question.quiz_id, 1,
+            int(is_correct))
+
+@receiver(post_save, sender=Question)
+def record_added_question(sender, instance, created, raw, **kwargs):
+    loaded = getattr(instance, '_loaded_values', {})
+    old_quiz_id = loaded.get('quiz_id', instance.quiz_id)
+    if created and not raw:
+        QuizResult.objects.record_questions(instance.quiz_id, 1)
+    elif old_quiz_id != instance.quiz_id and not raw:
+        _move_question(instance, old_quiz_id)
+
+@receiver(post_delete, sender=Question)
+def record_deleted_question(sender, instance, **kwargs):
+    QuizResult.objects.record_questions(instance.quiz_id, -1)
+
+##########
+# Grading
+##########
+
+@receiver(post_save, sender=Question)
+def regrade_changed_question(sender, instance, created, raw, **kwargs):
+    loaded = getattr(instance, '_loaded_values', {})
+    changed = loaded.get('correct_answer', instance.correct_answer) != (
+        instance.correct_answer)
+    if changed and not created and not raw:
+        # Outside the saving transaction, so each chunk commits on its own
+        transaction.on_commit(lambda: regrade_question(instance))
+
+    loaded['correct_answer'] = instance.correct_answer
+    instance._loaded_values = loaded
+
+#########
+# Search
+#########
+
+def _get_retagged_lesson_ids(instance, action, reverse, pk_set):
+    """
+    The ids of the lessons retagged by an m2m_changed signal of
+    Lesson.tags, or None before the change.
+    """
+    if reverse and action == 'pre_clear':
+        # A tag is about to be removed from all of its lessons
+        instance._retagged_lesson_ids = list(
+            Lesson.objects.filter(tags=instance).values_list('id', flat=True))
+    if not action.startswith('post_'):
+        return None
+    if not reverse:
+        return [instance.id]
+    if action == 'post_clear':
+        return getattr(instance, '_retagged_lesson_ids', [])
+    return pk_set
+
+def _index_lesson(lesson_id):
+    search.index_lessons(Lesson.objects.filter(id=lesson_id))
+    # Questions carry their lesson's tags
+    search.index_questions(Question.objects.filter(quiz__lesson=lesson_id))
+
+@receiver(connection_created)
+@receiver(post_migrate)
+def reset_search_availability(sender, **kwargs):
+    # The database may be another one, or have gained or lost the index
+    search.reset()
+
+@receiver(post_save, sender=Lesson)
+def index_saved_lesson(sender, instance, raw, **kwargs):
+    if not raw and search.is_available():
+        _index_lesson(instance.id)
+
+@receiver(m2m_changed, sender=Lesson.tags.through)
+def index_retagged_lesson(sender, instance, action, reverse, pk_set,
+        **kwargs):
+    if search.is_available():
+        lesson_ids = _get_retagged_lesson_ids(instance, action, reverse,
+            pk_set)
+        for lesson_id in lesson_ids or ():
+            _index_lesson(lesson_id)
+
+@receiver(post_save, sender=Quiz)
+def index_saved_quiz(sender, instance, created, raw, **kwargs):
+    # Questions are found by their quiz title
+    if not created and not raw and search.is_available():
+        search.index_questions(instance.question_set.all())
+
+@receiver(post_save, sender=Question)
+def index_saved_question(sender, instance, raw, **kwargs):
+    if not raw and search.is_available():
+        search.index_questions(Question.objects.filter(id=instance.id))
+
+@receiver(post_delete, sender=Lesson)
+def unindex_deleted_lesson(sender, instance, **kwargs):
+    if search.is_available():
+        search.remove('lesson', [instance.id])
+
+@receiver(post_delete, sender=Question)
+def unindex_deleted_question(sender, instance, **kwargs):
+    if search.is_available():
+        search.remove('question', [instance.id])
+
+########
+# Cache
+########
+
+def _bump(model):
+    cache.bump(model)
+    # Again once committed, in case another process cached the old rows
+    # under the new generation in the meantime
+    transaction.on_commit(lambda: cache.bump(model))
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_save, sender=Quiz)
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_delete, sender=Quiz)
+@receiver(post_delete, sender=Question)
+def bump_content_generation(sender, **kwargs):
+    _bump(sender)
+
+@receiver(m2m_changed, sender=Lesson.tags.through)
+def bump_lesson_generation(sender, action, **kwargs):
+    if action.startswith('post_'):
+        _bump(Lesson)
+
+def _bump_quizzes(quiz_ids):
+    cache.bump_quizzes(quiz_ids)
+    transaction.on_commit(lambda: cache.bump_quizzes(quiz_ids))
+
+@receiver(post_save, sender=Quiz)
+@receiver(post_delete, sender=Quiz)
+def bump_quiz_generation(sender, instance, **kwargs):
+    _bump_quizzes([instance.id])
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def bump_question_quiz_generation(sender, instance, **kwargs):
+    # Both quizzes of a moved question
+    loaded = getattr(instance, '_loaded_values', {})
+    _bump_quizzes({loaded.get('quiz_id', instance.quiz_id),
+        instance.quiz_id})
+
+#############
+# Timestamps
+#############
+
+@receiver(m2m_changed, sender=Lesson.tags.through)
+def touch_retagged_lesson(sender, instance, action, reverse, pk_set,
+        **kwargs):
+    # Retagging changes how a lesson is listed, which the lesson list's
+    # Last-Modified and ETag are derived from
+    lesson_ids = _get_retagged_lesson_ids(instance, action, reverse, pk_set)
+    if lesson_ids:
+        Lesson.objects.filter(id__in=lesson_ids).update(
+            updated_at=timezone.now())
+
+############
+# Fragments
+############
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def invalidate_question_fragments(sender, instance, **kwargs):
+    fragments.bump_question(instance.id)
+
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def invalidate_answer_fragments(sender, instance, **kwargs):
+    fragments.bump_answer(instance.user_id, instance.question_id)
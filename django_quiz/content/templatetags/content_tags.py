@@ -1,32 +1,93 @@
 # Django
 from django import template
-from django.core.exceptions import ObjectDoesNotExist
 
 # Local
-from django_quiz.content.models import Answer
+from django_quiz.content import fragments
+from django_quiz.content.loaders import AnswerLoader, get_answer_loader
 
 register = template.Library()
 
-@register.inclusion_tag('content/answers/templatetags/get_user_answer.html')
-def get_user_answer(question, user):
-    context = {
+def _get_loader(context, user):
+    request = context.get('request')
+    if request is not None and request.user.pk == user.pk:
+        return get_answer_loader(request)
+    return AnswerLoader(user)
+
+@register.simple_tag(takes_context=True)
+def prime_user_answers(context, questions, user):
+    """
+    Queues questions for get_user_answer so that the answers for all of
+    them are fetched with one query. Use it before looping over questions.
+    """
+    if user and user.is_authenticated():
+        _get_loader(context, user).prime(questions)
+    return ''
+
+@register.inclusion_tag('content/answers/templatetags/get_user_answer.html', 
+    takes_context=True)
+def get_user_answer(context, question, user):
+    tag_context = {
         'user_answer': None, 
     }
 
     if not question:
-        return context
-
-    if not user:
-        return context
+        return tag_context
 
-    user_answer = None
-    try:
-        user_answer = Answer.objects.get(question=question, user=user)
-    except ObjectDoesNotExist as e:
-        return context
+    if not user or not user.is_authenticated():
+        return tag_context
 
-    context = {
-        'user_answer': user_answer
+    tag_context = {
+        'user_answer': _get_loader(context, user).load(question)
     }
 
-    return context
+    return tag_context
+
+class CacheFragmentNode(template.Node):
+    def __init__(self, nodelist, name, question, user, fragment=None):
+        self.nodelist = nodelist
+        self.name = name
+        self.question = question
+        self.user = user
+        self.fragment = fragment
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        question = self.question.resolve(context)
+        user = self.user.resolve(context)
+        question_id = getattr(question, 'pk', question)
+
+        if self.fragment is None:
+            html = fragments.get(name, user.pk, question_id)
+        else:
+            # Looked up by the view, which left the miss to count here
+            html = self.fragment.resolve(context, ignore_failures=True)
+            if html is None:
+                fragments.record_miss()
+        if html is None:
+            html = self.nodelist.render(context)
+            fragments.store(name, user.pk, question_id, html)
+        return html
+
+@register.tag
+def cachefragment(parser, token):
+    """
+    Caches the enclosed part of the template per user and question until
+    the question or the user's answer to it changes:
+
+        {% cachefragment 'answer' question request.user %}
+            ...
+        {% endcachefragment %}
+
+    A view that already looked the fragment up with
+    fragments.get(..., count_miss=False) passes the result as a fourth
+    argument, so that it is not looked up twice.
+    """
+    bits = token.split_contents()
+    if len(bits) not in (4, 5):
+        raise template.TemplateSyntaxError(
+            "'{0}' takes a name, a question, a user and optionally the "
+            "fragment looked up already.".format(bits[0]))
+    nodelist = parser.parse(('endcachefragment',))
+    parser.delete_first_token()
+    return CacheFragmentNode(nodelist, *(parser.compile_filter(bit) 
+        for bit in bits[1:]))
@@ -1,12 +1,47 @@
 # -*- coding: utf-8 -*-
+# Python
+import csv
+import json
+import math
+import sqlite3
+from datetime import timedelta
+from io import StringIO as TextFile
+from os.path import join
+from shutil import rmtree
+from tempfile import mkdtemp, NamedTemporaryFile
+from threading import Barrier, Thread
+from unittest import mock, skipUnless
+from uuid import uuid4
+
 # Django
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.core.urlresolvers import reverse
+from django.db import connection
+from django.db.models import Sum
 from django.db.utils import IntegrityError
-from django.test import Client, TestCase
+from django.template import Context, Template
+from django.test import Client, RequestFactory, TestCase
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.six import StringIO
 
 # Local
-from .models import Answer, Lesson, Question, Quiz
+from .grading import regrade_question
+from . import analysis, cache, fragments, ingest, search
+from .bundles import BundleCache, bundles
+from .export import export
+from .importer import Importer, read
+from .loadtest import LoadTest
+from .management.commands.replicate_sqlite import Command as ReplicateCommand
+from .models import Answer, Lesson, Question, QuestionStats, Quiz
+from .models import QuizAnalysis, QuizResult
+from .views import LessonListView
+from .seeding import seed
+from django_quiz.common.models import Tag
+from django_quiz.testing import QueryCountMixin, QueryPlanMixin
 
 ###############################################################################
 # Models
@@ -135,6 +170,54 @@ class QuizDuplicateTestCase(TestCase):
         with self.assertRaises(IntegrityError):
             quiz = Quiz.objects.create(lesson=self.lesson, title=self.title)
 
+class QuizProgressTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+        self.lesson = Lesson.objects.create(title='Lesson title',
+            body='Lesson body')
+
+        self.quiz = Quiz.objects.create(lesson=self.lesson, title='Quiz title')
+        self.question1 = Question.objects.create(quiz=self.quiz,
+            body='Question 1')
+        self.question2 = Question.objects.create(quiz=self.quiz,
+            body='Question 2')
+        self.question3 = Question.objects.create(quiz=self.quiz,
+            body='Question 3')
+        Answer.objects.create(user=self.user, question=self.question1)
+
+        # Answers in another quiz must not leak into this quiz's progress
+        self.other_quiz = Quiz.objects.create(lesson=self.lesson,
+            title='Other quiz')
+        other_question = Question.objects.create(quiz=self.other_quiz,
+            body='Question 1')
+        Answer.objects.create(user=self.user, question=other_question)
+
+        # Neither must other users' answers
+        other_user = User.objects.create(username='altuser')
+        Answer.objects.create(user=other_user, question=self.question2)
+
+    def test_answered_count(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.quiz.get_answered_count(self.user), 1)
+
+    def test_unanswered_count(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.quiz.get_unanswered_count(self.user), 2)
+
+    def test_unanswered_questions(self):
+        questions = self.quiz.get_unanswered_questions(self.user)
+        self.assertEqual(set(questions), {self.question2, self.question3})
+
+    def test_next_unanswered_question(self):
+        with self.assertNumQueries(1):
+            question = self.quiz.get_next_unanswered_question(self.user)
+        self.assertEqual(question, self.question2)
+
+    def test_next_unanswered_question_when_done(self):
+        Answer.objects.create(user=self.user, question=self.question2)
+        Answer.objects.create(user=self.user, question=self.question3)
+        self.assertIsNone(self.quiz.get_next_unanswered_question(self.user))
+
 ###########
 # Question
 ###########
@@ -219,6 +302,40 @@ class QuestionDuplicateTestCase(TestCase):
         with self.assertRaises(IntegrityError):
             question = Question.objects.create(quiz=self.quiz, body=self.body)
 
+class QuestionPositionTestCase(TestCase):
+    def setUp(self):
+        lesson = Lesson.objects.create(title='Lesson title', 
+            body='Lesson body')
+        self.quiz = Quiz.objects.create(lesson=lesson, title='Quiz title')
+
+    def test_appended_positions(self):
+        question1 = Question.objects.create(quiz=self.quiz, body='Question 1')
+        question2 = Question.objects.create(quiz=self.quiz, body='Question 2')
+        self.assertEqual(question1.position, 0)
+        self.assertEqual(question2.position, 1)
+
+    def test_explicit_position(self):
+        question1 = Question.objects.create(quiz=self.quiz, body='Question 1')
+        question2 = Question.objects.create(quiz=self.quiz, body='Question 2', 
+            position=0)
+        question1.position = 1
+        question1.save()
+        self.assertEqual(list(self.quiz.question_set.all()), 
+            [question2, question1])
+
+    def test_next_unanswered_question_follows_position(self):
+        user = User.objects.create(username='testuser')
+        question1 = Question.objects.create(quiz=self.quiz, body='Question 1', 
+            position=2)
+        question2 = Question.objects.create(quiz=self.quiz, body='Question 2', 
+            position=1)
+        self.assertEqual(self.quiz.get_next_unanswered_question(user), 
+            question2)
+
+        Answer.objects.create(user=user, question=question2)
+        self.assertEqual(self.quiz.get_next_unanswered_question(user), 
+            question1)
+
 #########
 # Answer
 #########
@@ -354,6 +471,1249 @@ class AnswerDuplicateTestCase(TestCase):
             answer = Answer.objects.create(user=self.user, 
                 question=self.question)
 
+class AnswerBatchTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+        lesson = Lesson.objects.create(title='Lesson title', 
+            body='Lesson body')
+        self.quiz = Quiz.objects.create(lesson=lesson, title='Quiz title')
+        self.question1 = Question.objects.create(quiz=self.quiz, 
+            body='Question 1', correct_answer=True)
+        self.question2 = Question.objects.create(quiz=self.quiz, 
+            body='Question 2', correct_answer=False)
+
+    def test_create_batch(self):
+        questions = [self.question1, self.question2]
+        choices = {self.question1.id: True, self.question2.id: True}
+        answers = Answer.objects.create_batch(self.user, questions, choices)
+        self.assertEqual([answer.is_correct for answer in answers], 
+            [True, False])
+
+    def test_duplicate_batch(self):
+        Answer.objects.create(user=self.user, question=self.question1)
+        questions = [self.question1, self.question2]
+        choices = {self.question1.id: True, self.question2.id: True}
+        with self.assertRaises(IntegrityError):
+            Answer.objects.create_batch(self.user, questions, choices)
+
+        # Nothing from the failed batch is kept
+        self.assertFalse(Answer.objects.filter(
+            question=self.question2).exists())
+
+#############
+# QuizResult
+#############
+
+class QuizResultTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+        self.lesson = Lesson.objects.create(title='Lesson title',
+            body='Lesson body')
+        self.quiz = Quiz.objects.create(lesson=self.lesson, title='Quiz title')
+        self.question1 = Question.objects.create(quiz=self.quiz,
+            body='Question 1', correct_answer=True)
+        self.question2 = Question.objects.create(quiz=self.quiz,
+            body='Question 2', correct_answer=False)
+
+    def get_result(self):
+        return QuizResult.objects.get(user=self.user, quiz=self.quiz)
+
+    def test_no_answers(self):
+        self.assertFalse(QuizResult.objects.exists())
+        self.assertEqual(self.quiz.get_score(self.user), '0.00%')
+
+    def test_no_questions(self):
+        quiz = Quiz.objects.create(lesson=self.lesson, title='Empty quiz')
+        self.assertEqual(quiz.get_score(self.user), 'N/A')
+
+    def test_first_answer(self):
+        Answer.objects.create(user=self.user, question=self.question1,
+            choice=True)
+        result = self.get_result()
+        self.assertEqual(result.answered, 1)
+        self.assertEqual(result.correct, 1)
+        self.assertEqual(result.total, 2)
+        self.assertIsNone(result.completed_at)
+
+    def test_completed(self):
+        Answer.objects.create(user=self.user, question=self.question1,
+            choice=True)
+        Answer.objects.create(user=self.user, question=self.question2,
+            choice=True)
+        result = self.get_result()
+        self.assertEqual(result.answered, 2)
+        self.assertEqual(result.correct, 1)
+        self.assertIsNotNone(result.completed_at)
+        self.assertEqual(result.get_score_display(), '50.00%')
+
+    def test_score_lookup(self):
+        Answer.objects.create(user=self.user, question=self.question1,
+            choice=True)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.quiz.get_score(self.user), '50.00%')
+
+    def test_changed_answer(self):
+        answer = Answer.objects.create(user=self.user,
+            question=self.question1, choice=True)
+        answer = Answer.objects.get(id=answer.id)
+        answer.choice = False
+        answer.save()
+        self.assertEqual(self.get_result().correct, 0)
+
+    def test_deleted_answer(self):
+        answer = Answer.objects.create(user=self.user,
+            question=self.question1, choice=True)
+        answer.delete()
+        result = self.get_result()
+        self.assertEqual(result.answered, 0)
+        self.assertEqual(result.correct, 0)
+
+    def test_added_question(self):
+        Answer.objects.create(user=self.user, question=self.question1)
+        Answer.objects.create(user=self.user, question=self.question2)
+        self.assertIsNotNone(self.get_result().completed_at)
+
+        Question.objects.create(quiz=self.quiz, body='Question 3')
+        result = self.get_result()
+        self.assertEqual(result.total, 3)
+        self.assertIsNone(result.completed_at)
+
+    def test_deleted_question(self):
+        Answer.objects.create(user=self.user, question=self.question1,
+            choice=True)
+        self.question2.delete()
+        result = self.get_result()
+        self.assertEqual(result.total, 1)
+        self.assertIsNotNone(result.completed_at)
+
+        self.question1.delete()
+        result = self.get_result()
+        self.assertEqual(result.answered, 0)
+        self.assertEqual(result.correct, 0)
+        self.assertEqual(result.total, 0)
+        self.assertIsNone(result.completed_at)
+
+    def test_moved_question(self):
+        Answer.objects.create(user=self.user, question=self.question1,
+            choice=True)
+        Answer.objects.create(user=self.user, question=self.question2,
+            choice=True)
+        other_quiz = Quiz.objects.create(lesson=self.lesson,
+            title='Other quiz')
+        Question.objects.create(quiz=other_quiz, body='Question 3')
+
+        question = Question.objects.get(id=self.question1.id)
+        question.quiz = other_quiz
+        question.save()
+        result = self.get_result()
+        self.assertEqual((result.answered, result.correct, result.total),
+            (1, 0, 1))
+        self.assertIsNotNone(result.completed_at)
+        result = QuizResult.objects.get(user=self.user, quiz=other_quiz)
+        self.assertEqual((result.answered, result.correct, result.total),
+            (1, 1, 2))
+        self.assertIsNone(result.completed_at)
+
+        # Saved again, it is not moved twice
+        question.save()
+        self.assertEqual(self.get_result().total, 1)
+
+        # Matches a rebuild
+        expected = list(QuizResult.objects.order_by('quiz').values_list(
+            'quiz', 'answered', 'correct', 'total'))
+        QuizResult.objects.rebuild()
+        self.assertEqual(list(QuizResult.objects.order_by('quiz')
+            .values_list('quiz', 'answered', 'correct', 'total')), expected)
+
+    def test_rebuild(self):
+        Answer.objects.create(user=self.user, question=self.question1,
+            choice=True)
+        Answer.objects.create(user=self.user, question=self.question2,
+            choice=True)
+        expected = self.get_result()
+        QuizResult.objects.all().delete()
+
+        out = StringIO()
+        call_command('rebuild_quiz_results', stdout=out)
+        self.assertIn('Rebuilt 1 quiz results.', out.getvalue())
+
+        result = self.get_result()
+        self.assertEqual(result.answered, expected.answered)
+        self.assertEqual(result.correct, expected.correct)
+        self.assertEqual(result.total, expected.total)
+        self.assertIsNotNone(result.completed_at)
+
+################
+# QuestionStats
+################
+
+class QuestionStatsTestCase(TestCase):
+    def setUp(self):
+        self.users = [User.objects.create(username='testuser{0}'.format(i))
+            for i in range(3)]
+        self.lesson = Lesson.objects.create(title='Lesson title',
+            body='Lesson body')
+        self.quiz = Quiz.objects.create(lesson=self.lesson, title='Quiz title')
+        self.question1 = Question.objects.create(quiz=self.quiz,
+            body='Question 1', correct_answer=True)
+        self.question2 = Question.objects.create(quiz=self.quiz,
+            body='Question 2', correct_answer=False)
+
+    def get_stats(self, question):
+        return QuestionStats.objects.get(question=question)
+
+    def test_no_answers(self):
+        self.assertFalse(QuestionStats.objects.exists())
+
+    def test_answers(self):
+        for user, choice in zip(self.users, (True, True, False)):
+            answer = Answer.objects.create(user=user, 
+                question=self.question1, choice=choice)
+        stats = self.get_stats(self.question1)
+        self.assertEqual(stats.attempts, 3)
+        self.assertEqual(stats.correct, 2)
+        self.assertEqual(stats.last_answered, answer.created_at)
+        self.assertEqual(stats.get_correct_rate_display(), '67%')
+
+    def test_changed_answer(self):
+        answer = Answer.objects.create(user=self.users[0],
+            question=self.question1, choice=True)
+        answer = Answer.objects.get(id=answer.id)
+        answer.choice = False
+        answer.save()
+        stats = self.get_stats(self.question1)
+        self.assertEqual(stats.attempts, 1)
+        self.assertEqual(stats.correct, 0)
+
+    def test_moved_answer(self):
+        answer = Answer.objects.create(user=self.users[0],
+            question=self.question1, choice=True)
+        answer = Answer.objects.get(id=answer.id)
+        answer.question = self.question2
+        answer.save()
+        self.assertEqual(self.get_stats(self.question1).attempts, 0)
+        self.assertEqual(self.get_stats(self.question1).correct, 0)
+        self.assertEqual(self.get_stats(self.question2).attempts, 1)
+
+    def test_deleted_answer(self):
+        answer = Answer.objects.create(user=self.users[0],
+            question=self.question1, choice=True)
+        answer.delete()
+        stats = self.get_stats(self.question1)
+        self.assertEqual(stats.attempts, 0)
+        self.assertEqual(stats.correct_rate, None)
+        self.assertEqual(stats.get_correct_rate_display(), 'N/A')
+
+    def test_batch(self):
+        Answer.objects.create(user=self.users[0], question=self.question1)
+        # Both correct: one UPDATE, then the row of question 2 is found
+        # missing and inserted
+        with CaptureQueriesContext(connection) as queries:
+            Answer.objects.create_batch(self.users[1], 
+                [self.question1, self.question2], 
+                {self.question1.id: True, self.question2.id: False})
+        self.assertEqual(len([query for query in queries 
+            if 'content_questionstats' in query['sql']]), 3)
+        self.assertEqual(self.get_stats(self.question1).attempts, 2)
+        self.assertEqual(self.get_stats(self.question2).correct, 1)
+
+    def test_regrade(self):
+        Answer.objects.create(user=self.users[0], question=self.question1,
+            choice=True)
+        Answer.objects.create(user=self.users[1], question=self.question1,
+            choice=False)
+        self.question1.correct_answer = False
+        self.question1.save()
+        regrade_question(self.question1)
+        stats = self.get_stats(self.question1)
+        self.assertEqual(stats.attempts, 2)
+        self.assertEqual(stats.correct, 1)
+
+    def test_by_difficulty(self):
+        Answer.objects.create(user=self.users[0], question=self.question1,
+            choice=False)
+        Answer.objects.create(user=self.users[0], question=self.question2,
+            choice=False)
+        self.assertEqual([stats.question_id 
+            for stats in QuestionStats.objects.by_difficulty()], 
+            [self.question1.id, self.question2.id])
+
+    def test_rebuild(self):
+        for user, choice in zip(self.users, (True, True, False)):
+            Answer.objects.create(user=user, question=self.question1, 
+                choice=choice)
+        Answer.objects.create(user=self.users[0], question=self.question2)
+        expected = self.get_stats(self.question1)
+        QuestionStats.objects.all().delete()
+
+        out = StringIO()
+        call_command('rebuild_question_stats', stdout=out)
+        self.assertIn('Rebuilt statistics of 2 questions.', out.getvalue())
+
+        stats = self.get_stats(self.question1)
+        self.assertEqual(stats.attempts, expected.attempts)
+        self.assertEqual(stats.correct, expected.correct)
+        self.assertEqual(stats.last_answered, expected.last_answered)
+
+##########
+# Grading
+##########
+
+class RegradeTestCase(TestCase):
+    def setUp(self):
+        lesson = Lesson.objects.create(title='Lesson title', 
+            body='Lesson body')
+        self.quiz = Quiz.objects.create(lesson=lesson, title='Quiz title')
+        self.question = Question.objects.create(quiz=self.quiz, 
+            body='Question body', correct_answer=True)
+        self.users = [
+            User.objects.create(username='user{0}'.format(i)) 
+            for i in range(5)
+        ]
+        for i, user in enumerate(self.users):
+            Answer.objects.create(user=user, question=self.question, 
+                choice=i % 2 == 0)
+
+    def fix_question(self):
+        # Changed without save() so that no automatic regrade runs
+        Question.objects.filter(id=self.question.id).update(
+            correct_answer=False)
+        self.question.correct_answer = False
+
+    def test_regrade(self):
+        self.fix_question()
+        self.assertEqual(regrade_question(self.question, chunk_size=2), 5)
+
+        for answer in Answer.objects.all():
+            self.assertEqual(answer.is_correct, not answer.choice)
+        for result in QuizResult.objects.all():
+            self.assertEqual(result.correct, 
+                Answer.objects.filter(user=result.user, 
+                    is_correct=True).count())
+
+    def test_regrade_is_idempotent(self):
+        self.fix_question()
+        regrade_question(self.question)
+        self.assertEqual(regrade_question(self.question), 0)
+
+    def test_progress(self):
+        self.fix_question()
+        calls = []
+        regrade_question(self.question, chunk_size=2, 
+            progress=lambda *args: calls.append(args))
+        self.assertEqual(calls, [(2, 2), (4, 4), (5, 5)])
+
+    def test_command(self):
+        self.fix_question()
+        out = StringIO()
+        call_command('regrade_answers', quiz=[self.quiz.id], chunk_size=2, 
+            stdout=out)
+        self.assertIn('Done: 5 answers changed.', out.getvalue())
+        self.assertFalse(Answer.objects.filter(choice=False, 
+            is_correct=False).exists())
+
+class AutomaticRegradeTestCase(TransactionTestCase):
+    def test_changed_correct_answer(self):
+        user = User.objects.create(username='testuser')
+        lesson = Lesson.objects.create(title='Lesson title', 
+            body='Lesson body')
+        quiz = Quiz.objects.create(lesson=lesson, title='Quiz title')
+        question = Question.objects.create(quiz=quiz, body='Question body', 
+            correct_answer=True)
+        Answer.objects.create(user=user, question=question, choice=True)
+
+        question = Question.objects.get(id=question.id)
+        question.correct_answer = False
+        question.save()
+
+        self.assertFalse(Answer.objects.get().is_correct)
+        self.assertEqual(QuizResult.objects.get().correct, 0)
+
+##########
+# Bundles
+##########
+
+class QuizBundleTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+        self.lesson = Lesson.objects.create(title='Lesson title', 
+            body='Lesson body')
+        self.quiz = Quiz.objects.create(lesson=self.lesson, title='Quiz title')
+        self.question1 = Question.objects.create(quiz=self.quiz, 
+            body='Question 1', correct_answer=True)
+        self.question2 = Question.objects.create(quiz=self.quiz, 
+            body='Question 2', correct_answer=False)
+        self.bundles = BundleCache(size=2)
+
+    def test_bundle(self):
+        with self.assertNumQueries(2):
+            bundle = self.bundles.get(self.quiz.id)
+        self.assertEqual(bundle.title, 'Quiz title')
+        self.assertEqual(bundle.lesson_id, self.lesson.id)
+        self.assertEqual([question.id for question in bundle.questions], 
+            [self.question1.id, self.question2.id])
+        self.assertEqual(bundle.get_number(self.question2.id), 2)
+        self.assertTrue(bundle.get_question(self.question1.id).grade(True))
+        self.assertEqual(bundle.get_next_unanswered({self.question1.id}), 
+            bundle.get_question(self.question2.id))
+
+        with self.assertNumQueries(0):
+            self.assertIs(self.bundles.get(self.quiz.id), bundle)
+
+        with self.assertRaises(Quiz.DoesNotExist):
+            self.bundles.get(self.quiz.id + 1)
+
+    def test_rebuilt_on_change(self):
+        bundle = self.bundles.get(self.quiz.id)
+        self.question1.position = 2
+        self.question1.save()
+        rebuilt = self.bundles.get(self.quiz.id)
+        self.assertIsNot(rebuilt, bundle)
+        self.assertEqual(rebuilt.get_number(self.question2.id), 1)
+
+        self.quiz.title = 'New title'
+        self.quiz.save()
+        self.assertEqual(self.bundles.get(self.quiz.id).title, 'New title')
+
+    def test_other_quiz_changed(self):
+        bundle = self.bundles.get(self.quiz.id)
+        other_quiz = Quiz.objects.create(lesson=self.lesson, 
+            title='Other quiz')
+        question = Question.objects.create(quiz=other_quiz, 
+            body='Other question')
+        question.body = 'Changed'
+        question.save()
+        with self.assertNumQueries(0):
+            self.assertIs(self.bundles.get(self.quiz.id), bundle)
+
+        # Moved out of the quiz, into a resident bundle
+        self.bundles.get(other_quiz.id)
+        self.question2.quiz = other_quiz
+        self.question2.save()
+        self.assertEqual([question.id for question in 
+            self.bundles.get(self.quiz.id).questions], [self.question1.id])
+        self.assertIn(self.question2.id, self.bundles.get(other_quiz.id).by_id)
+
+    def test_lru(self):
+        quizzes = [self.quiz] + [
+            Quiz.objects.create(lesson=self.lesson, 
+                title='Quiz {0}'.format(i)) 
+            for i in range(2)
+        ]
+        for quiz in quizzes:
+            self.bundles.get(quiz.id)
+        self.assertEqual(list(self.bundles.bundles), 
+            [quizzes[1].id, quizzes[2].id])
+        self.assertIsNone(self.bundles.find(self.question1.id))
+
+        self.bundles.get(quizzes[1].id)
+        self.bundles.get(self.quiz.id)
+        self.assertEqual(list(self.bundles.bundles), 
+            [quizzes[1].id, self.quiz.id])
+        self.assertEqual(self.bundles.find(self.question1.id).id, 
+            self.quiz.id)
+
+    def test_answer_graded_from_bundle(self):
+        Answer.objects.create(user=self.user, question=self.question2)
+        bundles.get(self.quiz.id)
+        QuestionStats.objects.create(question=self.question1)
+        answer = Answer(user=self.user, question_id=self.question1.id, 
+            choice=True)
+        # The insert and the quiz result and question statistics updates,
+        # without loading the question
+        with self.assertNumQueries(3):
+            answer.save()
+        self.assertTrue(answer.is_correct)
+        self.assertEqual(QuizResult.objects.get().correct, 2)
+
+########
+# Cache
+########
+
+class ContentCacheTestCase(TestCase):
+    def setUp(self):
+        cache.reset_stats()
+        self.lesson = Lesson.objects.create(title='Lesson title', 
+            body='Lesson body')
+        self.quiz = Quiz.objects.create(lesson=self.lesson, title='Quiz title')
+        self.question = Question.objects.create(quiz=self.quiz, 
+            body='Question body')
+
+    def test_get(self):
+        for model, obj in ((Lesson, self.lesson), (Quiz, self.quiz), 
+                (Question, self.question)):
+            self.assertEqual(cache.get(model, obj.id), obj)
+            with self.assertNumQueries(0):
+                self.assertEqual(cache.get(model, obj.id), obj)
+
+        with self.assertRaises(Lesson.DoesNotExist):
+            cache.get(Lesson, self.lesson.id + 1)
+
+    def test_invalidation(self):
+        cache.get(Quiz, self.quiz.id)
+        self.quiz.title = 'New title'
+        self.quiz.save()
+        self.assertEqual(cache.get(Quiz, self.quiz.id).title, 'New title')
+
+        # Only the changed model is invalidated
+        cache.get(Lesson, self.lesson.id)
+        Question.objects.create(quiz=self.quiz, body='Another question')
+        with self.assertNumQueries(0):
+            cache.get(Lesson, self.lesson.id)
+
+        generation = cache.get_generation(Lesson)
+        self.lesson.tags.create(name='music')
+        self.assertGreater(cache.get_generation(Lesson), generation)
+
+        self.question.delete()
+        with self.assertRaises(Question.DoesNotExist):
+            cache.get(Question, self.question.id)
+
+    def test_quizzes(self):
+        self.assertEqual(cache.get_quizzes(self.lesson.id), [self.quiz])
+        quiz = Quiz.objects.create(lesson=self.lesson, title='Another quiz')
+        self.assertEqual(cache.get_quizzes(self.lesson.id), [self.quiz, quiz])
+
+    def test_evicted_generation(self):
+        cache.get(Lesson, self.lesson.id)
+        generation = cache.get_generation(Lesson)
+        cache.get_cache().delete('content:generation:lesson')
+        cache.bump(Lesson)
+        self.assertNotEqual(cache.get_generation(Lesson), generation)
+
+    def test_stats(self):
+        cache.get(Lesson, self.lesson.id)
+        cache.get(Lesson, self.lesson.id)
+        cache.get(Lesson, self.lesson.id)
+        stats = cache.get_stats()
+        self.assertEqual(stats['lesson']['hits'], 2)
+        self.assertEqual(stats['lesson']['misses'], 1)
+        self.assertEqual(stats['quiz']['hits'], 0)
+
+        out = StringIO()
+        call_command('content_cache_stats', reset=True, stdout=out)
+        self.assertIn('66.7%', out.getvalue())
+        self.assertEqual(cache.get_stats()['lesson']['hits'], 0)
+
+    def test_file_based_cache(self):
+        location = mkdtemp()
+        self.addCleanup(rmtree, location)
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': location}}):
+            self.assertEqual(cache.get(Quiz, self.quiz.id), self.quiz)
+            self.quiz.title = 'New title'
+            self.quiz.save()
+            self.assertEqual(cache.get(Quiz, self.quiz.id).title, 'New title')
+            self.assertEqual(cache.get_stats()['quiz']['misses'], 2)
+
+############
+# Ingestion
+############
+
+class IngestTestCase(TestCase):
+    def setUp(self):
+        directory = mkdtemp()
+        self.addCleanup(rmtree, directory)
+        settings = override_settings(ANSWER_INGESTION_MODE='queue', 
+            ANSWER_QUEUE_PATH=join(directory, 'queue.sqlite3'), 
+            ANSWER_QUEUE_WORKER=False)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(lambda: ingest.get_queue().close())
+
+        lesson = Lesson.objects.create(title='Music', 
+            body='You must practice.')
+        self.quiz = Quiz.objects.create(lesson=lesson, title='Quiz title')
+        self.question1 = Question.objects.create(quiz=self.quiz, 
+            body='Question 1', correct_answer=True)
+        self.question2 = Question.objects.create(quiz=self.quiz, 
+            body='Question 2')
+        self.user = User.objects.create_user(username='testuser', 
+            password='0xdeadbeef')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def answer(self, question, choice=True):
+        return self.client.post(reverse('answer_create', 
+            args=(question.id,)), {'choice': choice})
+
+    def test_queued(self):
+        response = self.answer(self.question1)
+        self.assertTrue(response['Location'].endswith(
+            self.question2.get_absolute_url()))
+        self.assertFalse(Answer.objects.exists())
+        self.assertEqual(len(ingest.get_queue()), 1)
+
+        # The user sees their queued answer
+        response = self.client.get(self.question1.get_absolute_url())
+        self.assertTrue(response.context['already_answered'])
+        self.assertContains(response, 'Your Answer: True')
+        response = self.client.get(self.quiz.get_absolute_url())
+        self.assertEqual(response.context['next_question'].id, 
+            self.question2.id)
+
+        self.assertEqual(ingest.drain(), 1)
+        self.assertEqual(len(ingest.get_queue()), 0)
+        answer = Answer.objects.get(user=self.user)
+        self.assertTrue(answer.is_correct)
+        result = self.quiz.get_result(self.user)
+        self.assertEqual((result.answered, result.correct), (1, 1))
+
+    def test_duplicates(self):
+        self.answer(self.question1, True)
+        self.answer(self.question1, False)
+        self.assertEqual(len(ingest.get_queue()), 1)
+
+        # Answered since it was queued
+        Answer.objects.create(user=self.user, question=self.question2)
+        self.answer(self.question2)
+        self.assertEqual(ingest.drain(), 1)
+        self.assertEqual(Answer.objects.filter(user=self.user).count(), 2)
+        self.assertTrue(Answer.objects.get(question=self.question1).choice)
+        self.assertEqual(self.quiz.get_result(self.user).answered, 2)
+
+    def test_batches(self):
+        users = [User.objects.create(username='user{0}'.format(i)) 
+            for i in range(5)]
+        for user in users:
+            for question in (self.question1, self.question2):
+                ingest.enqueue(user, question, True)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(ingest.drain(batch_size=4), 10)
+        inserts = [query for query in queries.captured_queries 
+            if query['sql'].startswith('INSERT INTO "content_answer"')]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(QuizResult.objects.get(user=users[0]).correct, 1)
+
+    def test_retry(self):
+        self.answer(self.question1)
+        write_answers = ingest.write_answers
+        attempts = []
+        def conflicting(rows):
+            attempts.append(rows)
+            if len(attempts) == 1:
+                raise IntegrityError
+            return write_answers(rows)
+        with mock.patch.object(ingest, 'write_answers', conflicting):
+            self.assertEqual(ingest.drain(), 1)
+        self.assertEqual(len(attempts), 2)
+        self.assertEqual(len(ingest.get_queue()), 0)
+
+    def test_retry_failed(self):
+        self.answer(self.question1)
+        with mock.patch.object(ingest, 'write_answers', 
+                side_effect=IntegrityError) as write:
+            with self.assertRaises(IntegrityError):
+                ingest.drain()
+            self.assertEqual(write.call_count, ingest.WRITE_ATTEMPTS)
+            # Still queued, and the user's pages do not fail
+            self.assertEqual(len(ingest.get_queue()), 1)
+            with self.assertLogs('django_quiz.ingest'):
+                ingest.drain_user(self.user)
+        self.assertEqual(len(ingest.get_queue()), 1)
+
+    def test_scores_drain(self):
+        self.answer(self.question1)
+        response = self.client.get(reverse('quiz_answer_list', 
+            args=(self.quiz.id,)))
+        self.assertEqual(len(response.context['object_list']), 1)
+        self.assertEqual(len(ingest.get_queue()), 0)
+
+    def test_command(self):
+        self.answer(self.question1)
+        out = StringIO()
+        call_command('drain_answer_queue', stdout=out)
+        self.assertIn('Wrote 1 answers; 0 still queued.', out.getvalue())
+
+#########
+# Search
+#########
+
+class SearchTestCase(TestCase):
+    def setUp(self):
+        self.music = Tag.objects.create(name='music')
+        self.lesson = Lesson.objects.create(title='Scales', 
+            body='Practice your scales slowly with a metronome.')
+        self.lesson.tags.add(self.music)
+        self.quiz = Quiz.objects.create(lesson=self.lesson, 
+            title='Scales quiz')
+        self.question = Question.objects.create(quiz=self.quiz, 
+            body='Is a metronome <useful>?')
+
+    def found(self, query, **kwargs):
+        return [
+            (result.kind, result.object_id) 
+            for result in search.search(query, **kwargs)
+        ]
+
+    def test_available(self):
+        self.assertTrue(search.is_available())
+        # Looked up once per connection
+        with self.assertNumQueries(0):
+            self.assertTrue(search.is_available())
+        search.reset()
+        with self.assertNumQueries(1):
+            self.assertTrue(search.is_available())
+
+    def test_search(self):
+        self.assertEqual(set(self.found('metronome')), 
+            {('lesson', self.lesson.id), ('question', self.question.id)})
+        self.assertEqual(self.found('metronome', kind='question'), 
+            [('question', self.question.id)])
+        self.assertEqual(self.found('slowly metronome'), 
+            [('lesson', self.lesson.id)])
+        self.assertEqual(self.found('metro'), self.found('metronome'))
+        self.assertEqual(self.found('tuba'), [])
+        self.assertEqual(self.found('" OR *'), [])
+
+    def test_rank(self):
+        lesson = Lesson.objects.create(title='Metronome', body='Tick.')
+        self.assertEqual(self.found('metronome', kind='lesson'), 
+            [('lesson', lesson.id), ('lesson', self.lesson.id)])
+
+    def test_highlight(self):
+        result, = search.search('useful')
+        self.assertEqual(result.url, self.question.get_absolute_url())
+        self.assertEqual(result.title, 'Scales quiz')
+        self.assertEqual(result.snippet, 
+            'Is a metronome &lt;<mark>useful</mark>&gt;?')
+
+    def test_tags(self):
+        self.assertEqual(len(self.found('metronome', tags=['music'])), 2)
+        self.assertEqual(self.found('metronome', tags=['sports']), [])
+
+        self.lesson.tags.remove(self.music)
+        self.assertEqual(self.found('metronome', tags=['music']), [])
+        self.lesson.tags.add(self.music)
+        self.music.lesson.clear()
+        self.assertEqual(self.found('metronome', tags=['music']), [])
+
+    def test_update(self):
+        self.question.body = 'Is a tuba useful?'
+        self.question.save()
+        self.assertEqual(self.found('tuba'), [('question', self.question.id)])
+        self.assertEqual(self.found('metronome'), [('lesson', self.lesson.id)])
+
+        self.quiz.title = 'Brass quiz'
+        self.quiz.save()
+        self.assertEqual(self.found('brass'), [('question', self.question.id)])
+
+    def test_delete(self):
+        self.question.delete()
+        self.assertEqual(self.found('metronome'), [('lesson', self.lesson.id)])
+        self.lesson.delete()
+        self.assertEqual(self.found('metronome'), [])
+
+    def test_rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM content_search')
+        self.assertEqual(self.found('metronome'), [])
+
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Indexed 1 lessons and 1 questions.', out.getvalue())
+        self.assertEqual(len(self.found('metronome')), 2)
+
+    @mock.patch.object(search, 'is_available', lambda: False)
+    def test_fallback(self):
+        self.assertEqual(set(self.found('metronome')), 
+            {('lesson', self.lesson.id), ('question', self.question.id)})
+        self.assertEqual(self.found('metronome', tags=['sports']), [])
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        self.music = Tag.objects.create(name='music')
+        self.lesson1 = Lesson.objects.create(title='Music', body='Music')
+        self.lesson1.tags.add(self.music)
+        self.lesson2 = Lesson.objects.create(title='Sports', body='Sports')
+        self.quiz1 = Quiz.objects.create(lesson=self.lesson1, title='Quiz 1')
+        self.quiz2 = Quiz.objects.create(lesson=self.lesson2, title='Quiz 2')
+
+        self.users = [
+            User.objects.create(username='user{0}'.format(i)) 
+            for i in range(3)
+        ]
+        for quiz in (self.quiz1, self.quiz2):
+            for i in range(2):
+                question = Question.objects.create(quiz=quiz, 
+                    body='{0} question {1}'.format(quiz.title, i), 
+                    correct_answer=True)
+                for user in self.users:
+                    Answer.objects.create(user=user, question=question, 
+                        choice=True)
+
+    def read_csv(self, **kwargs):
+        return list(csv.DictReader(''.join(export('answers', 'csv', 
+            **kwargs)).splitlines()))
+
+    def test_csv(self):
+        rows = self.read_csv()
+        self.assertEqual(len(rows), 12)
+        self.assertEqual(rows[0]['user'], 'user0')
+        self.assertEqual(rows[0]['lesson'], 'Music')
+        self.assertEqual(rows[0]['quiz'], 'Quiz 1')
+        self.assertEqual(rows[0]['is_correct'], 'True')
+        self.assertEqual([int(row['id']) for row in rows], 
+            list(Answer.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_jsonl(self):
+        rows = [json.loads(line) for line in export('scores', 'jsonl')]
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]['correct'], 2)
+        self.assertEqual(rows[0]['total'], 2)
+        self.assertTrue(rows[0]['completed_at'])
+
+    def test_filters(self):
+        self.assertEqual(len(self.read_csv(quiz=self.quiz2.id)), 6)
+        self.assertEqual(len(self.read_csv(lesson=self.lesson1.id)), 6)
+        rows = self.read_csv(tag='music')
+        self.assertEqual({row['lesson'] for row in rows}, {'Music'})
+        today = timezone.now().date()
+        self.assertEqual(len(self.read_csv(since=today)), 12)
+        self.assertEqual(len(self.read_csv(until=today)), 0)
+        self.assertEqual(len(self.read_csv(since=today, 
+            until=today + timedelta(days=1))), 12)
+
+    def test_chunks(self):
+        # One query per chunk, and one to find there is no more
+        with self.assertNumQueries(3):
+            rows = list(export('answers', 'jsonl', chunk_size=5))
+        self.assertEqual(len(rows), 12)
+
+    def test_view(self):
+        client = Client()
+        user = User.objects.create_user(username='staff', password='staff')
+        client.login(username='staff', password='staff')
+        url = reverse('export')
+        self.assertEqual(client.get(url).status_code, 302)
+
+        user.is_staff = True
+        user.save()
+        response = client.get(url, {'format': 'jsonl', 'quiz': self.quiz1.id})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 
+            'attachment; filename="answers.jsonl"')
+        lines = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 6)
+
+        response = client.get(url, {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('export_answers', kind='scores', lesson=self.lesson2.id, 
+            stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0].split(','), ['id', 'user', 'lesson', 
+            'quiz', 'answered', 'correct', 'total', 'completed_at'])
+        self.assertEqual(len(lines), 4)
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+LESSONS = [
+    {
+        'title': 'Music',
+        'body': 'You must practice.',
+        'tags': ['music', 'practice'],
+        'quizzes': [
+            {
+                'title': 'Scales',
+                'questions': [
+                    {'body': 'A major has three sharps.', 
+                        'correct_answer': True},
+                    {'body': 'C major has one flat.', 
+                        'correct_answer': False},
+                ],
+            },
+            {'title': 'Chords'},
+        ],
+    },
+    {'title': 'Strength Training', 'body': '1-5 reps.'},
+]
+
+class ImporterTestCase(TestCase):
+    def run_import(self, text, format='json', **kwargs):
+        return Importer(**kwargs).run(read(TextFile(text), format))
+
+    def assertImported(self):
+        lesson = Lesson.objects.get(title='Music')
+        self.assertEqual(lesson.body, 'You must practice.')
+        self.assertEqual(sorted(lesson.tags.values_list('name', flat=True)), 
+            ['music', 'practice'])
+        self.assertEqual(list(lesson.quiz_set.order_by('title').values_list(
+            'title', flat=True)), ['Chords', 'Scales'])
+        questions = Question.objects.filter(quiz__title='Scales')
+        self.assertEqual(list(questions.values_list('body', 'correct_answer', 
+            'position')), [('A major has three sharps.', True, 0), 
+            ('C major has one flat.', False, 1)])
+        self.assertTrue(Lesson.objects.filter(title='Strength Training')
+            .exists())
+
+    def test_json(self):
+        report = self.run_import(json.dumps(LESSONS))
+        self.assertImported()
+        self.assertEqual(report.created, {'tags': 2, 'lessons': 2, 
+            'quizzes': 2, 'questions': 2})
+        self.assertFalse(report.conflicts)
+
+    def test_jsonl(self):
+        self.run_import('\n'.join(json.dumps(lesson) for lesson in LESSONS), 
+            'jsonl')
+        self.assertImported()
+
+    def test_csv(self):
+        self.run_import(
+            'lesson,lesson_body,tags,quiz,question,correct_answer,position\n'
+            'Music,You must practice.,"music,practice",Scales,'
+            'A major has three sharps.,true,\n'
+            'Music,,,Scales,C major has one flat.,false,\n'
+            'Music,,,Chords,,,\n'
+            'Strength Training,1-5 reps.,,,,,\n', 'csv')
+        self.assertImported()
+
+    @skipUnless(yaml, 'PyYAML is not installed')
+    def test_yaml(self):
+        self.run_import(yaml.safe_dump(LESSONS), 'yaml')
+        self.assertImported()
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.run_import('[{"body": "No title"}]')
+        with self.assertRaises(ValueError):
+            self.run_import('{"title": "Music", "quizzes": [', 'jsonl')
+
+    def test_batches(self):
+        report = self.run_import(json.dumps(LESSONS), batch_size=1)
+        self.assertImported()
+        self.assertEqual(report.created['lessons'], 2)
+
+    def test_update(self):
+        user = User.objects.create(username='testuser')
+        self.run_import(json.dumps(LESSONS))
+        question = Question.objects.get(body='C major has one flat.')
+        Answer.objects.create(user=user, question=question, choice=False)
+        self.assertEqual(QuizResult.objects.get().total, 2)
+
+        report = self.run_import(json.dumps(LESSONS))
+        self.assertEqual(sum(report.created.values()), 0)
+        self.assertEqual(sum(report.updated.values()), 0)
+
+        LESSONS_CHANGED = json.loads(json.dumps(LESSONS))
+        LESSONS_CHANGED[0]['body'] = 'Practice every day.'
+        scales = LESSONS_CHANGED[0]['quizzes'][0]['questions']
+        scales[1]['correct_answer'] = True
+        scales.append({'body': 'G major has one sharp.', 
+            'correct_answer': True})
+        report = self.run_import(json.dumps(LESSONS_CHANGED))
+        self.assertEqual(report.created, {'questions': 1})
+        self.assertEqual(report.updated, {'lessons': 1, 'questions': 1})
+        self.assertEqual(report.regraded, 1)
+
+        self.assertEqual(Lesson.objects.get(title='Music').body, 
+            'Practice every day.')
+        self.assertEqual(Question.objects.get(
+            body='G major has one sharp.').position, 2)
+        self.assertFalse(Answer.objects.get().is_correct)
+        self.assertEqual(QuizResult.objects.get().total, 3)
+        self.assertEqual(QuizResult.objects.get().correct, 0)
+
+    def test_conflicts(self):
+        lesson = Lesson.objects.create(title='Other', body='Other')
+        Quiz.objects.create(lesson=lesson, title='Chords')
+        lessons = json.loads(json.dumps(LESSONS))
+        lessons[1]['quizzes'] = [{'title': 'Scales', 'questions': [
+            {'body': 'Elsewhere', 'correct_answer': True}]}]
+        lessons.append({'title': 'Music', 'quizzes': [{'title': 'Scales', 
+            'questions': [{'body': 'C major has one flat.', 
+            'correct_answer': True}]}]})
+
+        report = self.run_import(json.dumps(lessons))
+        self.assertEqual(len(report.conflicts), 3)
+        self.assertEqual([line for line, message in report.conflicts], 
+            [2, 3, 1])
+        self.assertFalse(Question.objects.filter(body='Elsewhere').exists())
+        self.assertFalse(Quiz.objects.get(title='Chords').question_set
+            .exists())
+        self.assertFalse(Question.objects.get(
+            body='C major has one flat.').correct_answer)
+
+    def test_conflicts_across_batches(self):
+        lesson = Lesson.objects.create(title='Other', body='Other')
+        Quiz.objects.create(lesson=lesson, title='Chords')
+        lessons = [{'title': 'Music', 'quizzes': [{'title': 'Chords'}]}] * 2
+
+        report = self.run_import(json.dumps(lessons), batch_size=1)
+        self.assertEqual(report.conflicts, [
+            (line, 'Quiz "Chords" belongs to another lesson; quiz titles '
+                'are unique.')
+            for line in (1, 2)
+        ])
+
+    def test_partial(self):
+        text = '\n'.join([json.dumps(lesson) for lesson in LESSONS] + 
+            ['{"title": "Broken"'])
+        with self.assertRaisesRegex(ValueError, 
+                'Line 3: .* The 4 rows before it were imported.'):
+            self.run_import(text, 'jsonl', batch_size=1)
+        self.assertImported()
+        with self.assertRaisesRegex(ValueError, 'Line 3: [^.]*$'):
+            self.run_import(text, 'jsonl')
+
+    def test_dry_run(self):
+        self.run_import(json.dumps(LESSONS))
+        question = Question.objects.get(body='C major has one flat.')
+        generations = cache.get_generations()
+        fragments.store('answer', 1, question.id, 'Fragment')
+
+        lessons = json.loads(json.dumps(LESSONS))
+        lessons[0]['quizzes'][0]['questions'][1]['correct_answer'] = True
+        lessons.append({'title': 'Yoga'})
+        report = self.run_import(json.dumps(lessons), dry_run=True)
+        self.assertEqual(report.created['lessons'], 1)
+        self.assertEqual(report.updated['questions'], 1)
+        self.assertFalse(Lesson.objects.filter(title='Yoga').exists())
+        # Nothing to invalidate
+        self.assertEqual(cache.get_generations(), generations)
+        self.assertEqual(fragments.get('answer', 1, question.id), 'Fragment')
+
+    def test_dry_run_new(self):
+        report = self.run_import(json.dumps(LESSONS), dry_run=True)
+        self.assertEqual(report.created['questions'], 2)
+        self.assertFalse(Lesson.objects.exists())
+        self.assertFalse(Tag.objects.exists())
+
+    def test_search_index(self):
+        self.run_import(json.dumps(LESSONS))
+        self.assertEqual(len(search.search('sharps')), 1)
+        self.assertEqual(len(search.search('flat', tags=['music'])), 1)
+
+    def test_command(self):
+        with NamedTemporaryFile('w', suffix='.jsonl') as file:
+            file.write('\n'.join(json.dumps(lesson) for lesson in LESSONS))
+            file.flush()
+            out = StringIO()
+            call_command('import_content', file.name, dry_run=True, 
+                stdout=out)
+            self.assertIn('Questions: 2 created, 0 updated', out.getvalue())
+            self.assertFalse(Lesson.objects.exists())
+
+            call_command('import_content', file.name, stdout=StringIO())
+        self.assertImported()
+
+    def test_admin(self):
+        client = Client()
+        User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        client.login(username='admin', password='admin')
+        url = reverse('admin:content_lesson_import')
+        self.assertContains(client.get(reverse(
+            'admin:content_lesson_changelist')), url)
+
+        upload = TextFile(json.dumps(LESSONS))
+        upload.name = 'lessons.json'
+        response = client.post(url, {'file': upload, 'dry_run': True})
+        self.assertContains(response, 'Dry run')
+        self.assertFalse(Lesson.objects.exists())
+
+        upload.seek(0)
+        response = client.post(url, {'file': upload})
+        self.assertRedirects(response, 
+            reverse('admin:content_lesson_changelist'))
+        self.assertImported()
+
+################
+# Item analysis
+################
+
+def correlation(x, y):
+    mean_x, mean_y = sum(x) / len(x), sum(y) / len(y)
+    covariance = sum((a - mean_x) * (b - mean_y) for a, b in zip(x, y))
+    return covariance / math.sqrt(sum((a - mean_x) ** 2 for a in x) * 
+        sum((b - mean_y) ** 2 for b in y))
+
+class ItemAnalysisMixin(object):
+    # Correct answers of four users to three questions; None is unanswered
+    responses = (
+        (True, True, True),
+        (True, True, False),
+        (True, False, False),
+        (False, False, None),
+    )
+
+    def setUp(self):
+        lesson = Lesson.objects.create(title='Lesson title', 
+            body='Lesson body')
+        self.quiz = Quiz.objects.create(lesson=lesson, title='Quiz title')
+        self.questions = [
+            Question.objects.create(quiz=self.quiz, correct_answer=True,
+                body='Question {0}'.format(i))
+            for i in range(3)
+        ]
+        for i, row in enumerate(self.responses):
+            user = User.objects.create(username='user{0}'.format(i))
+            for question, choice in zip(self.questions, row):
+                if choice is not None:
+                    Answer.objects.create(user=user, question=question,
+                        choice=choice)
+
+@skipUnless(analysis.is_available(), 'NumPy is not installed')
+class ItemAnalysisTestCase(ItemAnalysisMixin, TestCase):
+    def test_matrix(self):
+        matrix = analysis.load_matrix(self.quiz.id, chunk_size=2)
+        self.assertEqual(matrix.correct.shape, (4, 3))
+        self.assertEqual(matrix.correct.sum(), 6)
+        self.assertEqual(matrix.answered.sum(), 11)
+
+    def test_statistics(self):
+        result = analysis.analyze_quiz(self.quiz.id)
+        self.assertEqual(result['respondents'], 4)
+        self.assertEqual(result['questions'], 3)
+        self.assertAlmostEqual(result['mean_score'], 1.5)
+        # 3 / 2 * (1 - (1/4 + 1/3 + 1/4) / (5/3))
+        self.assertAlmostEqual(result['alpha'], 0.75)
+
+        scores = [sum(bool(choice) for choice in row) 
+            for row in self.responses]
+        for i, item in enumerate(result['items']):
+            correct = [int(bool(row[i])) for row in self.responses]
+            rest = [score - c for score, c in zip(scores, correct)]
+            self.assertEqual(item['question_id'], self.questions[i].id)
+            self.assertAlmostEqual(item['difficulty'], sum(correct) / 4)
+            self.assertAlmostEqual(item['discrimination'], 
+                correlation(correct, rest))
+            self.assertEqual(item['upper_difficulty'], 1)
+            self.assertEqual(item['lower_difficulty'], 0)
+
+        last = result['items'][2]
+        self.assertEqual(last['attempts'], 3)
+        self.assertAlmostEqual(last['distractor_rate'], 2 / 3)
+        self.assertAlmostEqual(last['distractor_discrimination'], 
+            correlation([0, 1, 1, 0], [2, 2, 1, 0]))
+
+    def test_constant_item(self):
+        Question.objects.create(quiz=self.quiz, body='Unanswered')
+        item = analysis.analyze_quiz(self.quiz.id)['items'][3]
+        self.assertEqual(item['attempts'], 0)
+        self.assertEqual(item['difficulty'], 0)
+        self.assertIsNone(item['discrimination'])
+        self.assertIsNone(item['distractor_rate'])
+
+    def test_empty_quiz(self):
+        quiz = Quiz.objects.create(lesson=self.quiz.lesson, title='Empty')
+        result = analysis.analyze_quiz(quiz.id)
+        self.assertEqual(result['respondents'], 0)
+        self.assertIsNone(result['alpha'])
+        self.assertIsNone(result['mean_score'])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('analyze_items', stdout=out)
+        self.assertIn('Quiz {0}: 4 respondents, 3 questions, alpha 0.75.'
+            .format(self.quiz.id), out.getvalue())
+        report = QuizAnalysis.objects.get(quiz=self.quiz)
+        self.assertEqual(report.items.count(), 3)
+        self.assertAlmostEqual(report.items.get(
+            question=self.questions[0]).difficulty, 0.75)
+
+    def test_command_missing_quiz(self):
+        with self.assertRaises(CommandError):
+            call_command('analyze_items', str(self.quiz.id + 1))
+
+    @mock.patch.object(analysis, 'numpy', None)
+    def test_command_without_numpy(self):
+        with self.assertRaises(CommandError):
+            call_command('analyze_items')
+
+@skipUnless(analysis.is_available(), 'NumPy is not installed')
+class ParallelItemAnalysisTestCase(ItemAnalysisMixin, TransactionTestCase):
+    def test_processes(self):
+        other = Quiz.objects.create(lesson=self.quiz.lesson, title='Other')
+        quiz_ids = [self.quiz.id, other.id]
+        self.assertEqual(list(analysis.analyze(quiz_ids, processes=2)), 
+            list(analysis.analyze(quiz_ids)))
+
+##############
+# Query plans
+##############
+
+@skipUnless(connection.vendor == 'sqlite', 'Needs EXPLAIN QUERY PLAN')
+class QueryPlanTestCase(QueryPlanMixin, TestCase):
+    # Tables that grow with the number of users
+    tables = ('content_answer', 'content_question', 'content_quizresult')
+
+    def setUp(self):
+        seed(lessons=2, quizzes_per_lesson=2, questions_per_quiz=10, 
+            users=20)
+        with connection.cursor() as cursor:
+            # Plans as chosen with real statistics
+            cursor.execute('ANALYZE')
+
+        self.user = User.objects.filter(answer__isnull=False).first()
+        self.quiz = Quiz.objects.filter(
+            question__answer__user=self.user).first()
+        self.question = self.quiz.question_set.first()
+
+    def test_views(self):
+        client = Client()
+        client.force_login(self.user)
+        urls = [
+            reverse('lesson_detail', args=(self.quiz.lesson_id,)),
+            reverse('quiz_detail', args=(self.quiz.id,)),
+            reverse('quiz_submit', args=(self.quiz.id,)),
+            reverse('quiz_answer_list', args=(self.quiz.id,)),
+            reverse('question_detail', args=(self.question.id,)),
+        ]
+        for url in urls:
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(client.get(url).status_code, 200)
+            for query in queries.captured_queries:
+                if query['sql'].startswith('SELECT'):
+                    self.assertNoFullScan(query['sql'], self.tables)
+
+    def test_scores(self):
+        answers = Answer.objects.filter(user=self.user, 
+            question__quiz=self.quiz)
+        self.assertNoFullScan(answers, self.tables)
+        plan = self.getQueryPlan(*answers.values_list('is_correct', 
+            'created_at').query.sql_with_params())
+        self.assertIn('content_answer USING COVERING INDEX', ' '.join(plan))
+
+    def test_regrade(self):
+        answers = Answer.objects.filter(question=self.question, choice=True, 
+            is_correct=False)
+        self.assertNoFullScan(answers, self.tables)
+        plan = self.getQueryPlan(*answers.values_list('id')
+            .query.sql_with_params())
+        self.assertIn('USING COVERING INDEX', ' '.join(plan))
+
+        results = QuizResult.objects.filter(quiz=self.quiz, 
+            user__in=answers.values('user'))
+        self.assertNoFullScan(results, self.tables)
+
+    def test_question_index(self):
+        # Lookups by question use the prefix of the composite index, which
+        # makes an index of the foreign key alone redundant
+        self.assertNoFullScan(Answer.objects.filter(question=self.question), 
+            self.tables)
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, 
+                Answer._meta.db_table)
+        self.assertNotIn(['question_id'], [constraint['columns'] 
+            for constraint in constraints.values() if constraint['index']])
+
+    def test_questions(self):
+        questions = Question.objects.filter(quiz=self.quiz).order_by(
+            'position', 'id')
+        self.assertNoFullScan(questions, self.tables)
+        plan = self.getQueryPlan(*questions.query.sql_with_params())
+        self.assertNotIn('USE TEMP B-TREE FOR ORDER BY', plan)
+
+        self.assertNoFullScan(self.quiz.get_unanswered_questions(self.user), 
+            self.tables)
+
 ###############################################################################
 # Views
 ###############################################################################
@@ -390,6 +1750,81 @@ class LessonListViewTestCase(TestCase):
         self.assertTrue(self.lesson1 in object_list)
         self.assertTrue(self.lesson2 in object_list)
 
+class LessonCatalogTestCase(QueryCountMixin, TestCase):
+    def setUp(self):
+        self.url = reverse('lesson_list')
+        self.client = Client()
+
+        self.music = Tag.objects.create(name='music')
+        self.sports = Tag.objects.create(name='sports')
+        self.lessons = []
+        for i in range(5):
+            lesson = Lesson.objects.create(title='Lesson {0}'.format(i), 
+                body='x' * 500)
+            lesson.tags.add(self.music if i % 2 == 0 else self.sports)
+            self.lessons.append(lesson)
+
+        self.username = 'testuser'
+        self.password = '0xdeadbeef'
+        self.user = User.objects.create_user(username=self.username, 
+            password=self.password)
+        self.client.login(username=self.username, password=self.password)
+
+    def add_lesson(self):
+        count = Lesson.objects.count()
+        lesson = Lesson.objects.create(title='Lesson {0}'.format(count), 
+            body='Lesson body')
+        lesson.tags.create(name='tag-{0}'.format(count))
+        lesson.tags.add(self.music)
+
+    def test_constant_queries(self):
+        self.assertQueriesConstant(self.url, self.add_lesson)
+
+    @mock.patch.object(LessonListView, 'page_size', 2)
+    def test_pagination(self):
+        response = self.client.get(self.url)
+        self.assertEqual(list(response.context['object_list']), 
+            self.lessons[:2])
+
+        response = self.client.get(self.url + response.context['next_url'])
+        self.assertEqual(list(response.context['object_list']), 
+            self.lessons[2:4])
+
+        response = self.client.get(self.url + response.context['next_url'])
+        self.assertEqual(list(response.context['object_list']), 
+            self.lessons[4:])
+        self.assertNotIn('next_url', response.context)
+
+    @mock.patch.object(LessonListView, 'page_size', 1)
+    def test_tag_pagination(self):
+        response = self.client.get(self.url, {'tag': 'sports'})
+        response = self.client.get(self.url + response.context['next_url'])
+        self.assertEqual(list(response.context['object_list']), 
+            [self.lessons[3]])
+
+    def test_invalid_page(self):
+        response = self.client.get(self.url, {'after': 'x'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_tag_filter(self):
+        response = self.client.get(self.url, {'tag': 'sports'})
+        self.assertEqual(list(response.context['object_list']), 
+            [self.lessons[1], self.lessons[3]])
+
+    def test_facets(self):
+        Tag.objects.create(name='unused')
+        response = self.client.get(self.url)
+        facets = {
+            tag.name: tag.lesson_count for tag in response.context['tags']
+        }
+        self.assertEqual(facets, {'music': 3, 'sports': 2})
+
+    def test_excerpt(self):
+        response = self.client.get(self.url)
+        lesson = response.context['object_list'][0]
+        self.assertEqual(len(lesson.excerpt), 151)
+        self.assertContains(response, 'x' * 147 + '...')
+
 class LessonDetailViewTestCase(TestCase):
     def setUp(self):
         self.lesson = Lesson.objects.create(title='Music', 
@@ -415,6 +1850,89 @@ class LessonDetailViewTestCase(TestCase):
 
         self.assertTrue(self.lesson == obj)
 
+class ConditionalGetTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+        self.lesson = Lesson.objects.create(title='Lesson title', 
+            body='Lesson body')
+        self.quiz = Quiz.objects.create(lesson=self.lesson, title='Quiz title')
+        self.question = Question.objects.create(quiz=self.quiz, 
+            body='Question body')
+
+        self.username = 'testuser'
+        self.password = '0xdeadbeef'
+        self.user = User.objects.create_user(username=self.username, 
+            password=self.password)
+        self.client.login(username=self.username, password=self.password)
+
+    def get_again(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_not_modified(self):
+        for url in (reverse('lesson_list'), self.lesson.get_absolute_url(), 
+                self.quiz.get_absolute_url()):
+            response = self.get_again(url)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b'')
+
+    def test_last_modified(self):
+        url = self.lesson.get_absolute_url()
+        response = self.client.get(url)
+        response = self.client.get(url, 
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_one_query(self):
+        # The session and the user come from the cache, so only the
+        # validators are queried
+        self.client.get(self.quiz.get_absolute_url())
+        response = self.client.get(self.quiz.get_absolute_url())
+        with self.assertNumQueries(1):
+            self.client.get(self.quiz.get_absolute_url(), 
+                HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_modified(self):
+        url = self.lesson.get_absolute_url()
+        response = self.client.get(url)
+        Quiz.objects.create(lesson=self.lesson, title='Another quiz')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+        url = reverse('lesson_list')
+        response = self.client.get(url)
+        self.lesson.tags.create(name='music')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertContains(response, 'music')
+
+    def test_personalized(self):
+        url = self.quiz.get_absolute_url()
+        response = self.client.get(url)
+        Answer.objects.create(user=self.user, question=self.question)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['done'])
+
+        # Another user's answers do not matter
+        user = User.objects.create(username='otheruser')
+        Answer.objects.create(user=user, question=self.question)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        # Nor is their copy of the page valid for this user
+        etag = response['ETag']
+        self.client.force_login(user)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_found(self):
+        response = self.client.get(reverse('quiz_detail', 
+            args=(self.quiz.id + 1,)))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+
 #######
 # Quiz
 #######
@@ -444,6 +1962,27 @@ class QuizDetailViewTestCase(TestCase):
         obj = response.context['object']
 
         self.assertTrue(self.quiz == obj)
+        self.assertTrue(response.context['done'])
+
+    def test_next_question(self):
+        question = Question.objects.create(quiz=self.quiz, 
+            body='Question body')
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['next_question'].id, question.id)
+        self.assertFalse(response.context['done'])
+        self.assertContains(response, question.get_absolute_url())
+
+        # From the quiz bundle, skipping answered questions
+        next_question = Question.objects.create(quiz=self.quiz, 
+            body='Next question')
+        Answer.objects.create(user=self.user, question=question)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['next_question'].id, 
+            next_question.id)
+        self.assertEqual(len([query for query in queries 
+            if 'FROM "content_answer"' in query['sql']]), 1)
 
 class QuizAnswerListViewTestCase(TestCase):
     def setUp(self):
@@ -486,6 +2025,109 @@ class QuizAnswerListViewTestCase(TestCase):
         self.assertTrue(self.answer1 in object_list)
         self.assertTrue(self.answer2 not in object_list)
 
+class QuizSubmitViewTestCase(TestCase):
+    def setUp(self):
+        self.lesson = Lesson.objects.create(title='Music', 
+            body='You must practice.')
+        self.quiz = Quiz.objects.create(lesson=self.lesson, title='Quiz title')
+        self.question1 = Question.objects.create(quiz=self.quiz, 
+            body='Question 1', correct_answer=True)
+        self.question2 = Question.objects.create(quiz=self.quiz, 
+            body='Question 2', correct_answer=False)
+
+        self.url = reverse('quiz_submit', args=(self.quiz.id,))
+        self.client = Client()
+
+        self.username = 'testuser'
+        self.password = '0xdeadbeef'
+        self.user = User.objects.create_user(username=self.username, 
+            password=self.password)
+
+    def get_data(self, choices):
+        data = {
+            'form-TOTAL_FORMS': len(choices),
+            'form-INITIAL_FORMS': len(choices),
+        }
+        for i, (question, choice) in enumerate(choices):
+            data['form-{0}-question'.format(i)] = question.id
+            if choice:
+                data['form-{0}-choice'.format(i)] = 'on'
+        return data
+
+    def test_anonymous_user(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_authenticated_user(self):
+        Answer.objects.create(user=self.user, question=self.question1)
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        # Only unanswered questions are offered
+        formset = response.context['formset']
+        self.assertEqual(formset.questions, [self.question2])
+
+    def test_submit(self):
+        self.client.login(username=self.username, password=self.password)
+        data = self.get_data([(self.question1, True), (self.question2, True)])
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 302)
+        url = reverse('quiz_answer_list', args=(self.quiz.id,))
+        self.assertTrue(response['Location'].endswith(url))
+
+        answers = Answer.objects.filter(user=self.user)
+        self.assertEqual(answers.count(), 2)
+        self.assertTrue(answers.get(question=self.question1).is_correct)
+        self.assertFalse(answers.get(question=self.question2).is_correct)
+
+        result = QuizResult.objects.get(user=self.user, quiz=self.quiz)
+        self.assertEqual(result.answered, 2)
+        self.assertEqual(result.correct, 1)
+        self.assertIsNotNone(result.completed_at)
+
+    def test_submit_answered_question(self):
+        Answer.objects.create(user=self.user, question=self.question1)
+        self.client.login(username=self.username, password=self.password)
+        data = self.get_data([(self.question1, True), (self.question2, True)])
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['formset'].non_form_errors())
+        self.assertEqual(Answer.objects.filter(user=self.user).count(), 1)
+
+    def test_submit_duplicate_question(self):
+        self.client.login(username=self.username, password=self.password)
+        data = self.get_data([(self.question1, True), (self.question1, True)])
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Answer.objects.exists())
+
+    def test_constant_queries(self):
+        self.client.login(username=self.username, password=self.password)
+        questions = [self.question1, self.question2]
+        data = self.get_data([(question, True) for question in questions])
+        # Both posts find the quiz in the content cache and the user in
+        # the user cache
+        cache.get(Quiz, self.quiz.id)
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self.url, data)
+
+        Answer.objects.all().delete()
+        QuizResult.objects.all().delete()
+        QuestionStats.objects.all().delete()
+        questions += [
+            Question.objects.create(quiz=self.quiz, 
+                body='Question {0}'.format(i)) 
+            for i in range(3, 20)
+        ]
+        data = self.get_data([(question, True) for question in questions])
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(self.url, data)
+
+        self.assertEqual(Answer.objects.count(), len(questions))
+        self.assertEqual(len(small), len(large))
+
 ###########
 # Question
 ###########
@@ -518,6 +2160,140 @@ class QuestionDetailViewTestCase(TestCase):
 
         self.assertTrue(self.question == obj)
 
+    def test_stats(self):
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'of learners got this right')
+
+        Answer.objects.create(user=self.user, question=self.question)
+        response = self.client.get(self.url)
+        self.assertContains(response, '100% of learners got this right')
+
+class QuestionFragmentTestCase(TestCase):
+    def setUp(self):
+        fragments.clear()
+        fragments.reset_stats()
+        self.lesson = Lesson.objects.create(title='Music', 
+            body='You must practice.')
+        self.quiz = Quiz.objects.create(lesson=self.lesson, title='Quiz title')
+        self.question = Question.objects.create(quiz=self.quiz, 
+            body='Question body', correct_answer=True)
+        self.other_question = Question.objects.create(quiz=self.quiz, 
+            body='Other question', correct_answer=True)
+
+        self.url = reverse('question_detail', args=(self.question.id,))
+        self.client = Client()
+
+        self.username = 'testuser'
+        self.password = '0xdeadbeef'
+        self.user = User.objects.create_user(username=self.username, 
+            password=self.password)
+        self.client.login(username=self.username, password=self.password)
+
+    def get_fragment(self, question=None):
+        return fragments.get('answer', self.user.id, 
+            (question or self.question).id)
+
+    def test_cached(self):
+        Answer.objects.create(user=self.user, question=self.question, 
+            choice=True)
+        response = self.client.get(self.url)
+        self.assertIsNone(response.context['answer_fragment'])
+        self.assertIn('Correct', self.get_fragment())
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Correct')
+        self.assertIsNotNone(response.context['answer_fragment'])
+        self.assertFalse([query for query in queries 
+            if 'content_answer' in query['sql']])
+
+    def test_unanswered_not_cached(self):
+        response = self.client.get(self.url)
+        self.assertIn('form', response.context)
+        self.assertIsNone(self.get_fragment())
+
+    def test_answer_invalidates(self):
+        answer = Answer.objects.create(user=self.user, 
+            question=self.question, choice=True)
+        Answer.objects.create(user=self.user, question=self.other_question, 
+            choice=True)
+        self.client.get(self.url)
+        self.client.get(reverse('question_detail', 
+            args=(self.other_question.id,)))
+
+        answer.choice = False
+        answer.save()
+        self.assertIsNone(self.get_fragment())
+        self.assertIsNotNone(self.get_fragment(self.other_question))
+        self.assertContains(self.client.get(self.url), 'Wrong')
+
+        # Another user's answer leaves it alone
+        self.client.get(self.url)
+        user = User.objects.create(username='otheruser')
+        Answer.objects.create(user=user, question=self.question)
+        self.assertIsNotNone(self.get_fragment())
+
+        answer.delete()
+        self.assertIsNone(self.get_fragment())
+        self.assertIn('form', self.client.get(self.url).context)
+
+    def test_regrade_invalidates(self):
+        Answer.objects.create(user=self.user, question=self.question, 
+            choice=True)
+        Answer.objects.create(user=self.user, question=self.other_question, 
+            choice=True)
+        self.client.get(self.url)
+        self.client.get(reverse('question_detail', 
+            args=(self.other_question.id,)))
+
+        self.question.correct_answer = False
+        self.question.save()
+        regrade_question(self.question)
+        self.assertIsNone(self.get_fragment())
+        self.assertIsNotNone(self.get_fragment(self.other_question))
+        self.assertContains(self.client.get(self.url), 'Wrong')
+
+    def test_batch_invalidates(self):
+        fragments.store('answer', self.user.id, self.question.id, 'Stale')
+        Answer.objects.create_batch(self.user, [self.question], 
+            {self.question.id: True})
+        self.assertIsNone(self.get_fragment())
+
+    def test_metrics(self):
+        # Unanswered questions are not counted as misses
+        self.client.get(reverse('question_detail', 
+            args=(self.other_question.id,)))
+        self.assertEqual(fragments.get_stats()['misses'], 0)
+
+        Answer.objects.create(user=self.user, question=self.question)
+        with mock.patch.object(fragments, 'get', 
+                wraps=fragments.get) as get:
+            self.client.get(self.url)
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(fragments.get_stats()['misses'], 1)
+        self.client.get(self.url)
+
+        url = reverse('cache_metrics')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.user.is_staff = True
+        self.user.save()
+        metrics = self.client.get(url).json()
+        self.assertEqual(metrics['fragments']['hits'], 1)
+        self.assertEqual(metrics['fragments']['sets'], 1)
+        self.assertIn('question', metrics['content'])
+
+    def test_bounded(self):
+        with override_settings(CACHES={'fragments': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                'LOCATION': 'bounded', 
+                'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2}}, 
+                'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            for i in range(100):
+                fragments.store('answer', i, self.question.id, 'Fragment')
+            self.assertLessEqual(len(fragments.get_cache()._cache), 10)
+
 #########
 # Answer
 #########
@@ -550,3 +2326,425 @@ class AnswerCreateViewTestCase(TestCase):
         self.assertEqual(response.status_code, 302)
         url = reverse('lesson_list')
         self.assertEqual(response['Location'], url)
+
+    def test_next_question_redirect(self):
+        next_question = Question.objects.create(quiz=self.quiz, 
+            body='Next question')
+        self.client.login(username=self.username, password=self.password)
+        data = {'choice': False}
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].endswith(
+            next_question.get_absolute_url()))
+
+    def test_duplicate_post(self):
+        next_question = Question.objects.create(quiz=self.quiz, 
+            body='Next question')
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.get(self.question.get_absolute_url())
+        token = response.context['form']['token'].value()
+        self.assertTrue(token)
+
+        data = {'choice': True, 'token': token}
+        first = self.client.post(self.url, data)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.post(self.url, data)
+        self.assertFalse([query for query in queries.captured_queries
+            if Answer._meta.db_table in query['sql']])
+        self.assertEqual(second['Location'], first['Location'])
+        self.assertTrue(first['Location'].endswith(
+            next_question.get_absolute_url()))
+
+        # Without a token the insert is ignored
+        response = self.client.post(self.url, {'choice': False})
+        self.assertEqual(response.status_code, 302)
+        answer = Answer.objects.get(user=self.user)
+        self.assertTrue(answer.choice)
+        self.assertEqual(self.quiz.get_result(self.user).answered, 1)
+
+    def test_missing_question(self):
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.post(reverse('answer_create', args=(0,)), 
+            {'choice': False})
+        self.assertEqual(response.status_code, 404)
+
+class AnswerCreateRaceTestCase(TransactionTestCase):
+    threads = 8
+
+    def setUp(self):
+        lesson = Lesson.objects.create(title='Music', 
+            body='You must practice.')
+        self.quiz = Quiz.objects.create(lesson=lesson, title='Quiz title')
+        self.question = Question.objects.create(quiz=self.quiz, 
+            body='Question body', correct_answer=True)
+        self.next_question = Question.objects.create(quiz=self.quiz, 
+            body='Next question')
+        self.url = reverse('answer_create', args=(self.question.id,))
+        self.user = User.objects.create_user(username='testuser', 
+            password='0xdeadbeef')
+
+    def post_concurrently(self, data):
+        """POSTs data from several threads at once; returns the responses."""
+        barrier = Barrier(self.threads, timeout=10)
+        responses = []
+
+        def post(client):
+            try:
+                barrier.wait()
+                responses.append(client.post(self.url, data))
+            finally:
+                # Every thread has its own connection
+                connection.close()
+
+        clients = []
+        for i in range(self.threads):
+            client = Client()
+            client.force_login(self.user)
+            clients.append(client)
+        threads = [Thread(target=post, args=(client,)) for client in clients]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return responses
+
+    def assertAnsweredOnce(self, responses):
+        self.assertEqual(len(responses), self.threads)
+        self.assertEqual({response.status_code for response in responses}, 
+            {302})
+        self.assertEqual({response['Location'] for response in responses}, 
+            {self.next_question.get_absolute_url()})
+        self.assertEqual(Answer.objects.filter(user=self.user).count(), 1)
+        result = self.quiz.get_result(self.user)
+        self.assertEqual((result.answered, result.correct), (1, 1))
+
+    def test_same_token(self):
+        self.assertAnsweredOnce(self.post_concurrently({'choice': True, 
+            'token': uuid4().hex}))
+
+    def test_without_token(self):
+        self.assertAnsweredOnce(self.post_concurrently({'choice': True}))
+
+#########
+# Search
+#########
+
+class SearchViewTestCase(TestCase):
+    def setUp(self):
+        self.url = reverse('search')
+        self.client = Client()
+
+        self.lesson = Lesson.objects.create(title='Music', 
+            body='You must practice.')
+
+        self.username = 'testuser'
+        self.password = '0xdeadbeef'
+        self.user = User.objects.create_user(username=self.username, 
+            password=self.password)
+
+    def test_anonymous_user(self):
+        response = self.client.get(self.url, {'q': 'practice'})
+        self.assertEqual(response.status_code, 302)
+
+    def test_search(self):
+        self.client.login(username=self.username, password=self.password)
+        response = self.client.get(self.url, {'q': 'practice'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result.object_id for result in 
+            response.context['object_list']], [self.lesson.id])
+        self.assertContains(response, '<mark>practice</mark>')
+
+        response = self.client.get(self.url, {'q': 'practice', 
+            'kind': 'question'})
+        self.assertEqual(list(response.context['object_list']), [])
+
+###############################################################################
+# Template tags
+###############################################################################
+
+class GetUserAnswerTagTestCase(TestCase):
+    template = Template(
+        '{% load content_tags %}'
+        '{% prime_user_answers questions request.user %}'
+        '{% for question in questions %}'
+        '{% get_user_answer question request.user %}'
+        '{% endfor %}'
+    )
+
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+        lesson = Lesson.objects.create(title='Music', 
+            body='You must practice.')
+        quiz = Quiz.objects.create(lesson=lesson, title='Quiz title')
+        self.questions = [
+            Question.objects.create(quiz=quiz, body='Question {0}'.format(i)) 
+            for i in range(10)
+        ]
+        for question in self.questions[:5]:
+            Answer.objects.create(user=self.user, question=question)
+
+        self.request = RequestFactory().get('/')
+        self.request.user = self.user
+
+    def test_single_query(self):
+        context = Context({
+            'questions': self.questions, 
+            'request': self.request,
+        })
+        with self.assertNumQueries(1):
+            output = self.template.render(context)
+        self.assertEqual(output.count('Your Answer'), 5)
+
+    def test_without_prime(self):
+        template = Template(
+            '{% load content_tags %}'
+            '{% get_user_answer question request.user %}'
+            '{% get_user_answer question request.user %}'
+        )
+        context = Context({
+            'question': self.questions[0], 
+            'request': self.request,
+        })
+        with self.assertNumQueries(1):
+            output = template.render(context)
+        self.assertEqual(output.count('Your Answer'), 2)
+
+    def test_other_user(self):
+        other_user = User.objects.create(username='altuser')
+        template = Template(
+            '{% load content_tags %}'
+            '{% get_user_answer question user %}'
+        )
+        context = Context({
+            'question': self.questions[0], 
+            'request': self.request,
+            'user': other_user,
+        })
+        self.assertNotIn('Your Answer', template.render(context))
+
+###############################################################################
+# Admin
+###############################################################################
+
+class AnswerAdminTestCase(QueryCountMixin, TestCase):
+    def setUp(self):
+        self.url = reverse('admin:content_answer_changelist')
+        self.client = Client()
+        User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client.login(username='admin', password='admin')
+
+        lesson = Lesson.objects.create(title='Music', 
+            body='You must practice.')
+        self.quiz = Quiz.objects.create(lesson=lesson, title='Quiz title')
+        self.users = []
+
+    def add_answers(self, quiz=None):
+        user = User.objects.create(
+            username='user{0}'.format(len(self.users)))
+        self.users.append(user)
+        for i in range(3):
+            question = Question.objects.create(quiz=quiz or self.quiz, 
+                body='Question {0}-{1}'.format(len(self.users), i))
+            Answer.objects.create(user=user, question=question)
+
+    def test_constant_queries(self):
+        self.add_answers()
+        self.assertQueriesConstant(self.url, self.add_answers)
+
+    def test_no_user_choices(self):
+        self.add_answers()
+        response = self.client.get(self.url)
+        self.assertNotContains(response, '?user__id__exact=')
+        self.assertContains(response, 'name="user"')
+
+    def test_filters(self):
+        self.add_answers()
+        self.add_answers()
+        other_quiz = Quiz.objects.create(lesson=self.quiz.lesson, 
+            title='Other quiz')
+        self.add_answers(other_quiz)
+
+        response = self.client.get(self.url, {'user': 'user1'})
+        self.assertEqual(response.context['cl'].result_count, 3)
+        response = self.client.get(self.url, {'quiz': other_quiz.id})
+        self.assertEqual(response.context['cl'].result_count, 3)
+        response = self.client.get(self.url, {'quiz': 'title'})
+        self.assertEqual(response.context['cl'].result_count, 0)
+
+        # The other box keeps the active filter
+        response = self.client.get(self.url, {'user': 'user1', 
+            'is_correct__exact': 1})
+        self.assertContains(response, 
+            '<input type="hidden" name="is_correct__exact" value="1">')
+
+    def test_capped_count(self):
+        self.add_answers()
+        self.add_answers()
+        with mock.patch('django_quiz.content.admin.CappedCountPaginator.'
+                'max_count', 4):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['cl'].result_count, 4)
+        self.assertIsNone(response.context['cl'].full_result_count)
+        # Shown as approximate
+        self.assertContains(response, '4+ answers')
+
+        # Exactly at the cap
+        with mock.patch('django_quiz.content.admin.CappedCountPaginator.'
+                'max_count', 6):
+            response = self.client.get(self.url)
+        self.assertContains(response, '6 answers')
+        self.assertNotContains(response, '6+')
+
+    def test_date_hierarchy(self):
+        self.add_answers()
+        response = self.client.get(self.url, {
+            'created_at__year': timezone.now().year})
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+class QuestionAdminTestCase(QueryCountMixin, TestCase):
+    def setUp(self):
+        self.url = reverse('admin:content_question_changelist')
+        self.client = Client()
+        User.objects.create_superuser('admin', 'admin@example.com', 'admin')
+        self.client.login(username='admin', password='admin')
+
+        lesson = Lesson.objects.create(title='Music', 
+            body='You must practice.')
+        self.quiz = Quiz.objects.create(lesson=lesson, title='Quiz title')
+        self.users = [User.objects.create(username='user{0}'.format(i))
+            for i in range(2)]
+
+    def add_question(self, correct=0):
+        question = Question.objects.create(quiz=self.quiz, correct_answer=True,
+            body='Question {0}'.format(self.quiz.question_set.count()))
+        for i, user in enumerate(self.users):
+            Answer.objects.create(user=user, question=question, 
+                choice=i < correct)
+        return question
+
+    def test_constant_queries(self):
+        self.add_question()
+        self.assertQueriesConstant(self.url, self.add_question)
+
+    def test_by_difficulty(self):
+        easy = self.add_question(correct=2)
+        hard = self.add_question(correct=0)
+        medium = self.add_question(correct=1)
+        # Sorted by the correct column
+        response = self.client.get(self.url, {'o': '6'})
+        self.assertEqual(list(response.context['cl'].result_list), 
+            [hard, medium, easy])
+        self.assertContains(response, '50%')
+
+###############################################################################
+# Tooling
+###############################################################################
+
+class SeedTestCase(TestCase):
+    def test_seed(self):
+        counts = seed(lessons=2, tags=3, quizzes_per_lesson=2, 
+            questions_per_quiz=5, users=4, answer_rate=0.5)
+        self.assertEqual(counts, {
+            'tags': 3, 'lessons': 2, 'quizzes': 4, 'questions': 20, 
+            'users': 4, 'answers': 40,
+        })
+        self.assertEqual(Answer.objects.count(), 40)
+        self.assertEqual(QuizResult.objects.aggregate(
+            answered=Sum('answered'))['answered'], 40)
+
+        # Answers are graded like Answer.save() would
+        for answer in Answer.objects.select_related('question')[:10]:
+            self.assertEqual(answer.is_correct, 
+                answer.question.grade(answer.choice))
+
+    def test_fixed_seed(self):
+        seed(prefix='a', lessons=1, users=2, seed=1)
+        seed(prefix='b', lessons=1, users=2, seed=1)
+        choices = [
+            list(Answer.objects.filter(user__username__startswith=prefix)
+                .order_by('id').values_list('choice', flat=True))
+            for prefix in ('a', 'b')
+        ]
+        self.assertEqual(choices[0], choices[1])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('seed_quiz_data', lessons=1, users=1, stdout=out)
+        self.assertIn('Created 1 lessons.', out.getvalue())
+
+class BenchmarkTestCase(TestCase):
+    def test_quiz_progress(self):
+        out = StringIO()
+        call_command('benchmark_quiz_progress', sizes=[10, 20], repeat=1, 
+            stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0].split(), ['history', 'answered', 
+            'unanswered', 'next'])
+        self.assertEqual([line.split()[0] for line in lines[1:]], 
+            ['10', '20'])
+
+class LoadTestTestCase(TransactionTestCase):
+    def test_run(self):
+        seed(lessons=1, tags=1, quizzes_per_lesson=1, questions_per_quiz=3, 
+            users=1, answer_rate=0)
+        stats = LoadTest(users=1).run()
+
+        self.assertEqual(len(stats['question_detail'].timings), 3)
+        self.assertEqual(len(stats['answer_create'].timings), 3)
+        for url_name, view_stats in stats.items():
+            self.assertEqual(view_stats.errors, 0, url_name)
+            self.assertGreater(view_stats.mean_queries, 0)
+        self.assertEqual(Answer.objects.count(), 3)
+
+@skipUnless(connection.vendor == 'sqlite', 'Copies an SQLite database')
+class ReplicateTestCase(TransactionTestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.target = join(self.directory, 'replica.sqlite3')
+
+    def tearDown(self):
+        rmtree(self.directory)
+
+    def test_replicate(self):
+        Lesson.objects.create(title='Music', body='You must practice.')
+        generation = cache.get_generation(Lesson)
+
+        out = StringIO()
+        call_command('replicate_sqlite', 
+            source=connection.settings_dict['NAME'], target=self.target, 
+            stdout=out)
+        self.assertIn('Copied', out.getvalue())
+
+        replica = sqlite3.connect(self.target)
+        try:
+            titles = replica.execute(
+                'SELECT title FROM content_lesson').fetchall()
+        finally:
+            replica.close()
+        self.assertEqual(titles, [('Music',)])
+        # Entries cached from the old replica are dropped
+        self.assertGreater(cache.get_generation(Lesson), generation)
+
+    def test_quiz_generations(self):
+        lesson = Lesson.objects.create(title='Music', 
+            body='You must practice.')
+        quizzes = [Quiz.objects.create(lesson=lesson, 
+            title='Quiz {0}'.format(i)) for i in range(2)]
+        for quiz in quizzes:
+            Question.objects.create(quiz=quiz, body='Question body')
+        command = ReplicateCommand()
+        source = connection.settings_dict['NAME']
+        command.replicate(source, self.target)
+        signatures = command.invalidate(self.target, {})
+
+        generations = [cache.get_quiz_generation(quiz.id) 
+            for quiz in quizzes]
+        # Without signals, as if written by another process
+        Question.objects.filter(quiz=quizzes[0]).update(body='Changed', 
+            updated_at=timezone.now())
+        command.replicate(source, self.target)
+        command.invalidate(self.target, signatures)
+        self.assertGreater(cache.get_quiz_generation(quizzes[0].id), 
+            generations[0])
+        self.assertEqual(cache.get_quiz_generation(quizzes[1].id), 
+            generations[1])
@@ -2,8 +2,10 @@
 from django.conf.urls import url
 
 # Local
-from .views import AnswerCreateView, LessonDetailView, LessonListView 
+from .views import AnswerCreateView, CacheMetricsView, ExportView
+from .views import LessonDetailView, LessonListView
 from .views import QuestionDetailView, QuizAnswerListView, QuizDetailView
+from .views import QuizSubmitView, SearchView
 
 urlpatterns = [
     url(r'^lesson/$', LessonListView.as_view(), name='lesson_list'), 
@@ -12,8 +14,14 @@ urlpatterns = [
     url(r'^quiz/(?P<pk>\d+)/$', QuizDetailView.as_view(), name='quiz_detail'), 
     url(r'^quiz/(?P<pk>\d+)/answer/$', QuizAnswerListView.as_view(), 
         name='quiz_answer_list'), 
+    url(r'^quiz/(?P<pk>\d+)/submit/$', QuizSubmitView.as_view(), 
+        name='quiz_submit'), 
     url(r'^question/(?P<pk>\d+)/$', QuestionDetailView.as_view(), 
         name='question_detail'), 
     url(r'^question/(?P<pk>\d+)/answer/create/$', AnswerCreateView.as_view(), 
-        name='answer_create')
+        name='answer_create'), 
+    url(r'^search/$', SearchView.as_view(), name='search'), 
+    url(r'^metrics/cache/$', CacheMetricsView.as_view(), 
+        name='cache_metrics'), 
+    url(r'^export/$', ExportView.as_view(), name='export')
 ]
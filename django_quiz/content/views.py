@@ -1,77 +1,373 @@
+# Python
+from uuid import uuid4
+
 # Django
 from django.core.urlresolvers import reverse
-from django.views.generic import DetailView, CreateView, ListView
+from django.db import IntegrityError, connection
+from django.db.models import Count
+from django.db.models.functions import Substr
+from django.http import Http404, HttpResponseBadRequest
+from django.http import HttpResponseRedirect, JsonResponse
+from django.http import StreamingHttpResponse
+from django.utils.http import urlencode
+from django.views.generic import DetailView, CreateView, ListView, View
 
 # Local
-from .forms import AnswerForm
-from .models import Answer, Lesson, Question, Quiz
-from django_quiz.mixins import LoginRequiredMixin
+from . import cache, fragments, ingest
+from .bundles import get_bundle
+from .export import export
+from .forms import AnswerForm, ExportForm, QuizAnswerFormSet
+from .loaders import AnswerLoader, get_answer_loader
+from .models import Answer, Lesson, Question, QuestionStats, Quiz
+from .search import KINDS, search
+from django_quiz.common.models import Tag
+from django_quiz.mixins import ConditionalGetMixin, LoginRequiredMixin
+from django_quiz.mixins import StaffRequiredMixin
+
+def select_scalars(subqueries, params=()):
+    """Runs the scalar subqueries in a single query and returns a tuple."""
+    sql = 'SELECT ' + ', '.join('({0})'.format(subquery) 
+        for subquery in subqueries)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return tuple(cursor.fetchone())
 
-class LessonListView(LoginRequiredMixin, ListView):
+class LessonListView(LoginRequiredMixin, ConditionalGetMixin, ListView):
+    """
+    Lesson catalog with keyset pagination (?after=<last lesson id>), tag
+    filtering (?tag=<name>) and per-tag lesson counts. Runs the same three
+    queries however many lessons there are.
+    """
     model = Lesson
     template_name = 'content/lessons/list.html'
+    page_size = 20
+    excerpt_length = 150
+
+    def get_queryset(self):
+        # One character more than is shown so truncatechars can tell when
+        # to add an ellipsis
+        lessons = (Lesson.objects.defer('body')
+            .annotate(excerpt=Substr('body', 1, self.excerpt_length + 1))
+            .prefetch_related('tags')
+            .order_by('id'))
+
+        self.tag = self.request.GET.get('tag')
+        if self.tag:
+            lessons = lessons.filter(tags__name=self.tag)
+
+        after = self.request.GET.get('after')
+        if after:
+            try:
+                lessons = lessons.filter(id__gt=int(after))
+            except ValueError as e:
+                raise Http404('Invalid page.')
+
+        return lessons
+
+    def get_validators(self):
+        # Any page may change with any lesson or tag. Retagging a lesson
+        # touches its updated_at, see signals.py.
+        return select_scalars([
+            'SELECT MAX(updated_at) FROM {0}'.format(Lesson._meta.db_table),
+            'SELECT COUNT(*) FROM {0}'.format(Lesson._meta.db_table),
+            'SELECT MAX(updated_at) FROM {0}'.format(Tag._meta.db_table),
+            'SELECT COUNT(*) FROM {0}'.format(Tag._meta.db_table),
+        ])
+
+    def get_context_data(self, *args, **kwargs):
+        lessons = list(self.object_list[:self.page_size + 1])
+        has_next = len(lessons) > self.page_size
+        lessons = lessons[:self.page_size]
+
+        context = super().get_context_data(*args, object_list=lessons, 
+            **kwargs)
+        context['tag'] = self.tag
+        context['tags'] = (Tag.objects.annotate(lesson_count=Count('lesson'))
+            .filter(lesson_count__gt=0).order_by('name'))
+        context['excerpt_length'] = self.excerpt_length
+        if has_next:
+            query = {'after': lessons[-1].id}
+            if self.tag:
+                query['tag'] = self.tag
+            context['next_url'] = '?' + urlencode(query)
+        return context
 
-class LessonDetailView(LoginRequiredMixin, DetailView):
+class CachedObjectMixin(object):
+    """Looks the object up in the content cache instead of the database."""
+    def get_object(self, queryset=None):
+        try:
+            return cache.get(self.model, self.kwargs['pk'])
+        except self.model.DoesNotExist:
+            raise Http404('No {0} found matching the query.'.format(
+                self.model._meta.verbose_name))
+
+class SearchView(LoginRequiredMixin, ListView):
+    """
+    Ranked search over lessons and questions (?q=<terms>), optionally
+    limited to one kind (?kind=lesson|question) and to tags (?tag=<name>,
+    repeatable).
+    """
+    template_name = 'content/search.html'
+    limit = 50
+
+    def get_queryset(self):
+        self.query = self.request.GET.get('q', '').strip()
+        self.kind = self.request.GET.get('kind')
+        if self.kind not in KINDS:
+            self.kind = None
+        self.tags = self.request.GET.getlist('tag')
+        return search(self.query, kind=self.kind, tags=self.tags,
+            limit=self.limit)
+
+    def get_context_data(self, *args, **kwargs):
+        context = super().get_context_data(*args, **kwargs)
+        context['query'] = self.query
+        context['kind'] = self.kind
+        context['tags'] = self.tags
+        context['kinds'] = KINDS
+        return context
+
+class LessonDetailView(LoginRequiredMixin, ConditionalGetMixin, 
+        CachedObjectMixin, DetailView):
     model = Lesson
     template_name = 'content/lessons/detail.html'
 
-class QuizDetailView(LoginRequiredMixin, DetailView):
+    def get_validators(self):
+        validators = select_scalars([
+            'SELECT updated_at FROM {0} WHERE id = %s'.format(
+                Lesson._meta.db_table),
+            'SELECT MAX(updated_at) FROM {0} WHERE lesson_id = %s'.format(
+                Quiz._meta.db_table),
+            'SELECT COUNT(*) FROM {0} WHERE lesson_id = %s'.format(
+                Quiz._meta.db_table),
+        ], [self.kwargs['pk']] * 3)
+        # No lesson: let the view raise 404
+        return validators if validators[0] else None
+
+    def get_context_data(self, *args, **kwargs):
+        context = super().get_context_data(*args, **kwargs)
+        context['quizzes'] = cache.get_quizzes(self.object.id)
+        return context
+
+class QuizDetailView(LoginRequiredMixin, ConditionalGetMixin, 
+        CachedObjectMixin, DetailView):
     model = Quiz
     template_name = 'content/quizzes/detail.html'
 
+    def get_validators(self):
+        tables = {
+            'answer': Answer._meta.db_table,
+            'question': Question._meta.db_table,
+            'quiz': Quiz._meta.db_table,
+        }
+        # The page shows where the user is in the quiz, so their latest
+        # answer counts. On SQLite, CROSS JOIN makes the planner drive the
+        # join from this quiz's questions rather than from all of the
+        # user's answers; other databases take the plain inner join.
+        tables['join'] = 'CROSS JOIN' if connection.vendor == 'sqlite' else (
+            'JOIN')
+        answers = ('FROM {question} q {join} {answer} a ON '
+            'a.question_id = q.id WHERE q.quiz_id = %s AND a.user_id = %s')
+        validators = select_scalars([
+            subquery.format(**tables) for subquery in (
+                'SELECT updated_at FROM {quiz} WHERE id = %s',
+                'SELECT MAX(updated_at) FROM {question} WHERE quiz_id = %s',
+                'SELECT COUNT(*) FROM {question} WHERE quiz_id = %s',
+                'SELECT MAX(a.updated_at) ' + answers,
+                'SELECT COUNT(*) ' + answers,
+            )
+        ], [self.kwargs['pk']] * 3 + [self.kwargs['pk'],
+            self.request.user.pk] * 2)
+        if not validators[0]:
+            return None
+        # So are the answers still in the ingestion queue
+        return validators + (len(ingest.get_pending(self.request.user)),)
+
+    def get_context_data(self, *args, **kwargs):
+        context = super().get_context_data(*args, **kwargs)
+        bundle = get_bundle(self.object.id)
+        next_question = get_answer_loader(self.request).get_next_unanswered(
+            bundle)
+        context['next_question'] = next_question
+        context['done'] = next_question is None
+        context['bundle'] = bundle
+        return context
+
+class QuizSubmitView(LoginRequiredMixin, CachedObjectMixin, DetailView):
+    """Answers every remaining question of a quiz on one page."""
+    model = Quiz
+    template_name = 'content/quizzes/submit.html'
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        formset = self.get_formset()
+        return self.render_to_response(self.get_context_data(formset=formset))
+
+    def post(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        formset = self.get_formset(request.POST)
+        if formset.is_valid():
+            try:
+                Answer.objects.create_batch(request.user, formset.questions,
+                    formset.get_choices())
+            except IntegrityError as e:
+                # Another request answered some of these in the meantime
+                formset = self.get_formset()
+                formset.non_form_errors().append(
+                    'Some questions were already answered.')
+            else:
+                return HttpResponseRedirect(self.get_success_url())
+
+        return self.render_to_response(self.get_context_data(formset=formset))
+
+    def get_formset(self, data=None):
+        ingest.drain_user(self.request.user)
+        # Fetched once: the same rows render the page and grade the answers
+        questions = list(self.object.get_unanswered_questions(
+            self.request.user))
+        return QuizAnswerFormSet(data, questions=questions)
+
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
-        quiz = self.get_object()
-        unanswered_questions = quiz.get_unanswered_questions(self.request.user)
-        context['done'] = unanswered_questions.count() == 0
+        formset = context['formset']
+        context['question_forms'] = zip(formset.questions, formset.forms)
         return context
 
+    def get_success_url(self):
+        return reverse('quiz_answer_list', args=(self.object.id,))
+
 class QuizAnswerListView(LoginRequiredMixin, ListView):
     model = Answer
     template_name = 'content/quizzes/answers/list.html'
 
     def get_queryset(self):
         self.quiz = Quiz.objects.get(id=self.kwargs['pk'])
+        # The score counts every answer
+        ingest.drain_user(self.request.user)
         return Answer.objects.filter(user=self.request.user, 
-            question__quiz=self.quiz)
+            question__quiz=self.quiz).select_related('question')
 
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
-        context['score'] = self.quiz.get_score(self.request.user)
+        result = self.quiz.get_result(self.request.user)
+        context['result'] = result
+        context['score'] = result.get_score_display()
         return context
 
-class QuestionDetailView(LoginRequiredMixin, DetailView):
+class QuestionDetailView(LoginRequiredMixin, CachedObjectMixin, 
+        DetailView):
     model = Question
     template_name = 'content/questions/detail.html'
 
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
-        user_answer = self.get_object().get_user_answer(self.request.user)
+        bundle = get_bundle(self.object.quiz_id)
+        context['bundle'] = bundle
+        context['number'] = bundle.get_number(self.object.id)
+        # One row by primary key, however many answers the question has
+        context['stats'] = QuestionStats.objects.filter(
+            question_id=self.object.id).first()
+
+        # Only answered questions have a cached fragment, so a hit saves
+        # looking up the answer. A miss is passed on to the cachefragment
+        # tag, which counts it only if the question turns out answered.
+        fragment = fragments.get('answer', self.request.user.pk, 
+            self.object.id, count_miss=False)
+        context['answer_fragment'] = fragment
+        if fragment is not None:
+            context['already_answered'] = True
+            return context
+
+        # Shared with the get_user_answer tag, which then needs no query
+        user_answer = get_answer_loader(self.request).load(self.object)
         if user_answer:
             context['already_answered'] = True
         else:
             context['already_answered'] = False
-            context['form'] = AnswerForm
+            context['form'] = AnswerForm(initial={'token': uuid4().hex})
         return context
 
 class AnswerCreateView(LoginRequiredMixin, CreateView):
+    """
+    Answers a question. Submitting twice, or racing another submission of
+    the same answer, writes once and redirects to the same page. With
+    ANSWER_INGESTION_MODE = 'queue' the answer is queued for a background
+    write instead (see ingest.py).
+    """
     model = Answer
     template = 'content/answers/create.html'
     form_class = AnswerForm
+    token_timeout = 60 * 60
 
     def get_success_url(self):
-        quiz = self.get_object().question.quiz
-        questions = Question.objects.filter(quiz=quiz)
-        for question in questions:
-            if not question.get_user_answer(self.request.user):
-                return question.get_absolute_url()
+        # A loader of its own, as the request's may predate the answer
+        next_question = AnswerLoader(self.request.user).get_next_unanswered(
+            get_bundle(self.question.quiz_id))
+        if next_question:
+            return next_question.get_absolute_url()
 
         return reverse('lesson_list')
 
     def form_valid(self, form):
-        if form.is_valid():
-            form.instance.user = self.request.user
-            question = Question.objects.get(id=self.kwargs['pk'])
-            form.instance.question = question
+        try:
+            self.question = cache.get(Question, self.kwargs['pk'])
+        except Question.DoesNotExist as e:
+            raise Http404('No question found matching the query.')
+
+        token = form.cleaned_data['token']
+        key = 'answer:token:{0}:{1}'.format(self.request.user.pk, token)
+        content_cache = cache.get_cache()
+        if token and not content_cache.add(key, '', self.token_timeout):
+            # Submitted before: redirect where the first submission did,
+            # without touching the database
+            url = content_cache.get(key)
+            if url:
+                return HttpResponseRedirect(url)
+
+        # Does nothing if the question is already answered. A duplicate
+        # that got here returns once the first answer is committed, so
+        # both compute the same redirect.
+        if ingest.is_enabled():
+            ingest.enqueue(self.request.user, self.question, 
+                form.cleaned_data['choice'])
+        else:
+            Answer.objects.create_once(self.request.user, self.question, 
+                form.cleaned_data['choice'])
+        url = self.get_success_url()
+        if token:
+            content_cache.set(key, url, self.token_timeout)
+        return HttpResponseRedirect(url)
+
+class CacheMetricsView(StaffRequiredMixin, View):
+    """Counters of the content and fragment caches as JSON, for graphing."""
+    def get(self, request, *args, **kwargs):
+        return JsonResponse({
+            'content': cache.get_stats(),
+            'fragments': fragments.get_stats(),
+        })
+
+class ExportView(StaffRequiredMixin, View):
+    """
+    Streams answers or quiz scores as CSV or JSON lines, filtered like the
+    export_answers command (?kind=, format=, quiz=, lesson=, tag=, since=,
+    until=).
+    """
+    content_types = {
+        'csv': 'text/csv',
+        'jsonl': 'application/x-ndjson',
+    }
+
+    def get(self, request, *args, **kwargs):
+        form = ExportForm(request.GET)
+        if not form.is_valid():
+            return HttpResponseBadRequest(form.errors.as_text(), 
+                content_type='text/plain')
 
-        return super().form_valid(form)
+        kind = form.cleaned_data['kind']
+        format = form.cleaned_data['format']
+        response = StreamingHttpResponse(
+            export(kind, format, **form.get_filters()), 
+            content_type=self.content_types[format])
+        response['Content-Disposition'] = (
+            'attachment; filename="{0}.{1}"'.format(kind, format))
+        return response
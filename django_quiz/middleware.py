@@ -0,0 +1,221 @@
+# Python
+import cProfile
+import logging
+import re
+from collections import Counter
+from itertools import islice
+from random import random
+
+# Django
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.functional import SimpleLazyObject
+
+# Local
+from . import profiling, routers
+from .common import users
+
+logger = logging.getLogger('django_quiz.queries')
+
+class QueryRecorder(object):
+    """
+    Records the queries run on this thread's database connections between
+    start() and stop(), whatever the DEBUG setting.
+    """
+    def __init__(self):
+        self.queries = []
+
+    def start(self):
+        self.states = []
+        for connection in connections.all():
+            self.states.append((connection, connection.force_debug_cursor,
+                len(connection.queries_log)))
+            connection.force_debug_cursor = True
+        return self
+
+    def stop(self):
+        for connection, force_debug_cursor, start in self.states:
+            connection.force_debug_cursor = force_debug_cursor
+            self.queries.extend(islice(connection.queries_log, start, None))
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __len__(self):
+        return len(self.queries)
+
+    @property
+    def time(self):
+        """Total database time in milliseconds."""
+        return sum(float(query['time']) for query in self.queries) * 1000
+
+    def get_duplicates(self):
+        """Maps each repeated query signature to its number of runs."""
+        signatures = Counter(get_signature(query['sql'])
+            for query in self.queries)
+        return {
+            signature: count for signature, count in signatures.items()
+            if count > 1
+        }
+
+SIGNATURE_PATTERNS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\?(?:, \?)*\)'), '(...)'),
+)
+
+def get_signature(sql):
+    """The query with its literal values replaced by placeholders."""
+    for pattern, replacement in SIGNATURE_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+class QueryBudgetMiddleware(object):
+    """
+    Counts the queries of each request and warns about views that go over
+    their budget.
+
+    Enabled by QUERY_BUDGET_ENABLED. Budgets are looked up by URL name in
+    QUERY_BUDGETS, falling back to QUERY_BUDGET_DEFAULT. Every response gets
+    X-Query-Count, X-Query-Time (milliseconds) and X-Query-Duplicates
+    headers. Place it first in MIDDLEWARE_CLASSES so that the queries of
+    the other middleware are counted too.
+    """
+    def __init__(self):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', False):
+            raise MiddlewareNotUsed
+
+        self.default_budget = getattr(settings, 'QUERY_BUDGET_DEFAULT', 10)
+        self.budgets = getattr(settings, 'QUERY_BUDGETS', {})
+
+    def process_request(self, request):
+        request._query_recorder = QueryRecorder().start()
+
+    def process_response(self, request, response):
+        recorder = getattr(request, '_query_recorder', None)
+        if recorder is None:
+            return response
+        recorder.stop()
+
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.url_name if match else None
+        duplicates = recorder.get_duplicates()
+        budget = self.budgets.get(url_name, self.default_budget)
+
+        response['X-Query-Count'] = len(recorder)
+        response['X-Query-Time'] = '{0:.1f}'.format(recorder.time)
+        response['X-Query-Duplicates'] = sum(duplicates.values())
+
+        extra = {
+            'url_name': url_name,
+            'path': request.path,
+            'query_count': len(recorder),
+            'query_time': recorder.time,
+            'duplicates': duplicates,
+        }
+        if len(recorder) > budget:
+            logger.warning('%s: %d queries over a budget of %d (%.1fms); '
+                'repeated: %s', url_name or request.path, len(recorder),
+                budget, recorder.time, duplicates, extra=extra)
+        else:
+            logger.debug('%s: %d queries (%.1fms)', url_name or request.path,
+                len(recorder), recorder.time, extra=extra)
+
+        return response
+
+class CachedAuthenticationMiddleware(object):
+    """
+    AuthenticationMiddleware with request.user from the user cache, so that
+    authenticated requests do not query auth_user. Replaces
+    django.contrib.auth.middleware.AuthenticationMiddleware.
+    """
+    def process_request(self, request):
+        assert hasattr(request, 'session'), (
+            'CachedAuthenticationMiddleware requires SessionMiddleware '
+            'before it in MIDDLEWARE_CLASSES.')
+        request.user = SimpleLazyObject(lambda: self.get_user(request))
+
+    def get_user(self, request):
+        if not hasattr(request, '_cached_user'):
+            request._cached_user = users.get_user(request)
+        return request._cached_user
+
+class ReplicaStickyMiddleware(object):
+    """
+    Pins the reads of a client that has just written to the primary
+    database, for REPLICA_STICKY_SECONDS (with ReplicaRouter).
+
+    A request writes if it is not a GET, HEAD or OPTIONS, or if it went
+    through the router's db_for_write(). The window is a short-lived
+    cookie, so that keeping it costs no session write.
+    """
+    cookie_name = 'replica_pin'
+
+    def __init__(self):
+        names = getattr(settings, 'DATABASE_ROUTERS', [])
+        if 'django_quiz.routers.ReplicaRouter' not in names:
+            raise MiddlewareNotUsed
+
+        self.seconds = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+
+    def process_request(self, request):
+        routers.pin(self.cookie_name in request.COOKIES)
+        routers.reset_written()
+
+    def process_response(self, request, response):
+        if (routers.was_written() or 
+                request.method not in ('GET', 'HEAD', 'OPTIONS')):
+            response.set_cookie(self.cookie_name, '1', max_age=self.seconds,
+                httponly=True)
+        routers.pin(False)
+        return response
+
+class ProfilingMiddleware(object):
+    """
+    Profiles a random sample of requests with cProfile, and every request
+    from a staff user that has the PROFILING_HEADER header, and saves the
+    profiles tagged with the URL name and the query count (see
+    profiling.py). Profiled responses name their profile in X-Profile.
+
+    Enabled by PROFILING_ENABLED; otherwise the middleware is dropped at
+    startup and costs nothing. PROFILING_SAMPLE_RATE is the share of
+    requests profiled. Place it after the authentication middleware: it
+    profiles the view and the rendering of its response.
+    """
+    def __init__(self):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0)
+        header = getattr(settings, 'PROFILING_HEADER', 'X-Profile')
+        self.header = 'HTTP_' + header.upper().replace('-', '_')
+
+    def should_profile(self, request):
+        if self.header in request.META:
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_staff:
+                return True
+        return random() < self.sample_rate
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.should_profile(request):
+            request._profiler_recorder = QueryRecorder().start()
+            request._profiler = cProfile.Profile()
+            request._profiler.enable()
+
+    def process_response(self, request, response):
+        profiler = getattr(request, '_profiler', None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        recorder = request._profiler_recorder.stop()
+
+        match = getattr(request, 'resolver_match', None)
+        response['X-Profile'] = profiling.save(profiler, 
+            match.url_name if match else None, len(recorder))
+        return response
@@ -1,8 +1,68 @@
+# Python
+from datetime import datetime
+from hashlib import md5
+
 # Django
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 
 class LoginRequiredMixin(object):
     @method_decorator(login_required)
     def dispatch(self, *args, **kwargs):
         return super().dispatch(*args, **kwargs)
+
+class StaffRequiredMixin(object):
+    @method_decorator(staff_member_required)
+    def dispatch(self, *args, **kwargs):
+        return super().dispatch(*args, **kwargs)
+
+class ConditionalGetMixin(object):
+    """
+    Answers GET and HEAD requests with 304 Not Modified, without running
+    the view, when the client's copy of the page is still current.
+
+    Views implement get_validators(), returning a tuple of values (ideally
+    from one query) that changes whenever the page would, or None to skip
+    the check. The newest datetime among them is the Last-Modified date;
+    the ETag is a hash of all of them and of the user, whose name is on
+    every page.
+    """
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return super().dispatch(request, *args, **kwargs)
+
+        validators = self.get_validators()
+        if validators is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        validators = tuple(to_datetime(value) for value in validators)
+        dates = [value for value in validators if isinstance(value, datetime)]
+        last_modified = max(dates) if dates else None
+        etag = md5(repr(validators + (request.user.pk,
+            request.user.get_username())).encode()).hexdigest()
+
+        view = condition(etag_func=lambda *args, **kwargs: etag,
+            last_modified_func=lambda *args, **kwargs: last_modified)(
+            super().dispatch)
+        return view(request, *args, **kwargs)
+
+    def get_validators(self):
+        raise NotImplementedError
+
+def to_datetime(value):
+    """
+    Returns value as an aware datetime if it is one or a string holding
+    one, as raw queries on SQLite return, otherwise value unchanged.
+    """
+    if isinstance(value, str):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            return value
+        value = parsed
+    if isinstance(value, datetime) and timezone.is_naive(value):
+        value = timezone.make_aware(value, timezone.utc)
+    return value
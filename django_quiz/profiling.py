@@ -0,0 +1,131 @@
+"""
+Request profiles written by ProfilingMiddleware, and the staff pages that
+list and render them.
+
+Profiles are cProfile dumps in PROFILING_DIR, named after the time, the
+URL name and the query count of the request, so that the listing shows
+what each one is. Beyond PROFILING_MAX_FILES the oldest are deleted.
+"""
+
+# Python
+import os
+import pstats
+import re
+from collections import namedtuple
+from datetime import datetime
+from os.path import join
+
+# Django
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404
+from django.template.response import TemplateResponse
+
+NAME_PATTERN = re.compile(r'^(?P<time>\d{8}-\d{6}-\d{6})_(?P<url_name>[\w-]+)'
+    r'_(?P<queries>\d+)q\.prof$')
+
+SORTS = ('cumulative', 'tottime', 'ncalls')
+
+Profile = namedtuple('Profile', 'name time url_name queries size')
+
+FunctionStats = namedtuple('FunctionStats',
+    'function calls primitive_calls total_time cumulative_time')
+
+def get_directory():
+    return getattr(settings, 'PROFILING_DIR',
+        join(settings.BASE_DIR, 'profiles'))
+
+def get_max_files():
+    return getattr(settings, 'PROFILING_MAX_FILES', 100)
+
+##########
+# Writing
+##########
+
+def save(profiler, url_name, queries):
+    """Writes the stats of profiler and returns the name of the file."""
+    directory = get_directory()
+    os.makedirs(directory, exist_ok=True)
+    name = '{0:%Y%m%d-%H%M%S-%f}_{1}_{2}q.prof'.format(datetime.now(),
+        re.sub(r'[^\w-]', '-', url_name or 'unnamed'), queries)
+    profiler.dump_stats(join(directory, name))
+    rotate()
+    return name
+
+def rotate():
+    """Deletes the oldest profiles beyond PROFILING_MAX_FILES."""
+    directory = get_directory()
+    names = sorted(name for name in os.listdir(directory)
+        if NAME_PATTERN.match(name))
+    for name in names[:max(len(names) - get_max_files(), 0)]:
+        try:
+            os.remove(join(directory, name))
+        except FileNotFoundError as e:
+            # Rotated by another process
+            pass
+
+##########
+# Reading
+##########
+
+def list_profiles():
+    """The saved profiles, newest first."""
+    directory = get_directory()
+    if not os.path.isdir(directory):
+        return []
+
+    profiles = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        match = NAME_PATTERN.match(name)
+        if match:
+            profiles.append(Profile(name=name,
+                time=datetime.strptime(match.group('time'),
+                    '%Y%m%d-%H%M%S-%f'),
+                url_name=match.group('url_name'),
+                queries=int(match.group('queries')),
+                size=os.path.getsize(join(directory, name))))
+    return profiles
+
+def load_stats(name, sort='cumulative', limit=50):
+    """
+    The total time of a profile and its top limit functions by sort.
+    Raises FileNotFoundError for names that are not saved profiles.
+    """
+    path = join(get_directory(), name)
+    if not NAME_PATTERN.match(name) or not os.path.isfile(path):
+        raise FileNotFoundError(name)
+
+    stats = pstats.Stats(path)
+    stats.sort_stats(sort)
+    functions = []
+    for function in stats.fcn_list[:limit]:
+        primitive_calls, calls, total_time, cumulative_time, callers = (
+            stats.stats[function])
+        functions.append(FunctionStats(pstats.func_std_string(function),
+            calls, primitive_calls, total_time, cumulative_time))
+    return stats.total_tt, functions
+
+########
+# Views
+########
+
+@staff_member_required
+def profile_list(request):
+    context = dict(admin.site.each_context(request), title='Profiles',
+        profiles=list_profiles(), directory=get_directory())
+    return TemplateResponse(request, 'admin/profiles/list.html', context)
+
+@staff_member_required
+def profile_detail(request, name):
+    sort = request.GET.get('sort')
+    if sort not in SORTS:
+        sort = SORTS[0]
+    try:
+        total_time, functions = load_stats(name, sort)
+    except FileNotFoundError as e:
+        raise Http404('No profile {0}.'.format(name))
+
+    context = dict(admin.site.each_context(request), title=name,
+        total_time=total_time, functions=functions, sort=sort, sorts=SORTS)
+    return TemplateResponse(request, 'admin/profiles/detail.html', context)
@@ -0,0 +1,69 @@
+"""
+Database routing for a read-only replica of the SQLite database.
+
+Content (lessons, quizzes, questions and tags) is read from the 'replica'
+alias, which the replicate_sqlite command refreshes from the primary.
+Everything else, every write and every read inside a transaction goes to
+'default'. After a user writes, ReplicaStickyMiddleware pins their
+requests to the primary for REPLICA_STICKY_SECONDS, so that they read
+what they wrote until the replica has caught up. See settings_replica.py.
+"""
+
+# Python
+from threading import local
+
+# Django
+from django.db import connections
+
+_state = local()
+
+def pin(pinned=True):
+    """Sends this thread's reads to the primary (or not) from now on."""
+    _state.pinned = pinned
+
+def is_pinned():
+    return getattr(_state, 'pinned', False)
+
+def reset_written():
+    _state.written = False
+
+def was_written():
+    """Whether this thread has written since reset_written()."""
+    return getattr(_state, 'written', False)
+
+class ReplicaRouter(object):
+    replica = 'replica'
+    # Content that is read on every page but rarely written
+    replica_models = {
+        'common.tag', 
+        'content.lesson', 
+        'content.lesson_tags', 
+        'content.question', 
+        'content.quiz',
+    }
+
+    def db_for_read(self, model, **hints):
+        if is_pinned() or connections['default'].in_atomic_block:
+            # Inside a transaction the reads have to see its writes
+            return 'default'
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Related objects come from where the object referring to them
+            # did, for a consistent view (and so that migrations, which
+            # read from the database they migrate, stay on it)
+            return instance._state.db
+        if model._meta.label_lower in self.replica_models:
+            return self.replica
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        _state.written = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary, migrations and all
+        return db == 'default'
@@ -1,4 +1,7 @@
-from os.path import abspath, dirname, join
+import os
+import sys
+from os.path import abspath, dirname, expanduser, join
+from tempfile import gettempdir
 
 BASE_DIR = dirname(dirname(abspath(__file__)))
 SECRET_KEY = '8-mz=t&)(w6$cds)a8p+o4c*0y)&-=#db)@^#f9$#v2yug(3c_'
@@ -21,14 +24,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE_CLASSES = [
+    'django_quiz.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django_quiz.middleware.CachedAuthenticationMiddleware',
     'django.contrib.auth.middleware.SessionAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'django_quiz.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'django_quiz.urls'
@@ -57,10 +62,104 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': join(BASE_DIR, 'db.sqlite3'),
+        'TEST': {
+            # On disk rather than in shared memory, where concurrent
+            # writers fail at once instead of waiting for the lock, and
+            # outside the source tree, where an interrupted run would
+            # leave it behind
+            'NAME': join(gettempdir(), 'django_quiz_test.sqlite3'),
+        },
     }
 }
 
 
+# Cache
+# Outside the source tree, as it holds sessions and users (password hashes
+# included); created readable by its owner only
+SHARED_CACHE_DIR = os.environ.get('DJANGO_QUIZ_CACHE_DIR', join(
+    os.environ.get('XDG_CACHE_HOME', expanduser(join('~', '.cache'))),
+    'django_quiz'))
+
+# Use a shared backend (memcached, or the file-based cache on one host)
+# when running several web processes
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'django_quiz',
+    },
+    # Rendered page fragments; a third of them is culled when full
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'django_quiz_fragments',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+            'CULL_FREQUENCY': 3,
+        },
+    },
+    # Sessions and authenticated users (see django_quiz.common.users) are
+    # invalidated by deleting their entries, so every process must see the
+    # same cache; a LocMemCache fails the common.E001/E002 checks. The
+    # file-based cache lists its directory on every write to cull it, so
+    # it is kept small; beyond one host or a few thousand active users,
+    # use memcached for both.
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': join(SHARED_CACHE_DIR, 'sessions'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+        },
+    },
+    'users': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': join(SHARED_CACHE_DIR, 'users'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+}
+
+# The test runner is a single process, and must not share the entries of
+# a development server
+if sys.argv[1:2] == ['test']:
+    for alias in ('sessions', 'users'):
+        CACHES[alias] = {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'django_quiz_{0}'.format(alias),
+        }
+    SILENCED_SYSTEM_CHECKS = ['common.E001', 'common.E002']
+
+CONTENT_CACHE = 'default'
+CONTENT_CACHE_TIMEOUT = 60 * 60
+
+FRAGMENT_CACHE = 'fragments'
+FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+USER_CACHE = 'users'
+USER_CACHE_TIMEOUT = 60 * 5
+
+# Sessions are read from the cache and written through to the database,
+# and saved only when they change. 'signed_cookies' would skip the session
+# store altogether, but sessions could then not be revoked on the server.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_SAVE_EVERY_REQUEST = False
+
+# Quizzes whose bundles each process keeps in memory
+QUIZ_BUNDLE_CACHE_SIZE = 256
+
+
+# Answer ingestion: 'sync' writes each answer as it is submitted, 'queue'
+# queues it in ANSWER_QUEUE_PATH for a worker thread of the web process
+# (or the drain_answer_queue command) to write in batches
+ANSWER_INGESTION_MODE = 'sync'
+ANSWER_QUEUE_PATH = join(BASE_DIR, 'answer_queue.sqlite3')
+ANSWER_QUEUE_BATCH_SIZE = 500
+# Seconds between drains; set ANSWER_QUEUE_WORKER = False to drain only
+# with the command
+ANSWER_QUEUE_INTERVAL = 0.5
+ANSWER_QUEUE_WORKER = True
+
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -87,3 +186,19 @@ USE_TZ = True
 
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = '/static/'
+
+
+# Query budgets (see django_quiz.middleware.QueryBudgetMiddleware)
+QUERY_BUDGET_ENABLED = False
+QUERY_BUDGET_DEFAULT = 10
+QUERY_BUDGETS = {}
+
+
+# Request profiling (see django_quiz.middleware.ProfilingMiddleware)
+PROFILING_ENABLED = False
+# Share of requests profiled, from 0 to 1; staff can profile any request
+# by sending the PROFILING_HEADER header
+PROFILING_SAMPLE_RATE = 0
+PROFILING_HEADER = 'X-Profile'
+PROFILING_DIR = join(BASE_DIR, 'profiles')
+PROFILING_MAX_FILES = 100
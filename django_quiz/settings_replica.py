@@ -0,0 +1,38 @@
+"""
+Settings with a read replica: content reads go to a copy of the database
+that replicate_sqlite refreshes, so that answer writes do not block them.
+
+    DJANGO_SETTINGS_MODULE=django_quiz.settings_replica \
+        python manage.py replicate_sqlite --loop &
+    DJANGO_SETTINGS_MODULE=django_quiz.settings_replica \
+        python manage.py runserver
+"""
+
+from .settings import *
+
+REPLICA_PATH = join(BASE_DIR, 'db_replica.sqlite3')
+
+DATABASES['replica'] = {
+    'ENGINE': 'django.db.backends.sqlite3',
+    # Opened read-only
+    'NAME': 'file:{0}?mode=ro'.format(REPLICA_PATH),
+    'OPTIONS': {
+        'uri': True,
+    },
+    'TEST': {
+        'MIRROR': 'default',
+    },
+}
+
+DATABASE_ROUTERS = ['django_quiz.routers.ReplicaRouter']
+
+MIDDLEWARE_CLASSES = MIDDLEWARE_CLASSES[:]
+MIDDLEWARE_CLASSES.insert(
+    MIDDLEWARE_CLASSES.index('django.middleware.security.SecurityMiddleware'), 
+    'django_quiz.middleware.ReplicaStickyMiddleware')
+
+# Seconds between refreshes of the replica by replicate_sqlite --loop
+REPLICA_INTERVAL = 1
+# How long a client reads from the primary after writing; longer than a
+# refresh takes
+REPLICA_STICKY_SECONDS = 5
@@ -0,0 +1,57 @@
+# Django
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+class QueryCountMixin(object):
+    """TestCase mixin for catching N+1 queries in views."""
+
+    def assertQueriesConstant(self, url, grow, times=3):
+        """
+        Fails if the number of queries to GET url changes when grow() adds
+        more data. grow() is called times times between measurements.
+        """
+        # Not counted: the first request fills the session and user caches
+        self.client.get(url)
+        counts = [self.countQueries(url)]
+        for i in range(times):
+            grow()
+            counts.append(self.countQueries(url))
+
+        self.assertEqual(len(set(counts)), 1, 
+            'Query count for {0} grows with the data: {1}'.format(url, 
+            counts))
+
+    def countQueries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+class QueryPlanMixin(object):
+    """
+    TestCase mixin for catching queries that scan a whole table, with
+    SQLite's EXPLAIN QUERY PLAN.
+    """
+
+    def getQueryPlan(self, sql, params=()):
+        """The detail column of each step of the plan of sql."""
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertNoFullScan(self, query, tables):
+        """
+        Fails if the plan of query (a queryset, or SQL with its parameters
+        inlined) scans any of tables from start to end instead of searching
+        an index.
+        """
+        if hasattr(query, 'query'):
+            sql, params = query.query.sql_with_params()
+        else:
+            sql, params = query, ()
+        plan = self.getQueryPlan(sql, params)
+        # Older SQLite versions say 'SCAN TABLE name'
+        scans = [step for step in plan if step.startswith('SCAN ') and
+            step.replace('SCAN TABLE ', 'SCAN ').split()[1] in tables]
+        self.assertEqual(scans, [], 
+            'Full scan in the plan of {0}: {1}'.format(sql, plan))
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+# Python
+import os
+from shutil import rmtree
+from tempfile import mkdtemp
+
+# Django
+from django.contrib.auth.models import User
+from django.core.urlresolvers import reverse
+from django.http import HttpResponse
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import transaction
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase
+from django.test import override_settings
+
+# Local
+from .content.models import Answer, Lesson, Question, Quiz
+from . import routers
+from .middleware import ProfilingMiddleware, QueryRecorder
+from .middleware import ReplicaStickyMiddleware, get_signature
+from .testing import QueryCountMixin
+
+###############################################################################
+# Middleware
+###############################################################################
+
+##############
+# QueryBudget
+##############
+
+class QuerySignatureTestCase(TestCase):
+    def test_literals(self):
+        sql = ('SELECT "id" FROM "content_answer" WHERE "user_id" = 12 '
+            'AND "body" = \'it\'\'s\' AND "id" IN (1, 2, 3) LIMIT 21')
+        self.assertEqual(get_signature(sql), 
+            'SELECT "id" FROM "content_answer" WHERE "user_id" = ? '
+            'AND "body" = ? AND "id" IN (...) LIMIT ?')
+
+    def test_same_signature(self):
+        self.assertEqual(
+            get_signature('SELECT * FROM "t" WHERE "id" IN (1, 2)'), 
+            get_signature('SELECT * FROM "t" WHERE "id" IN (3)'))
+
+class QueryRecorderTestCase(TestCase):
+    def test_record(self):
+        with QueryRecorder() as recorder:
+            list(Lesson.objects.filter(id=1))
+            list(Lesson.objects.filter(id=2))
+        self.assertEqual(len(recorder), 2)
+        self.assertEqual(list(recorder.get_duplicates().values()), [2])
+
+@override_settings(QUERY_BUDGET_ENABLED=True, QUERY_BUDGET_DEFAULT=100, 
+    QUERY_BUDGETS={'quiz_detail': 1})
+class QueryBudgetMiddlewareTestCase(TestCase):
+    def setUp(self):
+        self.lesson = Lesson.objects.create(title='Music', 
+            body='You must practice.')
+        self.quiz = Quiz.objects.create(lesson=self.lesson, title='Quiz title')
+
+        self.client = Client()
+        self.username = 'testuser'
+        self.password = '0xdeadbeef'
+        self.user = User.objects.create_user(username=self.username, 
+            password=self.password)
+        self.client.login(username=self.username, password=self.password)
+
+    def test_headers(self):
+        url = reverse('lesson_detail', args=(self.lesson.id,))
+        with self.assertLogs('django_quiz.queries', 'DEBUG'):
+            response = self.client.get(url)
+        self.assertGreater(int(response['X-Query-Count']), 0)
+        self.assertIn('X-Query-Time', response)
+        self.assertIn('X-Query-Duplicates', response)
+
+    def test_over_budget(self):
+        url = reverse('quiz_detail', args=(self.quiz.id,))
+        with self.assertLogs('django_quiz.queries', 'WARNING') as logs:
+            self.client.get(url)
+        self.assertIn('quiz_detail', logs.output[0])
+        self.assertIn('over a budget of 1', logs.output[0])
+
+    @override_settings(QUERY_BUDGET_ENABLED=False)
+    def test_disabled(self):
+        url = reverse('quiz_detail', args=(self.quiz.id,))
+        response = self.client.get(url)
+        self.assertNotIn('X-Query-Count', response)
+
+##########
+# Replica
+##########
+
+class ReplicaRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+
+    def tearDown(self):
+        routers.pin(False)
+
+    def test_read(self):
+        self.assertEqual(self.router.db_for_read(Lesson), 'replica')
+        self.assertEqual(self.router.db_for_read(Question), 'replica')
+        self.assertEqual(self.router.db_for_read(Answer), 'default')
+        self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_pinned(self):
+        routers.pin()
+        self.assertEqual(self.router.db_for_read(Lesson), 'default')
+
+    def test_instance(self):
+        quiz = Quiz(title='Quiz title')
+        quiz._state.db = 'default'
+        self.assertEqual(self.router.db_for_read(Lesson, instance=quiz), 
+            'default')
+
+    def test_write(self):
+        routers.reset_written()
+        self.assertEqual(self.router.db_for_write(Lesson), 'default')
+        self.assertTrue(routers.was_written())
+
+    def test_migrate(self):
+        self.assertTrue(self.router.allow_migrate('default', 'content'))
+        self.assertFalse(self.router.allow_migrate('replica', 'content'))
+
+class ReplicaRouterTransactionTestCase(TestCase):
+    def test_atomic(self):
+        router = routers.ReplicaRouter()
+        with transaction.atomic():
+            self.assertEqual(router.db_for_read(Lesson), 'default')
+
+@override_settings(DATABASE_ROUTERS=['django_quiz.routers.ReplicaRouter'], 
+    REPLICA_STICKY_SECONDS=5)
+class ReplicaStickyMiddlewareTestCase(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = ReplicaStickyMiddleware()
+
+    def tearDown(self):
+        routers.pin(False)
+
+    def process(self, request, during=None):
+        self.middleware.process_request(request)
+        pinned = routers.is_pinned()
+        if during is not None:
+            during()
+        response = self.middleware.process_response(request, HttpResponse())
+        return pinned, response
+
+    def test_get(self):
+        pinned, response = self.process(self.factory.get('/'))
+        self.assertFalse(pinned)
+        self.assertNotIn(ReplicaStickyMiddleware.cookie_name, 
+            response.cookies)
+
+    def test_post(self):
+        pinned, response = self.process(self.factory.post('/'))
+        self.assertFalse(pinned)
+        cookie = response.cookies[ReplicaStickyMiddleware.cookie_name]
+        self.assertEqual(cookie['max-age'], 5)
+
+    def test_write_on_get(self):
+        pinned, response = self.process(self.factory.get('/'), 
+            lambda: routers.ReplicaRouter().db_for_write(Answer))
+        self.assertIn(ReplicaStickyMiddleware.cookie_name, response.cookies)
+
+    def test_pinned(self):
+        request = self.factory.get('/')
+        request.COOKIES[ReplicaStickyMiddleware.cookie_name] = '1'
+        pinned, response = self.process(request)
+        self.assertTrue(pinned)
+        # Only for the request
+        self.assertFalse(routers.is_pinned())
+
+    @override_settings(DATABASE_ROUTERS=[])
+    def test_unused(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaStickyMiddleware()
+
+############
+# Profiling
+############
+
+class ProfilingMiddlewareTestCase(TestCase):
+    def setUp(self):
+        self.directory = mkdtemp()
+        self.settings = override_settings(PROFILING_ENABLED=True, 
+            PROFILING_SAMPLE_RATE=0, PROFILING_DIR=self.directory)
+        self.settings.enable()
+
+        self.lesson = Lesson.objects.create(title='Music', 
+            body='You must practice.')
+        self.url = reverse('lesson_list')
+        self.user = User.objects.create_user(username='testuser', 
+            password='0xdeadbeef')
+        self.staff = User.objects.create_superuser('admin', 
+            'admin@example.com', 'admin')
+        # Created once the settings are overridden, so that it loads the
+        # middleware
+        self.client = Client()
+
+    def tearDown(self):
+        self.settings.disable()
+        rmtree(self.directory)
+
+    def get_profiles(self):
+        return sorted(name for name in os.listdir(self.directory))
+
+    @override_settings(PROFILING_ENABLED=False)
+    def test_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            ProfilingMiddleware()
+
+    def test_header(self):
+        self.client.login(username='admin', password='admin')
+        response = self.client.get(self.url, HTTP_X_PROFILE='1')
+        self.assertEqual(self.get_profiles(), [response['X-Profile']])
+        self.assertRegex(response['X-Profile'], r'_lesson_list_\d+q\.prof$')
+
+    def test_not_staff(self):
+        self.client.login(username='testuser', password='0xdeadbeef')
+        response = self.client.get(self.url, HTTP_X_PROFILE='1')
+        self.assertNotIn('X-Profile', response)
+        self.assertEqual(self.get_profiles(), [])
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampled(self):
+        self.client.login(username='testuser', password='0xdeadbeef')
+        response = self.client.get(self.url)
+        self.assertIn('X-Profile', response)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_MAX_FILES=2)
+    def test_rotation(self):
+        self.client.login(username='testuser', password='0xdeadbeef')
+        names = [self.client.get(self.url)['X-Profile'] for i in range(3)]
+        self.assertEqual(self.get_profiles(), names[1:])
+
+    def test_pages(self):
+        self.client.login(username='admin', password='admin')
+        name = self.client.get(self.url, HTTP_X_PROFILE='1')['X-Profile']
+
+        response = self.client.get(reverse('profile_list'))
+        self.assertContains(response, reverse('profile_detail', 
+            args=(name,)))
+        self.assertContains(response, 'lesson_list')
+
+        url = reverse('profile_detail', args=(name,))
+        response = self.client.get(url)
+        self.assertContains(response, 'content/views.py')
+        response = self.client.get(url, {'sort': 'tottime'})
+        self.assertEqual(response.context['sort'], 'tottime')
+
+        response = self.client.get(reverse('profile_detail', 
+            args=('missing.prof',)))
+        self.assertEqual(response.status_code, 404)
+
+    def test_pages_staff_only(self):
+        self.client.login(username='testuser', password='0xdeadbeef')
+        response = self.client.get(reverse('profile_list'))
+        self.assertEqual(response.status_code, 302)
+
+###############################################################################
+# Testing
+###############################################################################
+
+class QueryCountMixinTestCase(QueryCountMixin, TestCase):
+    def setUp(self):
+        self.lesson = Lesson.objects.create(title='Music', 
+            body='You must practice.')
+        self.quiz = Quiz.objects.create(lesson=self.lesson, title='Quiz title')
+
+        self.client = Client()
+        self.username = 'testuser'
+        self.password = '0xdeadbeef'
+        self.user = User.objects.create_user(username=self.username, 
+            password=self.password)
+        self.client.login(username=self.username, password=self.password)
+
+    def add_answer(self):
+        question = Question.objects.create(quiz=self.quiz, 
+            body='Question {0}'.format(self.quiz.question_set.count()))
+        Answer.objects.create(user=self.user, question=question)
+
+    def test_constant(self):
+        url = reverse('quiz_answer_list', args=(self.quiz.id,))
+        self.add_answer()
+        self.assertQueriesConstant(url, self.add_answer)
+
+    def test_growing(self):
+        counts = iter([5, 5, 6, 7])
+        self.countQueries = lambda url: next(counts)
+        with self.assertRaises(AssertionError):
+            self.assertQueriesConstant('/', lambda: None)
@@ -3,10 +3,14 @@ from django.conf.urls import include, url
 from django.contrib import admin
 
 # Local
+from .profiling import profile_detail, profile_list
 from .views import HomepageView
 
 urlpatterns = [
     url(r'^$', HomepageView.as_view(), name='homepage'), 
+    url(r'^admin/profiles/$', profile_list, name='profile_list'), 
+    url(r'^admin/profiles/(?P<name>[\w.-]+)/$', profile_detail, 
+        name='profile_detail'), 
     url(r'^admin/', admin.site.urls), 
     url(r'^content/', include('django_quiz.content.urls'))
 ]